@@ -1,8 +1,12 @@
 import pytest
+import hashlib
+import json
 import os
 
 from fuelweb_test import settings
-from fuelweb_test.helpers.shaker import ShakerEngine
+from fuelweb_test.helpers.shaker import ShakerMatrix
+from fuelweb_test.helpers.shaker import ShakerMatrixRunner
+from fuelweb_test.helpers.snapshot_cache import SnapshotCache
 from fuelweb_test.settings import NEUTRON_SEGMENT
 from fuelweb_test.settings import iface_alias
 from fuelweb_test import logger
@@ -29,11 +33,34 @@ class TestPerfBonding(object):
         }
     ]
 
+    # (segmentation vlan/tun, dvr on/off, l3ha on/off, tcp offloading on/off, target nodes/instances)
+    SHAKER_MATRIX = [
+        ("tun", True, False, False, "instances"),
+        ("vlan", True, False, False, "instances"),
+        ("tun", True, False, True, "instances"),
+        ("vlan", True, False, True, "instances"),
+        ("tun", False, True, True, "instances"),
+        ("tun", False, True, True, "nodes"),
+        ("vlan", False, True, True, "instances"),
+        ("vlan", False, True, True, "nodes"),
+    ]
+
     INTERFACES = {
         'eno1': ['public', 'fuelweb_admin'],
         'bond0': ['storage', 'management', 'private']
     }
 
+    def snapshot_name(self, segmentation, dvr, l3ha, offloading):
+        # offloading modes are set from the offloading flag, the rest of
+        # the bond and interfaces config is covered by the hash
+        bond_hash = hashlib.sha1(json.dumps([TestPerfBonding.BOND_CONFIG, TestPerfBonding.INTERFACES],
+                                            sort_keys=True)).hexdigest()[:8]
+        return "perf_bonding_{}_{}_dvr_{}_l3ha_{}_offloading_{}_{}".format(
+            self.manager.env_config['name'], segmentation, int(dvr), int(l3ha), int(offloading), bond_hash)
+
+    def is_deployed(self, segmentation, dvr, l3ha, offloading):
+        return bool(self.manager.check_run(self.snapshot_name(segmentation, dvr, l3ha, offloading)))
+
     def deploy_env(self, segmentation, dvr, l3ha, offloading):
         assert segmentation == "vlan" or segmentation == "tun"
         if dvr:
@@ -41,6 +68,15 @@ class TestPerfBonding(object):
         if l3ha:
             assert not dvr
 
+        snapshot_cache = SnapshotCache(self.manager.env)
+        snapshot_name = self.snapshot_name(segmentation, dvr, l3ha, offloading)
+        if self.manager.check_run(snapshot_name):
+            self.manager.env.revert_snapshot(snapshot_name)
+            snapshot_cache.touch(snapshot_name)
+            self.manager._context._storage['cluster_id'] = self.manager.fuel_web.get_last_created_cluster()
+            logger.info("Got deployed cluster from snapshot {}".format(snapshot_name))
+            return
+
         bond_config = deepcopy(TestPerfBonding.BOND_CONFIG)
         for mode in bond_config[0]["offloading_modes"]:
             mode["state"] = offloading
@@ -74,9 +110,6 @@ class TestPerfBonding(object):
         os.system("bash /home/mos-jenkins/workspace/env_17_run_shaker/revert_to_empty_state.sh")
 
 
-        cluster_name = self.manager.env_config['name']
-        snapshot_name = "ready_cluster_{}".format(cluster_name)
-
         nof_slaves = int(self.manager.full_config['template']['slaves'])
         assert self.manager.get_ready_slaves(nof_slaves)
 
@@ -111,7 +144,7 @@ class TestPerfBonding(object):
                 raw_data=bond_config
             )
         self.manager.fuel_web.deploy_cluster_wait(cluster_id)
-        self.manager.env.make_snapshot(snapshot_name, is_make=True)
+        snapshot_cache.make_snapshot(snapshot_name)
         self.manager.env.resume_environment()
 
     @pytest.mark.scale_run_shaker
@@ -119,81 +152,19 @@ class TestPerfBonding(object):
         """ Deploys env several times with different configurations and runs shaker
 
         Scenario:
-            1. Deploy env with parameters: segmentation=tun, dvr=on, l3ha=off, offloading=off
-            2. Run shaker instance to instance
-            3. Deploy env with parameters: segmentation=vlan, dvr=on, l3ha=off, offloading=off
-            4. Run shaker instance to instance
-            5. Deploy env with parameters: segmentation=tun, dvr=on, l3ha=off, offloading=on
-            6. Run shaker instance to instance
-            7. Deploy env with parameters: segmentation=vlan, dvr=on, l3ha=off, offloading=on
-            8. Run shaker instance to instance
-            9. Deploy env with parameters: segmentation=tun, dvr=off, l3ha=on, offloading=on
-            10. Run shaker instance to instance
-            11. Run shaker node to node
-            12. Deploy env with parameters: segmentation=vlan, dvr=off, l3ha=on, offloading=on
-            13. Run shaker instance to instance
-            14. Run shaker node to node
-            15. Send report
+            1. For every deployment configuration of SHAKER_MATRIX
+               (segmentation, dvr, l3ha, offloading): revert its snapshot
+               or deploy env with it and make the snapshot
+            2. Run shaker instance to instance and/or node to node on it
+            3. Send report
         """
-
-        # KEY = (segmentation vlan/tun, dvr on/off, l3ha on/off, tcp offloading on/off, target nodes/instances)
-        # def deploy_env(self, segmentation, dvr, l3ha, offloading)
-
-        test_results = {}
         path_to_run_shaker_instances = os.environ.get('PATH_TO_RUN_SHAKER_BETWEEN_INSTANCES', 'faulty_path')
         path_to_run_shaker_nodes = os.environ.get('PATH_TO_RUN_SHAKER_BETWEEN_NODES', 'faulty_path')
 
-        self.deploy_env("tun", True, False, False)
-
-        admin_remote = self.manager.env.d_env.get_admin_remote()
-        engine = ShakerEngine(admin_remote, path_to_run_shaker_instances, path_to_run_shaker_nodes)
-        data = engine.start_shaker_test()
-        test_results[("tun", True, False, False, "instances")] = data
-
-        self.deploy_env("vlan", True, False, False)
-
-        admin_remote = self.manager.env.d_env.get_admin_remote()
-        engine = ShakerEngine(admin_remote, path_to_run_shaker_instances, path_to_run_shaker_nodes)
-        data = engine.start_shaker_test()
-        test_results[("vlan", True, False, False, "instances")] = data
-
-        self.deploy_env("tun", True, False, True)
-
-        admin_remote = self.manager.env.d_env.get_admin_remote()
-        engine = ShakerEngine(admin_remote, path_to_run_shaker_instances, path_to_run_shaker_nodes)
-        data = engine.start_shaker_test()
-        test_results[("tun", True, False, True, "instances")] = data
-
-        self.deploy_env("vlan", True, False, True)
-
-        admin_remote = self.manager.env.d_env.get_admin_remote()
-        engine = ShakerEngine(admin_remote, path_to_run_shaker_instances, path_to_run_shaker_nodes)
-        data = engine.start_shaker_test()
-        test_results[("vlan", True, False, True, "instances")] = data
-
-        self.deploy_env("tun", False, True, True)
-
-        admin_remote = self.manager.env.d_env.get_admin_remote()
-        engine = ShakerEngine(admin_remote, path_to_run_shaker_instances, path_to_run_shaker_nodes)
-        data = engine.start_shaker_test()
-        test_results[("tun", False, True, True, "instances")] = data
-
-        admin_remote = self.manager.env.d_env.get_admin_remote()
-        engine = ShakerEngine(admin_remote, path_to_run_shaker_instances, path_to_run_shaker_nodes)
-        data = engine.start_shaker_test(between_nodes=True)
-        test_results[("tun", False, True, True, "nodes")] = data
-
-        self.deploy_env("vlan", False, True, True)
-
-        admin_remote = self.manager.env.d_env.get_admin_remote()
-        engine = ShakerEngine(admin_remote, path_to_run_shaker_instances, path_to_run_shaker_nodes)
-        data = engine.start_shaker_test()
-        test_results[("vlan", False, True, True, "instances")] = data
-
-        admin_remote = self.manager.env.d_env.get_admin_remote()
-        engine = ShakerEngine(admin_remote, path_to_run_shaker_instances, path_to_run_shaker_nodes)
-        data = engine.start_shaker_test(between_nodes=True)
-        test_results[("vlan", False, True, True, "nodes")] = data
+        runner = ShakerMatrixRunner(self.manager, ShakerMatrix(TestPerfBonding.SHAKER_MATRIX), self.deploy_env,
+                                    path_to_run_shaker_instances, path_to_run_shaker_nodes,
+                                    is_deployed=self.is_deployed)
+        test_results = runner.run()
 
         reporter = ShakerTestResultReporter(test_results)
         reporter.send_report()
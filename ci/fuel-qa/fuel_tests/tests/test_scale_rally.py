@@ -16,6 +16,7 @@ import re
 import os
 import os.path
 import json
+from collections import OrderedDict
 
 from fuelweb_test import logger
 from fuelweb_test import settings
@@ -23,8 +24,11 @@ from fuelweb_test.helpers import checkers
 from fuelweb_test.helpers import os_actions
 from fuelweb_test.helpers import common
 from fuelweb_test.helpers.ssh_manager import SSHManager
+from fuelweb_test.helpers.sync import sync_files
 from fuelweb_test.helpers.rally import RallyBenchmarkTest
+from fuelweb_test.helpers.rally import RallyContainerPool
 from fuelweb_test.helpers.rally import RallyTask 
+from fuelweb_test.helpers.rally import read_results_file
 
 # pylint: disable=no-member
 ssh_manager = SSHManager()
@@ -44,8 +48,15 @@ def prepare(request):
 def pytest_collection_modifyitems(items):
     print items
 
+@pytest.fixture(scope='session')
+def rally_pool(request):
+    "Rally containers shared by test classes, removed at session end"
+    pool = RallyContainerPool()
+    request.addfinalizer(pool.reap)
+    return pool
+
 @pytest.fixture(scope='class')
-def rally_setup(request):
+def rally_setup(request, rally_pool):
         values = {
             'concurrency': 5,
             'gre_enabled': False,
@@ -85,10 +96,10 @@ def rally_setup(request):
                 environment=request.cls.manager.env,
                 cluster_id=cluster_id,
                 test_type="empty",
-                rally_args=values
+                rally_args=values,
+                pool=rally_pool
         )
-        benchmark.engine.admin_remote.upload('rally_args.json', benchmark.engine.dir_for_home)
-        benchmark.engine.admin_remote.upload(rally_scenarios, benchmark.engine.dir_for_home)
+        sync_files(benchmark.engine.admin_remote, ['rally_args.json', rally_scenarios], benchmark.engine.dir_for_home)
         request.cls.benchmark = benchmark
 
 @pytest.mark.need_ready_cluster
@@ -126,13 +137,35 @@ class TestPerfSmoke(object):
         bench.current_task = RallyTask(bench.deployment, rally_scenario, bench.rally_args)
         logger.info('Starting Rally benchmark test {}'.format(rally_scenario))
         logfile = bench.current_task.start()
-        results = bench.current_task.get_results()
+        results_file = bench.current_task.wait_results_file('./rally_logs/')
         bench.engine.admin_remote.download(os.path.join(bench.engine.dir_for_home, logfile), './rally_logs/')
 
-        assert results, "Test {} returned no results! See log for details".format(rally_scenario)
-        results = json.loads(results)
+        assert results_file, "Test {} returned no results! See log for details".format(rally_scenario)
+        workloads, _ = read_results_file(results_file, rally_scenario, bench.current_task.uuid)
         fails = []
-        for test in results:
-            fails.extend(sla for sla in test["sla"] if not sla['success'])
+        for workload in workloads:
+            fails.extend(workload.failed_sla())
         assert len(fails) == 0, "SLA failed: {}".format(";".join(sla['detail'] for sla in fails))
 
+    @pytest.mark.scale_ci2
+    def test_run_rally_parallel(self):
+        "Run independent Rally scenarios concurrently"
+        scenarios_file = os.environ.get("RALLY_PARALLEL_SCENARIOS")
+        if not scenarios_file:
+            pytest.skip("RALLY_PARALLEL_SCENARIOS is not set")
+        # {"scenario": ["resource tag", ...], ...}
+        with open(scenarios_file) as f:
+            scenarios = json.load(f, object_pairs_hook=OrderedDict)
+        bench = self.benchmark
+        task_results = bench.run_parallel(scenarios)
+
+        fails = []
+        for scenario, result in task_results.items():
+            if result['log_file']:
+                bench.engine.admin_remote.download(os.path.join(bench.engine.dir_for_home, result['log_file']), './rally_logs/')
+            if not result['workloads']:
+                fails.append("{}: no results ({})".format(scenario, result['error']))
+                continue
+            for workload in result['workloads']:
+                fails.extend("{}: {}".format(scenario, sla['detail']) for sla in workload.failed_sla())
+        assert len(fails) == 0, "Rally scenarios failed: {}".format(";".join(fails))
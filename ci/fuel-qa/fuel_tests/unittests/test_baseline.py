@@ -0,0 +1,104 @@
+#    Copyright 2016 Mirantis, Inc.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+from __future__ import unicode_literals
+
+import os
+import shutil
+import tempfile
+import unittest
+
+import mock
+
+from fuelweb_test.testrail.baseline import SuiteBaseline
+
+
+def make_case(case_id, title, expected, updated_on):
+    return {'id': case_id, 'title': title, 'updated_on': updated_on,
+            'custom_test_case_steps': [
+                {'content': 'Check {0}'.format(title), 'expected': expected},
+                {'content': 'Other step', 'expected': 'other'}]}
+
+
+class CasesProject(object):
+    """Project answering get_cases like TestRail, counting the calls."""
+
+    def __init__(self, cases, base_url='https://testrail'):
+        self.client = mock.Mock(base_url=base_url)
+        self.cases = cases
+        self.calls = []
+
+    def iter_cases(self, suite_id, updated_after=None):
+        self.calls.append(updated_after)
+        return iter([case for case in self.cases
+                     if updated_after is None or
+                     case['updated_on'] > updated_after])
+
+
+class TestSuiteBaseline(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'baselines.json')
+        self.project = CasesProject([make_case(1, 'first', '10', 100),
+                                     make_case(2, 'second', '20', 200)])
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_expected(self):
+        baseline = SuiteBaseline(self.project, 5)
+        self.assertEqual(baseline.expected(case_id=1), '10')
+        self.assertEqual(baseline.expected(title='second', index=1), 'other')
+        self.assertEqual(baseline.expected(title='second', content='second'),
+                         '20')
+        self.assertRaises(KeyError, baseline.expected, title='third')
+        self.assertRaises(KeyError, baseline.expected, case_id=1,
+                          content='missing')
+        # the cases are fetched once per object
+        self.assertEqual(self.project.calls, [None])
+
+    def test_incremental_reload(self):
+        SuiteBaseline(self.project, 5, path=self.path).load()
+        self.project.cases[0] = make_case(1, 'first', '15', 300)
+        baseline = SuiteBaseline(self.project, 5, path=self.path)
+        self.assertEqual(baseline.expected(case_id=1), '15')
+        self.assertEqual(self.project.calls, [None, 200])
+        # the saved table now knows the newer case
+        SuiteBaseline(self.project, 5, path=self.path).load()
+        self.assertEqual(self.project.calls, [None, 200, 300])
+
+    @mock.patch('fuelweb_test.testrail.baseline.time')
+    def test_full_reload_of_old_table(self, time_mock):
+        time_mock.time.return_value = 1000
+        SuiteBaseline(self.project, 5, path=self.path, max_age=60).load()
+        del self.project.cases[1]
+        time_mock.time.return_value = 1061
+        baseline = SuiteBaseline(self.project, 5, path=self.path, max_age=60)
+        self.assertRaises(KeyError, baseline.expected, case_id=2)
+        self.assertEqual(self.project.calls, [None, None])
+
+    def test_table_is_scoped_to_testrail(self):
+        SuiteBaseline(self.project, 5, path=self.path).load()
+        other = CasesProject(self.project.cases, base_url='https://other')
+        SuiteBaseline(other, 5, path=self.path).load()
+        self.assertEqual(other.calls, [None])
+        self.assertFalse(os.path.exists(self.path))
+        self.assertEqual(len(os.listdir(self.directory)), 2)
+
+    def test_broken_file_is_reloaded(self):
+        baseline = SuiteBaseline(self.project, 5, path=self.path)
+        with open(baseline.path, 'w') as f:
+            f.write('{')
+        self.assertEqual(baseline.expected(case_id=2), '20')
+        self.assertEqual(self.project.calls, [None])
@@ -0,0 +1,168 @@
+#    Copyright 2016 Mirantis, Inc.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+from __future__ import unicode_literals
+
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+import mock
+
+from fuelweb_test.testrail.cache import endpoint_of
+from fuelweb_test.testrail.cache import ResponseCache
+from fuelweb_test.testrail.cache import scoped_path
+from fuelweb_test.testrail.cache import written_object
+from fuelweb_test.testrail.fake_server import FakeTestRailServer
+from fuelweb_test.testrail.testrail import APIClient
+from fuelweb_test.testrail.testrail import get_session
+
+
+TTL = {'get_statuses': 100, 'get_tests': 10, 'get_cases': 10}
+
+
+class TestHelpers(unittest.TestCase):
+    def test_endpoint_of(self):
+        self.assertEqual(endpoint_of('get_tests/1&status_id=5'), 'get_tests')
+        self.assertEqual(endpoint_of('get_statuses'), 'get_statuses')
+
+    def test_written_object(self):
+        self.assertEqual(written_object('add_results_for_cases'), 'result')
+        self.assertEqual(written_object('add_plan_entry'), 'plan')
+        self.assertEqual(written_object('update_run'), 'run')
+        self.assertIsNone(written_object('close'))
+
+    def test_scoped_path(self):
+        path = '/tmp/cache.json'
+        one = scoped_path(path, 'https://one', 'user')
+        self.assertEqual(one, scoped_path(path, 'https://one', 'user'))
+        self.assertNotEqual(one, scoped_path(path, 'https://two', 'user'))
+        self.assertNotEqual(one, scoped_path(path, 'https://one', 'other'))
+        self.assertTrue(one.startswith('/tmp/cache.'))
+        self.assertTrue(one.endswith('.json'))
+        self.assertIsNone(scoped_path(None, 'https://one'))
+
+
+class TestResponseCache(unittest.TestCase):
+    def test_only_listed_endpoints_are_cached(self):
+        cache = ResponseCache(TTL)
+        fetch = mock.Mock(return_value=[1])
+        cache.get_or_fetch('get_runs/1', fetch)
+        cache.get_or_fetch('get_runs/1', fetch)
+        self.assertEqual(fetch.call_count, 2)
+        cache.get_or_fetch('get_tests/1', fetch)
+        cache.get_or_fetch('get_tests/1', fetch)
+        self.assertEqual(fetch.call_count, 3)
+        self.assertEqual(cache.stats()['hits'], 1)
+
+    @mock.patch('fuelweb_test.testrail.cache.time')
+    def test_entries_expire(self, time_mock):
+        time_mock.time.return_value = 1000
+        cache = ResponseCache(TTL)
+        cache.put('get_tests/1', [1])
+        time_mock.time.return_value = 1009
+        self.assertEqual(cache.get('get_tests/1'), (True, [1]))
+        time_mock.time.return_value = 1011
+        self.assertEqual(cache.get('get_tests/1'), (False, None))
+
+    def test_callers_get_copies(self):
+        cache = ResponseCache(TTL)
+        value = [{'id': 1}]
+        cache.put('get_tests/1', value)
+        value[0]['id'] = 2
+        found, cached = cache.get('get_tests/1')
+        cached.append({'id': 3})
+        self.assertEqual(cache.get('get_tests/1'), (True, [{'id': 1}]))
+
+    def test_write_invalidates_related_endpoints(self):
+        cache = ResponseCache(TTL)
+        cache.put('get_statuses', [1])
+        cache.put('get_tests/1', [2])
+        cache.invalidate_for_write('add_results_for_cases/1')
+        self.assertTrue(cache.get('get_statuses')[0])
+        self.assertFalse(cache.get('get_tests/1')[0])
+
+    def test_unknown_write_drops_everything(self):
+        cache = ResponseCache(TTL)
+        cache.put('get_statuses', [1])
+        cache.invalidate_for_write('close')
+        self.assertFalse(cache.get('get_statuses')[0])
+
+
+class TestPersistentCache(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'cache.json')
+        # caches are saved explicitly, not to the removed directory at exit
+        patcher = mock.patch('fuelweb_test.testrail.cache.atexit')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_only_persistent_endpoints_are_saved(self):
+        cache = ResponseCache(TTL, path=self.path,
+                              persistent=['get_statuses'])
+        cache.put('get_statuses', [1])
+        cache.put('get_tests/1', [2])
+        cache.save()
+        with open(self.path) as f:
+            self.assertEqual(list(json.load(f)), ['get_statuses'])
+        loaded = ResponseCache(TTL, path=self.path,
+                               persistent=['get_statuses'])
+        self.assertEqual(loaded.get('get_statuses'), (True, [1]))
+
+    def test_save_merges_with_file(self):
+        persistent = ['get_statuses', 'get_cases']
+        first = ResponseCache(TTL, path=self.path, persistent=persistent)
+        first.put('get_statuses', [1])
+        first.save()
+        # another process saved its entries meanwhile
+        with open(self.path) as f:
+            entries = json.load(f)
+        entries['get_cases/1&suite_id=2'] = [entries['get_statuses'][0],
+                                             [3]]
+        with open(self.path, 'w') as f:
+            json.dump(entries, f)
+        first.put('get_statuses', [2])
+        first.save()
+        loaded = ResponseCache(TTL, path=self.path, persistent=persistent)
+        self.assertEqual(loaded.get('get_statuses'), (True, [2]))
+        self.assertEqual(loaded.get('get_cases/1&suite_id=2'), (True, [3]))
+
+    def test_broken_file_is_ignored(self):
+        with open(self.path, 'w') as f:
+            f.write('{')
+        cache = ResponseCache(TTL, path=self.path,
+                              persistent=['get_statuses'])
+        self.assertEqual(cache.stats()['entries'], 0)
+
+
+class TestClientCache(unittest.TestCase):
+    def setUp(self):
+        self.server = FakeTestRailServer().start()
+        self.client = APIClient(self.server.url)
+        self.client.cache = ResponseCache(TTL)
+
+    def tearDown(self):
+        get_session().close()
+        self.server.stop()
+
+    def test_get_is_served_from_cache(self):
+        self.client.send_get('get_statuses')
+        self.client.send_get('get_statuses')
+        self.assertEqual(self.server.request_counts['get_statuses'], 1)
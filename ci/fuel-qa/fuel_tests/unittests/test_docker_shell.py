@@ -0,0 +1,161 @@
+#    Copyright 2016 Mirantis, Inc.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+from __future__ import unicode_literals
+
+import re
+import unittest
+from collections import deque
+
+import mock
+
+from fuelweb_test.helpers.rally import DockerContainer
+from fuelweb_test.helpers.rally import DockerShell
+from fuelweb_test.helpers.rally import DockerShellError
+
+
+COMMAND = re.compile(r'docker exec (\S+) /bin/bash -c "(.*)" </dev/null; '
+                     r'printf "\\n(\S+) %d\\n" \$\?; ')
+
+
+class FakeChannel(object):
+    """SSH channel of a bash session answering commands with run()."""
+
+    def __init__(self, run, chunk_size=3):
+        self.run = run
+        self.chunk_size = chunk_size
+        self.stdout = deque()
+        self.stderr = deque()
+        self.exited = False
+        self.commands = []
+
+    def _chunks(self, data):
+        return [data[i:i + self.chunk_size]
+                for i in range(0, len(data), self.chunk_size)]
+
+    def write(self, line):
+        if line == 'exit\n':
+            self.exited = True
+            return
+        _, cmd, marker = COMMAND.match(line).groups()
+        self.commands.append(cmd)
+        result = self.run(cmd)
+        if result is None:
+            # the shell died while running the command
+            self.exited = True
+            return
+        out, err, exit_code = result
+        self.stdout.extend(self._chunks('{0}\n{1} {2}\n'.format(
+            out, marker, exit_code)))
+        self.stderr.extend(self._chunks('{0}\n{1}\n'.format(err, marker)))
+
+    def flush(self):
+        pass
+
+    def recv_ready(self):
+        return bool(self.stdout)
+
+    def recv(self, size):
+        return self.stdout.popleft()
+
+    def recv_stderr_ready(self):
+        return bool(self.stderr)
+
+    def recv_stderr(self, size):
+        return self.stderr.popleft()
+
+    def exit_status_ready(self):
+        return self.exited and not self.stdout and not self.stderr
+
+    def close(self):
+        self.exited = True
+
+
+def echo(cmd):
+    if cmd == 'fail':
+        return '', 'failed\n', 1
+    return 'out of {0}\nlast line'.format(cmd), 'warning\n', 0
+
+
+class TestDockerShell(unittest.TestCase):
+    def setUp(self):
+        self.channels = []
+        self.remote = mock.Mock()
+        self.remote.execute_async.side_effect = self.open_channel
+
+    def open_channel(self, cmd):
+        channel = FakeChannel(echo)
+        self.channels.append(channel)
+        return channel, channel, None, None
+
+    def test_output_is_split_by_markers(self):
+        shell = DockerShell(self.remote, 'abc')
+        self.assertEqual(shell.execute('ls'), {
+            'stdout': ['out of ls\n', 'last line'],
+            'stderr': ['warning\n'],
+            'exit_code': 0})
+        self.assertEqual(shell.execute('fail'), {
+            'stdout': [],
+            'stderr': ['failed\n'],
+            'exit_code': 1})
+        # both commands ran in one session
+        self.assertEqual(len(self.channels), 1)
+        self.assertEqual(self.channels[0].commands, ['ls', 'fail'])
+
+    def test_exited_shell_is_reopened(self):
+        shell = DockerShell(self.remote, 'abc')
+        shell.execute('ls')
+        self.channels[0].run = lambda cmd: None
+        with self.assertRaises(DockerShellError) as context:
+            shell.execute('crash')
+        self.assertTrue(context.exception.sent)
+        self.assertEqual(shell.execute('ls')['exit_code'], 0)
+        self.assertEqual(len(self.channels), 2)
+
+    def test_timeout(self):
+        shell = DockerShell(self.remote, 'abc', timeout=0)
+        shell.open()
+        self.channels[0].run = lambda cmd: None
+        self.channels[0].exit_status_ready = lambda: False
+        with self.assertRaises(DockerShellError) as context:
+            shell.execute('sleep')
+        self.assertTrue(context.exception.sent)
+        self.assertIsNone(shell._chan)
+
+
+class TestDockerContainer(unittest.TestCase):
+    def setUp(self):
+        self.remote = mock.Mock()
+        self.remote.execute.return_value = {'stdout': ['exec\n'],
+                                            'stderr': [], 'exit_code': 0}
+        self.container = DockerContainer(self.remote, persistent_shell=True)
+        self.container.id = 'abc'
+
+    def test_falls_back_to_docker_exec(self):
+        self.remote.execute_async.side_effect = IOError('No channel')
+        self.assertEqual(self.container.execute('ls')['stdout'], ['exec\n'])
+        self.remote.execute.assert_called_once_with(
+            'docker exec abc /bin/bash -c "ls"')
+
+    def test_sent_command_is_not_repeated(self):
+        channel = FakeChannel(lambda cmd: None)
+        self.remote.execute_async.return_value = (channel, channel, None,
+                                                  None)
+        self.assertEqual(self.container.execute('ls')['exit_code'], -1)
+        self.assertFalse(self.remote.execute.called)
+
+    def test_without_persistent_shell(self):
+        self.container.persistent_shell = False
+        self.container.execute('ls')
+        self.assertFalse(self.remote.execute_async.called)
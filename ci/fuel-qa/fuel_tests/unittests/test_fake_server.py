@@ -0,0 +1,129 @@
+#    Copyright 2016 Mirantis, Inc.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+from __future__ import unicode_literals
+
+import os
+import shutil
+import tempfile
+import unittest
+
+import mock
+
+from fuelweb_test.testrail import benchmark_reporters
+from fuelweb_test.testrail.fake_server import FakeTestRailServer
+from fuelweb_test.testrail.fake_server import seed_performance_suites
+from fuelweb_test.testrail.performance_testrail_report import \
+    SHAKER_CONF_TO_TITLE
+from fuelweb_test.testrail.testrail import get_session
+
+
+class TestFakeTestRailServer(unittest.TestCase):
+    def setUp(self):
+        self.server = FakeTestRailServer().start()
+        data = self.server.data
+        self.project = data.add_project('Project')
+        suite = data.add_suite(self.project['id'], 'Suite')
+        self.cases = [data.add_case(suite['id'], 'Case {0}'.format(number))
+                      for number in range(3)]
+        self.run = data.add_run(self.project['id'],
+                                {'suite_id': suite['id'], 'name': 'Run'})
+
+    def tearDown(self):
+        get_session().close()
+        self.server.stop()
+
+    def call(self, method, uri, data=None):
+        response = get_session().request(
+            method, '{0}index.php?/api/v2/{1}'.format(self.server.url, uri),
+            json=data)
+        return response.status_code, response.json()
+
+    def test_paginated_list(self):
+        code, tests = self.call(
+            'GET', 'get_tests/{0}&limit=2&offset=1'.format(self.run['id']))
+        self.assertEqual(code, 200)
+        self.assertEqual([t['title'] for t in tests], ['Case 1', 'Case 2'])
+
+    def test_results_for_cases(self):
+        code, results = self.call(
+            'POST', 'add_results_for_cases/{0}'.format(self.run['id']),
+            {'results': [{'case_id': self.cases[1]['id'], 'status_id': 5}]})
+        self.assertEqual(code, 200)
+        code, test = self.call('GET', 'get_test/{0}'.format(
+            results[0]['test_id']))
+        self.assertEqual((test['title'], test['status_id']), ('Case 1', 5))
+
+    def test_results_of_other_run_are_rejected(self):
+        other = self.server.data.add_run(
+            self.project['id'], {'suite_id': self.run['suite_id']})
+        tests = self.call('GET', 'get_tests/{0}'.format(other['id']))[1]
+        code, _ = self.call(
+            'POST', 'add_results/{0}'.format(self.run['id']),
+            {'results': [{'test_id': tests[0]['id'], 'status_id': 1}]})
+        self.assertEqual(code, 400)
+
+    def test_unknown_method(self):
+        self.assertEqual(self.call('GET', 'get_everything')[0], 400)
+        self.assertEqual(self.server.request_counts['get_everything'], 1)
+
+    def test_rate_limit(self):
+        self.server.rate_limit = 2
+        self.server.rate_period = 60
+        codes = [self.call('GET', 'get_statuses')[0] for _ in range(3)]
+        self.assertEqual(codes, [200, 200, 429])
+        stats = self.server.stats()
+        self.assertEqual((stats['total'], stats['rate_limited']), (3, 1))
+        self.server.reset_stats()
+        self.assertEqual(self.server.stats()['total'], 0)
+
+
+class TestBenchmarkReporters(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        patcher = mock.patch('fuelweb_test.helpers.timeseries.TIMESERIES_DIR',
+                             self.directory)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.server = FakeTestRailServer()
+        seed_performance_suites(self.server.data,
+                                project_name=benchmark_reporters.PROJECT_NAME)
+        self.server.start()
+
+    def tearDown(self):
+        get_session().close()
+        self.server.stop()
+        shutil.rmtree(self.directory)
+
+    def test_generated_results(self):
+        shaker = benchmark_reporters.shaker_results(agents=2, samples=5)
+        self.assertEqual(sorted(shaker), sorted(SHAKER_CONF_TO_TITLE))
+        self.assertEqual(shaker,
+                         benchmark_reporters.shaker_results(agents=2,
+                                                            samples=5))
+        horizon = benchmark_reporters.horizon_results(iterations=3)
+        self.assertTrue(horizon)
+        self.assertEqual(set(len(r['result']) for r in horizon), set([3]))
+
+    def test_round(self):
+        report = benchmark_reporters.run_round(
+            self.server,
+            benchmark_reporters.shaker_results(agents=2, samples=5),
+            benchmark_reporters.horizon_results(iterations=3))
+        self.assertEqual(sorted(report),
+                         ['cache', 'client', 'seconds', 'server'])
+        self.assertIn('shaker_send_report', report['seconds'])
+        self.assertTrue(report['server']['total'])
+        self.assertTrue(self.server.data.results)
+        self.assertEqual(len(os.listdir(self.directory)), 1)
@@ -0,0 +1,95 @@
+#    Copyright 2016 Mirantis, Inc.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+from __future__ import unicode_literals
+
+import threading
+import time
+import unittest
+
+import mock
+
+from fuelweb_test.settings import TestRailSettings
+from fuelweb_test.testrail import testrail_client
+from fuelweb_test.testrail.testrail import APIClient
+from fuelweb_test.testrail.testrail import APIError
+
+
+def offline_project():
+    # fan_out and the methods built on it need no connection
+    return testrail_client.TestRailProject.__new__(
+        testrail_client.TestRailProject)
+
+
+class TestFanOut(unittest.TestCase):
+    def test_results_keep_order(self):
+        def slow_square(item):
+            time.sleep(0.01 * (5 - item))
+            return item * item
+
+        self.assertEqual(offline_project().fan_out(slow_square, range(5)),
+                         [0, 1, 4, 9, 16])
+
+    def test_concurrency_is_bounded(self):
+        lock = threading.Lock()
+        running = [0]
+        peak = [0]
+
+        def call(item):
+            with lock:
+                running[0] += 1
+                peak[0] = max(peak[0], running[0])
+            time.sleep(0.02)
+            with lock:
+                running[0] -= 1
+            return item
+
+        offline_project().fan_out(call, range(12), concurrency=3)
+        self.assertEqual(peak[0], 3)
+
+    def test_single_item_runs_inline(self):
+        thread = offline_project().fan_out(
+            lambda item: threading.current_thread(), [1])[0]
+        self.assertIs(thread, threading.current_thread())
+
+    def test_all_results_for_case(self):
+        def results_for_case(run_id, case_id):
+            if run_id == 2:
+                raise APIError('No access', 403)
+            return [{'run_id': run_id, 'case_id': case_id}]
+
+        project = offline_project()
+        project.get_results_for_case = mock.Mock(
+            side_effect=results_for_case)
+        results = project.get_all_results_for_case([1, 2, 3], 7)
+        self.assertEqual([r['run_id'] for r in results], [1, 3])
+
+
+class TestRateLimit(unittest.TestCase):
+    @mock.patch('fuelweb_test.testrail.testrail.time.sleep')
+    def test_gives_up_after_retries(self, sleep):
+        response = mock.Mock(status_code=429, ok=False, content=b'{}',
+                             headers={})
+        response.json.return_value = {}
+        client = APIClient('http://testrail')
+        client.session = mock.Mock()
+        client.session.request.return_value = response
+        with self.assertRaises(APIError) as context:
+            client.send_get('get_projects')
+        self.assertEqual(context.exception.status_code, 429)
+        self.assertEqual(client.session.request.call_count,
+                         TestRailSettings.rate_limit_retries + 1)
+        self.assertEqual([c[0][0] for c in sleep.call_args_list],
+                         [2 ** attempt for attempt in
+                          range(TestRailSettings.rate_limit_retries)])
@@ -0,0 +1,109 @@
+#    Copyright 2016 Mirantis, Inc.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+from __future__ import unicode_literals
+
+import unittest
+
+from fuelweb_test.testrail import index
+from fuelweb_test.testrail import testrail_client
+from fuelweb_test.testrail.cache import ResponseCache
+from fuelweb_test.testrail.fake_server import FakeTestRailServer
+from fuelweb_test.testrail.testrail import get_session
+
+
+TESTS = [
+    {'id': 1, 'title': 'one', 'case_id': 10, 'custom_test_group': 'a'},
+    {'id': 2, 'title': 'two', 'case_id': 20, 'custom_test_group': 'a'},
+    {'id': 3, 'title': 'one', 'case_id': None, 'custom_test_group': 'b'},
+]
+
+
+class TestTestRunIndex(unittest.TestCase):
+    def setUp(self):
+        self.index = index.TestRunIndex(iter(TESTS))
+
+    def test_lookups(self):
+        self.assertEqual(len(self.index), 3)
+        self.assertEqual(self.index.by_id[2]['title'], 'two')
+        self.assertEqual(self.index.get_by_case_id(20)['id'], 2)
+        self.assertIsNone(self.index.get_by_case_id(30))
+
+    def test_first_test_wins(self):
+        self.assertEqual(self.index.get_by_title('one')['id'], 1)
+        self.assertEqual(self.index.get_by_group('a')['id'], 1)
+
+    def test_group_lookups(self):
+        self.assertEqual([t['id'] for t in self.index.get_all_by_group('a')],
+                         [1, 2])
+        self.assertEqual(self.index.get_all_by_group('c'), [])
+        self.assertIsNone(self.index.get_by_group('c'))
+        self.assertEqual(
+            self.index.get_by_title_and_group('one', 'b')['id'], 3)
+        self.assertIsNone(self.index.get_by_title_and_group('two', 'b'))
+
+    def test_custom_key(self):
+        def key(test):
+            return test['case_id'] and test['case_id'] // 10
+
+        by_key = self.index.by_key(key)
+        self.assertEqual(sorted(by_key), [1, 2])
+        self.assertIs(by_key, self.index.by_key(key))
+
+
+class TestProjectRunIndex(unittest.TestCase):
+    def setUp(self):
+        self.server = FakeTestRailServer().start()
+        data = self.server.data
+        project = data.add_project('Project')
+        suite = data.add_suite(project['id'], 'Suite')
+        for number in range(3):
+            data.add_case(suite['id'], 'Case {0}'.format(number),
+                          group='group_{0}'.format(number))
+        self.run = data.add_run(project['id'], {'suite_id': suite['id'],
+                                                'name': 'Run'})
+        self.project = testrail_client.TestRailProject(
+            self.server.url, 'user', 'password', 'Project',
+            cache=ResponseCache({}))
+
+    def tearDown(self):
+        get_session().close()
+        self.server.stop()
+
+    def test_run_is_listed_once(self):
+        for number in range(3):
+            test = self.project.get_test_by_group(
+                self.run['id'], 'group_{0}'.format(number))
+            self.assertEqual(test['title'], 'Case {0}'.format(number))
+        self.assertEqual(self.server.request_counts['get_tests'], 1)
+        # found tests are full get_test responses
+        self.assertEqual(self.server.request_counts['get_test'], 3)
+
+    def test_lookup_of_missing_test(self):
+        self.assertIsNone(
+            self.project.get_test_by_name(self.run['id'], 'Missing'))
+        self.assertNotIn('get_test', self.server.request_counts)
+
+    def test_index_is_dropped_after_results(self):
+        test = self.project.get_test_by_name(self.run['id'], 'Case 0')
+        self.project.add_raw_results_for_test(test['id'], {'status_id': 1})
+        test = self.project.get_test_by_name(self.run['id'], 'Case 0')
+        self.assertEqual(test['status_id'], 1)
+        self.assertEqual(self.server.request_counts['get_tests'], 2)
+
+    def test_unrelated_results_keep_index(self):
+        self.project.get_run_index(self.run['id'])
+        self.project.invalidate_test_index(100500)
+        self.project.get_run_index(self.run['id'])
+        self.assertEqual(self.server.request_counts['get_tests'], 1)
@@ -0,0 +1,103 @@
+#    Copyright 2016 Mirantis, Inc.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+from __future__ import unicode_literals
+
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+import mock
+
+from fuelweb_test.testrail import metrics
+from fuelweb_test.testrail.fake_server import FakeTestRailServer
+from fuelweb_test.testrail.metrics import percentile
+from fuelweb_test.testrail.metrics import RequestStats
+from fuelweb_test.testrail.testrail import APIClient
+from fuelweb_test.testrail.testrail import APIError
+from fuelweb_test.testrail.testrail import get_session
+
+
+class TestRequestStats(unittest.TestCase):
+    def test_percentile(self):
+        values = list(range(1, 11))
+        self.assertEqual(percentile(values, 0), 1)
+        self.assertEqual(percentile(values, 90), 9)
+        self.assertEqual(percentile(values, 100), 10)
+        self.assertIsNone(percentile([], 50))
+
+    def test_endpoints(self):
+        stats = RequestStats()
+        stats.record('get_tests/1', 0.5, decoded_bytes_received=100,
+                     status_code=200)
+        stats.record('get_tests/2&status_id=5', 1.5, status_code=429)
+        stats.record('add_results/1', 0.25, bytes_sent=10, status_code=400)
+        stats.record('add_results/1', 0.25, bytes_sent=10)
+        totals = stats.as_dict()
+        self.assertEqual(totals['calls'], 4)
+        self.assertEqual(totals['seconds'], 2.5)
+        self.assertEqual(totals['bytes_sent'], 20)
+        self.assertEqual(totals['decoded_bytes_received'], 100)
+        tests = totals['endpoints']['get_tests']
+        self.assertEqual((tests['calls'], tests['errors'],
+                          tests['rate_limited']), (2, 0, 1))
+        self.assertEqual(tests['latency']['max'], 1.5)
+        # requests without a response are errors too
+        self.assertEqual(totals['endpoints']['add_results']['errors'], 2)
+        stats.reset()
+        self.assertEqual(stats.as_dict()['calls'], 0)
+
+    def test_dump(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        path = os.path.join(directory, 'stats.json')
+        stats = RequestStats()
+        stats.record('get_statuses', 0.1, status_code=200)
+        stats.dump(path)
+        with open(path) as f:
+            self.assertEqual(json.load(f)['calls'], 1)
+        # a failed dump is only logged
+        stats.dump(os.path.join(directory, 'missing', 'stats.json'))
+
+    @mock.patch.object(metrics, 'request_stats')
+    @mock.patch('fuelweb_test.testrail.metrics.TestRailSettings')
+    def test_dump_at_exit(self, settings, request_stats):
+        settings.stats_file = None
+        metrics._dump_at_exit()
+        self.assertFalse(request_stats.dump.called)
+        settings.stats_file = '/tmp/stats.json'
+        request_stats.as_dict.return_value = {'calls': 1}
+        metrics._dump_at_exit()
+        request_stats.dump.assert_called_once_with('/tmp/stats.json')
+
+
+class TestClientStats(unittest.TestCase):
+    def setUp(self):
+        self.server = FakeTestRailServer().start()
+        self.client = APIClient(self.server.url)
+        self.client.stats = RequestStats()
+
+    def tearDown(self):
+        get_session().close()
+        self.server.stop()
+
+    def test_requests_are_recorded(self):
+        self.client.send_get('get_statuses')
+        self.assertRaises(APIError, self.client.send_get, 'get_project/1')
+        endpoints = self.client.stats.as_dict()['endpoints']
+        self.assertEqual(endpoints['get_statuses']['calls'], 1)
+        self.assertTrue(endpoints['get_statuses']['decoded_bytes_received'])
+        self.assertEqual(endpoints['get_project']['errors'], 1)
@@ -0,0 +1,65 @@
+#    Copyright 2016 Mirantis, Inc.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+from __future__ import unicode_literals
+
+import socket
+import sys
+import unittest
+
+import mock
+
+from fuelweb_test.testrail import testrail_client
+from fuelweb_test.testrail.check_offline_collection import NetworkGuard
+
+
+class TestLazyTestRailProject(unittest.TestCase):
+    @mock.patch.object(testrail_client, 'TestRailProject')
+    def test_project_is_created_on_first_access(self, project_class):
+        class Reporter(object):
+            project = testrail_client.LazyTestRailProject(
+                'https://testrail', 'user', 'password', 'Project')
+
+        self.assertFalse(project_class.called)
+        self.assertIs(Reporter.project, project_class.return_value)
+        self.assertIs(Reporter().project, project_class.return_value)
+        project_class.assert_called_once_with(
+            'https://testrail', 'user', 'password', 'Project')
+
+
+class TestNetworkGuard(unittest.TestCase):
+    def test_access_is_refused_and_recorded(self):
+        connect = socket.socket.connect
+        with NetworkGuard() as guard:
+            sock = socket.socket()
+            try:
+                self.assertRaises(socket.error, sock.connect,
+                                  ('testrail', 443))
+            finally:
+                sock.close()
+            self.assertRaises(socket.error, socket.getaddrinfo,
+                              'testrail', 443)
+        self.assertEqual(guard.attempts,
+                         [('socket.connect', (('testrail', 443),)),
+                          ('getaddrinfo', ('testrail', 443))])
+        self.assertEqual(socket.socket.connect, connect)
+
+    def test_reporters_import_offline(self):
+        module = 'fuelweb_test.testrail.performance_testrail_report'
+        imported = sys.modules.pop(module, None)
+        if imported is not None:
+            self.addCleanup(sys.modules.__setitem__, module, imported)
+        with NetworkGuard() as guard:
+            __import__(module)
+        self.assertEqual(guard.attempts, [])
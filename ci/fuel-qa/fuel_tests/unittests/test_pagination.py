@@ -0,0 +1,122 @@
+#    Copyright 2016 Mirantis, Inc.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+from __future__ import unicode_literals
+
+import threading
+import unittest
+
+from fuelweb_test.testrail import testrail_client
+from fuelweb_test.testrail.cache import ResponseCache
+from fuelweb_test.testrail.fake_server import FakeTestRailServer
+from fuelweb_test.testrail.pagination import iter_paginated
+from fuelweb_test.testrail.pagination import page_items
+from fuelweb_test.testrail.testrail import APIError
+from fuelweb_test.testrail.testrail import get_session
+
+
+class ListClient(object):
+    """Client answering with slices of items like old TestRail versions."""
+
+    def __init__(self, total, ignore_offset=False, fail_offset=None):
+        self.items = [{'id': i} for i in range(total)]
+        self.ignore_offset = ignore_offset
+        self.fail_offset = fail_offset
+        self.uris = []
+        self._lock = threading.Lock()
+
+    def send_get(self, uri):
+        with self._lock:
+            self.uris.append(uri)
+        params = dict(part.split('=') for part in uri.split('&')[1:])
+        limit = int(params['limit'])
+        offset = 0 if self.ignore_offset else int(params['offset'])
+        if offset == self.fail_offset:
+            raise APIError('Failed page', 500)
+        return self.items[offset:offset + limit]
+
+
+class TestPageItems(unittest.TestCase):
+    def test_list_page(self):
+        self.assertEqual(page_items([1, 2], 'cases', 2), ([1, 2], True))
+        self.assertEqual(page_items([1], 'cases', 2), ([1], False))
+
+    def test_dict_page(self):
+        page = {'cases': [1, 2], '_links': {'next': '/api/v2/get_cases'}}
+        self.assertEqual(page_items(page, 'cases', 250), ([1, 2], True))
+        page = {'cases': [1, 2], '_links': {'next': None}}
+        self.assertEqual(page_items(page, 'cases', 2), ([1, 2], False))
+
+
+class TestIterPaginated(unittest.TestCase):
+    def test_all_pages(self):
+        client = ListClient(25)
+        items = list(iter_paginated(client, 'get_cases/1', 'cases', 10))
+        self.assertEqual([item['id'] for item in items], list(range(25)))
+        self.assertEqual(client.uris, [
+            'get_cases/1&limit=10&offset=0',
+            'get_cases/1&limit=10&offset=10',
+            'get_cases/1&limit=10&offset=20'])
+
+    def test_full_last_page(self):
+        client = ListClient(20)
+        items = list(iter_paginated(client, 'get_cases/1', 'cases', 10,
+                                    prefetch=False))
+        self.assertEqual(len(items), 20)
+        # the empty page tells there is nothing more
+        self.assertEqual(len(client.uris), 3)
+
+    def test_stop_early(self):
+        client = ListClient(100)
+        items = iter_paginated(client, 'get_cases/1', 'cases', 10,
+                               prefetch=False)
+        self.assertEqual([next(items)['id'] for _ in range(3)], [0, 1, 2])
+        # only the next page is requested ahead
+        self.assertEqual(client.uris, ['get_cases/1&limit=10&offset=0',
+                                       'get_cases/1&limit=10&offset=10'])
+
+    def test_offset_ignored(self):
+        client = ListClient(15, ignore_offset=True)
+        items = list(iter_paginated(client, 'get_cases/1', 'cases', 10))
+        self.assertEqual(len(items), 10)
+
+    def test_error_of_prefetched_page(self):
+        client = ListClient(25, fail_offset=10)
+        items = iter_paginated(client, 'get_cases/1', 'cases', 10)
+        for _ in range(10):
+            next(items)
+        self.assertRaises(APIError, next, items)
+
+
+class TestProjectPagination(unittest.TestCase):
+    def setUp(self):
+        self.server = FakeTestRailServer().start()
+        project = self.server.data.add_project('Project')
+        self.suite = self.server.data.add_suite(project['id'], 'Suite')
+        for number in range(600):
+            self.server.data.add_case(self.suite['id'],
+                                      'Case {0}'.format(number))
+        self.project = testrail_client.TestRailProject(
+            self.server.url, 'user', 'password', 'Project',
+            cache=ResponseCache({}))
+
+    def tearDown(self):
+        get_session().close()
+        self.server.stop()
+
+    def test_get_cases(self):
+        cases = self.project.get_cases(self.suite['id'])
+        self.assertEqual(len(cases), 600)
+        self.assertEqual(len(set(case['id'] for case in cases)), 600)
+        self.assertEqual(self.server.request_counts['get_cases'], 3)
@@ -0,0 +1,115 @@
+#    Copyright 2016 Mirantis, Inc.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+from __future__ import unicode_literals
+
+import json
+import unittest
+
+import mock
+
+from fuelweb_test.helpers import rally
+from fuelweb_test.helpers.rally import RallyDeployment
+
+
+AUTH_URL = 'http://10.109.1.2:5000/v2.0/'
+
+
+def config_lines(d_uuid, config):
+    lines = ['=== deployment {0}\n'.format(d_uuid)]
+    lines.extend('{0}\n'.format(line)
+                 for line in json.dumps(config, indent=4).splitlines())
+    return lines
+
+
+def config(auth_url, username, tenant_name, nested=False):
+    data = {'type': 'ExistingCloud', 'auth_url': auth_url,
+            'admin': {'username': username, 'password': 'secret',
+                      'tenant_name': tenant_name}}
+    return {'openstack': data} if nested else data
+
+
+class TestRallyDeployments(unittest.TestCase):
+    def setUp(self):
+        self.deployments = []
+        self.container = mock.Mock()
+        self.container.execute.side_effect = self.execute
+        # RallyEngine() sets up the container, only deployments are tested
+        self.engine = rally.RallyEngine.__new__(rally.RallyEngine)
+        self.engine.rally_container = self.container
+        self.engine._deployments = None
+
+    def execute(self, cmd):
+        stdout = []
+        if cmd.startswith('for d in'):
+            for d_uuid, data in self.deployments:
+                stdout.extend(config_lines(d_uuid, data))
+        elif cmd.startswith('rally deployment create'):
+            self.deployments.append(
+                ('new', config(AUTH_URL, 'admin', 'admin')))
+        return {'stdout': stdout, 'stderr': [], 'exit_code': 0}
+
+    def test_read_deployments(self):
+        self.deployments = [
+            ('one', config('http://10.109.0.2:5000/v2.0', 'admin', 'admin')),
+            ('two', config(AUTH_URL, 'admin', 'admin', nested=True)),
+            ('three', config(AUTH_URL, 'admin', 'admin')),
+        ]
+        self.assertEqual(self.engine.read_deployments(), {
+            ('http://10.109.0.2:5000/v2.0', 'admin', 'admin'): 'one',
+            # the latest of deployments with the same credentials wins
+            ('http://10.109.1.2:5000/v2.0', 'admin', 'admin'): 'three'})
+
+    @mock.patch.object(rally, 'logger')
+    def test_broken_config_is_skipped(self, logger):
+        self.container.execute.side_effect = None
+        self.container.execute.return_value = {
+            'stdout': (config_lines('one', {})[:1] + ['{\n'] +
+                       config_lines('two', config(AUTH_URL, 'admin',
+                                                  'admin'))),
+            'stderr': [], 'exit_code': 0}
+        self.assertEqual(list(self.engine.read_deployments().values()),
+                         ['two'])
+        self.assertTrue(logger.warning.called)
+
+    def test_deployments_are_read_once(self):
+        self.deployments = [('one', config(AUTH_URL, 'admin', 'admin'))]
+        for _ in range(3):
+            self.assertEqual(
+                self.engine.find_deployment(AUTH_URL, 'admin', 'admin'),
+                'one')
+        self.assertIsNone(self.engine.find_deployment(AUTH_URL, 'demo',
+                                                      'demo'))
+        self.assertEqual(self.container.execute.call_count, 1)
+        self.engine.invalidate_deployments()
+        self.engine.find_deployment(AUTH_URL, 'admin', 'admin')
+        self.assertEqual(self.container.execute.call_count, 2)
+
+    def commands(self, prefix):
+        return [c[0][0] for c in self.container.execute.call_args_list
+                if c[0][0].startswith(prefix)]
+
+    def test_existing_deployment_is_reused(self):
+        self.deployments = [('one', config(AUTH_URL, 'admin', 'admin'))]
+        deployment = RallyDeployment(self.engine, '10.109.1.2', 'admin',
+                                     'secret', 'admin')
+        self.assertEqual(deployment.uuid, 'one')
+        self.assertEqual(self.commands('rally deployment create'), [])
+
+    def test_deployment_is_created(self):
+        deployment = RallyDeployment(self.engine, '10.109.1.2', 'admin',
+                                     'secret', 'admin')
+        self.assertEqual(deployment.uuid, 'new')
+        self.assertEqual(self.commands('rally deployment check'),
+                         ['rally deployment check new'])
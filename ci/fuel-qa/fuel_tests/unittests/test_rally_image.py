@@ -0,0 +1,120 @@
+#    Copyright 2016 Mirantis, Inc.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+from __future__ import unicode_literals
+
+import os
+import shutil
+import tempfile
+import unittest
+
+import mock
+
+from fuelweb_test.helpers import rally
+
+
+REPO = 'rallyforge/rally'
+
+
+def result(stdout=(), exit_code=0):
+    return {'stdout': list(stdout), 'stderr': [], 'exit_code': exit_code}
+
+
+class TestRallyImage(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        self.plugins = os.path.join(self.directory, 'fuelweb_test', 'rally',
+                                    'plugins')
+        os.makedirs(self.plugins)
+        self.write_plugin('horizon.py', 'class Horizon(object): pass')
+        self.cache_dir = os.path.join(self.directory, 'cache')
+        for name, value in (('RALLY_IMAGE_CACHE_DIR', self.cache_dir),
+                            ('RALLY_IMAGE_CACHE_KEEP', 2)):
+            patcher = mock.patch.object(rally, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        patcher = mock.patch.dict(os.environ, {'WORKSPACE': self.directory})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.base_id = 'sha256:1111'
+        self.images = [[REPO, 'latest']]
+        self.remote = mock.Mock()
+        self.remote.execute.side_effect = self.execute
+        # RallyEngine() sets up the container, only its image methods are
+        # tested here
+        self.engine = rally.RallyEngine.__new__(rally.RallyEngine)
+        self.engine.admin_remote = self.remote
+        self.engine.container_repo = REPO
+
+    def write_plugin(self, name, content):
+        with open(os.path.join(self.plugins, name), 'w') as f:
+            f.write(content)
+
+    def execute(self, cmd):
+        if cmd.startswith('docker inspect'):
+            return result([self.base_id + '\n'])
+        if cmd.startswith('docker images'):
+            return result(' '.join(image) + '\n' for image in self.images)
+        return result()
+
+    def test_image_hash(self):
+        image_hash = self.engine.image_hash()
+        self.assertEqual(len(image_hash), 12)
+        self.assertEqual(image_hash, self.engine.image_hash())
+        self.write_plugin('horizon.py', 'class Horizon(object): x = 1')
+        plugin_hash = self.engine.image_hash()
+        self.assertNotEqual(plugin_hash, image_hash)
+        self.base_id = 'sha256:2222'
+        self.assertNotEqual(self.engine.image_hash(), plugin_hash)
+
+    def test_image_exists(self):
+        self.images.append([REPO, 'ready-abc'])
+        self.assertTrue(self.engine.image_exists('ready-abc'))
+        self.assertFalse(self.engine.image_exists('ready-def'))
+
+    def test_save_image_to_cache(self):
+        def download(remote_path, local_path):
+            with open(local_path, 'w') as f:
+                f.write('image')
+
+        self.remote.download.side_effect = download
+        self.engine.save_image_to_cache('ready-abc')
+        self.assertEqual(os.listdir(self.cache_dir),
+                         ['rallyforge_rally-ready-abc.tar'])
+
+    def test_prune_images(self):
+        self.images.extend([[REPO, 'ready-old'], [REPO, 'ready-4'],
+                            ['other/rally', 'ready-old']])
+        os.makedirs(self.cache_dir)
+        names = ['rallyforge_rally-ready-{0}.tar'.format(number)
+                 for number in range(5)]
+        names.append('other_rally-ready-0.tar')
+        for age, name in enumerate(names):
+            path = os.path.join(self.cache_dir, name)
+            open(path, 'w').close()
+            os.utime(path, (1000 - age, 1000 - age))
+
+        self.engine.prune_images('ready-4')
+
+        removed = [c[0][0] for c in self.remote.execute.call_args_list
+                   if c[0][0].startswith('docker rmi')]
+        self.assertEqual(removed, ['docker rmi {0}:ready-old'.format(REPO)])
+        # the two newest and the kept one stay
+        self.assertEqual(sorted(os.listdir(self.cache_dir)),
+                         ['other_rally-ready-0.tar',
+                          'rallyforge_rally-ready-0.tar',
+                          'rallyforge_rally-ready-1.tar',
+                          'rallyforge_rally-ready-4.tar'])
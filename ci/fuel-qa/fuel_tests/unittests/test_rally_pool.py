@@ -0,0 +1,93 @@
+#    Copyright 2016 Mirantis, Inc.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+from __future__ import unicode_literals
+
+import unittest
+
+import mock
+
+from fuelweb_test.helpers import rally
+from fuelweb_test.helpers.rally import RallyContainerPool
+
+
+def new_engine(**kwargs):
+    engine = mock.Mock(**kwargs)
+    engine.rally_container.is_running.return_value = True
+    return engine
+
+
+class TestRallyContainerPool(unittest.TestCase):
+    def setUp(self):
+        for name, factory in (('RallyEngine', new_engine),
+                              ('RallyDeployment', mock.Mock),
+                              ('time', None)):
+            patcher = mock.patch.object(rally, name)
+            mocked = patcher.start()
+            if factory is not None:
+                mocked.side_effect = factory
+            setattr(self, name, mocked)
+            self.addCleanup(patcher.stop)
+        self.time.time.return_value = 1000
+        self.pool = RallyContainerPool(idle_timeout=60)
+        self.remote = mock.Mock(host='10.109.0.2')
+
+    def get_engine(self, repo='rallyforge/rally', home='/var/rally-1/'):
+        return self.pool.get_engine(self.remote, repo, 'http://proxy', home)
+
+    def get_deployment(self, engine, username='admin'):
+        return self.pool.get_deployment(engine, '10.109.1.2', username,
+                                        'secret', 'admin')
+
+    def test_engine_is_reused(self):
+        engine = self.get_engine()
+        self.assertIs(self.get_engine(), engine)
+        self.assertIsNot(self.get_engine(home='/var/rally-2/'), engine)
+        self.assertEqual(self.RallyEngine.call_count, 2)
+
+    def test_stopped_container_is_replaced(self):
+        engine = self.get_engine()
+        deployment = self.get_deployment(engine)
+        engine.rally_container.is_running.return_value = False
+        other = self.get_engine()
+        self.assertIsNot(other, engine)
+        self.assertTrue(engine.rally_container.remove.called)
+        # deployments of the removed engine are not reused
+        self.assertIsNot(self.get_deployment(other), deployment)
+
+    def test_deployment_is_reused(self):
+        engine = self.get_engine()
+        deployment = self.get_deployment(engine)
+        self.assertIs(self.get_deployment(engine), deployment)
+        self.assertIsNot(self.get_deployment(engine, username='demo'),
+                         deployment)
+        self.assertEqual(self.RallyDeployment.call_args[1]['force_create'],
+                         False)
+
+    def test_idle_containers_are_removed(self):
+        idle = self.get_engine()
+        self.time.time.return_value = 1030
+        used = self.get_engine(home='/var/rally-2/')
+        self.time.time.return_value = 1070
+        self.get_engine(home='/var/rally-2/')
+        self.assertTrue(idle.rally_container.stop.called)
+        self.assertFalse(used.rally_container.stop.called)
+        self.assertIsNot(self.get_engine(), idle)
+
+    def test_reap_all(self):
+        engines = [self.get_engine(), self.get_engine(home='/var/rally-2/')]
+        self.pool.reap()
+        for engine in engines:
+            self.assertTrue(engine.rally_container.remove.called)
+        self.assertIsNot(self.get_engine(), engines[0])
@@ -0,0 +1,216 @@
+#    Copyright 2016 Mirantis, Inc.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+from __future__ import unicode_literals
+
+import io
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+import mock
+
+from fuelweb_test.helpers import rally
+from fuelweb_test.helpers.rally import iter_rally_workloads
+from fuelweb_test.helpers.rally import RallyResult
+from fuelweb_test.helpers.rally import read_results_file
+from fuelweb_test.helpers.timeseries import RallyTimeSeries
+
+
+RESULTS = [
+    {
+        'key': {'name': 'NovaServers.boot_and_delete_server',
+                'kw': {'args': {'flavor': 'm1.tiny'}}},
+        'sla': [{'criterion': 'failure_rate', 'success': True}],
+        'full_duration': 30.5,
+        'load_duration': 20.0,
+        'result': [
+            {'timestamp': 1000.0, 'duration': 4.0, 'error': [],
+             'atomic_actions': {'nova.boot_server': 3.0,
+                                'nova.delete_server': 1.0}},
+            {'timestamp': 1005.0, 'duration': 2.0, 'error': [],
+             'atomic_actions': {'nova.boot_server': 1.5,
+                                'nova.delete_server': 0.5}},
+            {'timestamp': 1010.0, 'duration': 9.0,
+             'error': ['Timeout', 'Server is not active', ''],
+             'atomic_actions': {'nova.boot_server': None}},
+        ]
+    },
+    {
+        'key': {'name': 'Authenticate.keystone', 'kw': {}},
+        'sla': [{'criterion': 'max_seconds', 'success': False}],
+        'full_duration': 10,
+        'load_duration': 5,
+        'result': [
+            {'timestamp': 2000.0, 'duration': 0.5, 'error': [],
+             'atomic_actions': [{'name': 'keystone.token',
+                                 'started_at': 2000.0,
+                                 'finished_at': 2000.25}]},
+        ]
+    },
+]
+
+
+def results_file():
+    return io.BytesIO(json.dumps(RESULTS).encode('utf-8'))
+
+
+def summary(workload):
+    return {'index': workload.index,
+            'name': workload.name,
+            'sla_success': workload.sla_success,
+            'full_duration': workload.full_duration,
+            'load_duration': workload.load_duration,
+            'iterations': workload.iterations,
+            'errors': workload.errors,
+            'duration': (workload.duration_total, workload.duration_min,
+                         workload.duration_max),
+            'atomic_actions': dict(workload.atomic_actions)}
+
+
+EXPECTED = [
+    {'index': 0,
+     'name': 'NovaServers.boot_and_delete_server',
+     'sla_success': True,
+     'full_duration': 30.5,
+     'load_duration': 20.0,
+     'iterations': 3,
+     'errors': 1,
+     'duration': (6.0, 2.0, 4.0),
+     'atomic_actions': {
+         'nova.boot_server': {'count': 2, 'total': 4.5, 'min': 1.5,
+                              'max': 3.0},
+         'nova.delete_server': {'count': 2, 'total': 1.5, 'min': 0.5,
+                                'max': 1.0}}},
+    {'index': 1,
+     'name': 'Authenticate.keystone',
+     'sla_success': False,
+     'full_duration': 10.0,
+     'load_duration': 5.0,
+     'iterations': 1,
+     'errors': 0,
+     'duration': (0.5, 0.5, 0.5),
+     'atomic_actions': {
+         'keystone.token': {'count': 1, 'total': 0.25, 'min': 0.25,
+                            'max': 0.25}}},
+]
+
+
+class TestIterRallyWorkloads(unittest.TestCase):
+    @unittest.skipIf(rally.ijson is None, 'ijson is not installed')
+    def test_incremental_parsing(self):
+        workloads = [summary(w) for w in iter_rally_workloads(results_file())]
+        self.assertEqual(workloads, EXPECTED)
+
+    @mock.patch.object(rally, 'logger')
+    @mock.patch.object(rally, 'ijson', None)
+    def test_without_ijson(self, logger):
+        workloads = [summary(w) for w in iter_rally_workloads(results_file())]
+        self.assertEqual(workloads, EXPECTED)
+        self.assertTrue(logger.warning.called)
+
+    def test_on_iteration(self):
+        seen = []
+        for _ in iter_rally_workloads(
+                results_file(),
+                lambda workload, iteration: seen.append(
+                    (workload.index, iteration['timestamp']))):
+            pass
+        self.assertEqual(seen, [(0, 1000.0), (0, 1005.0), (0, 1010.0),
+                                (1, 2000.0)])
+
+    def test_empty_results(self):
+        self.assertEqual(list(iter_rally_workloads(io.BytesIO(b'[]'))), [])
+
+
+class TestReadResultsFile(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+
+    def test_timeseries_is_saved(self):
+        path = os.path.join(self.directory, 'scenario_results.json')
+        with open(path, 'wb') as f:
+            f.write(results_file().getvalue())
+        workloads, timeseries_file = read_results_file(path, 'scenario',
+                                                       'uuid')
+        self.assertEqual([summary(w) for w in workloads], EXPECTED)
+        self.assertEqual(timeseries_file,
+                         os.path.join(self.directory,
+                                      'scenario_results.npz'))
+        series = RallyTimeSeries.load(timeseries_file)
+        self.assertEqual(series.workloads,
+                         ['NovaServers.boot_and_delete_server',
+                          'Authenticate.keystone'])
+        self.assertEqual(list(series.durations(workload=0)), [4.0, 2.0])
+
+
+class TestRallyResult(unittest.TestCase):
+    def setUp(self):
+        self.result = RallyResult(json_results=json.dumps(RESULTS))
+        self.boot, self.auth = self.result.workloads
+
+    def test_totals(self):
+        self.assertEqual(self.result.values, {'full_duration': 40.5,
+                                              'load_duration': 25.0,
+                                              'errors': 1})
+        self.assertEqual(self.auth.summary.failed_sla(),
+                         [RESULTS[1]['sla'][0]])
+
+    def test_workload_timings(self):
+        self.assertEqual(self.boot.name,
+                         'NovaServers.boot_and_delete_server')
+        self.assertEqual((self.boot.iterations, self.boot.errors),
+                         (3, 1))
+        self.assertAlmostEqual(self.boot.error_rate, 1 / 3.0)
+        # successful iterations per second of load
+        self.assertEqual(self.boot.throughput, 0.1)
+        self.assertEqual(list(self.boot.values()), [4.0, 2.0])
+        self.assertEqual(list(self.boot.values('nova.boot_server')),
+                         [3.0, 1.5])
+
+    def test_stats(self):
+        stats = self.boot.stats()
+        self.assertEqual((stats['count'], stats['min'], stats['max'],
+                          stats['mean'], stats['stdev'], stats['p50']),
+                         (2, 2.0, 4.0, 3.0, 1.0, 3.0))
+        self.assertEqual(self.auth.stats('keystone.token')['max'], 0.25)
+        timings = RallyResult(json_results=json.dumps([{
+            'key': {'name': 'Failing'}, 'sla': [],
+            'result': [{'duration': 1, 'error': ['Failed']}]}]))
+        failing = timings.workloads[0]
+        self.assertEqual(failing.stats()['count'], 0)
+        self.assertIsNone(failing.stats()['p90'])
+        self.assertIsNone(failing.percentile(90))
+        self.assertEqual(failing.throughput, 0.0)
+
+    def test_report(self):
+        report = self.result.report()
+        self.assertEqual([w['name'] for w in report],
+                         ['NovaServers.boot_and_delete_server',
+                          'Authenticate.keystone'])
+        self.assertEqual(list(report[0]['atomic_actions']),
+                         list(self.boot.atomic_actions))
+        json.dumps(report)
+
+    def test_results_file(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        path = os.path.join(directory, 'results.json')
+        with open(path, 'wb') as f:
+            f.write(results_file().getvalue())
+        result = RallyResult(results_file=path)
+        self.assertEqual(result.values, self.result.values)
@@ -0,0 +1,139 @@
+#    Copyright 2016 Mirantis, Inc.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+from __future__ import unicode_literals
+
+import threading
+import time
+import unittest
+
+import mock
+
+from fuelweb_test.helpers import rally
+from fuelweb_test.helpers.rally import RallyTaskError
+from fuelweb_test.helpers.rally import RallyTaskScheduler
+
+
+class Tracker(object):
+    """Records which scenarios run at the same time."""
+
+    def __init__(self):
+        self.running = set()
+        self.started = []
+        self.overlaps = []
+        self.peak = 0
+        self.lock = threading.Lock()
+
+    def task_class(self, failing=()):
+        tracker = self
+
+        class FakeTask(object):
+            def __init__(self, deployment, scenario, rally_args):
+                self.scenario = scenario
+                self.uuid = None
+                self.log_file = None
+
+            def start(self):
+                self.log_file = '{0}.log'.format(self.scenario)
+                if self.scenario in failing:
+                    raise RallyTaskError('Failed to start')
+                with tracker.lock:
+                    tracker.started.append(self.scenario)
+                    tracker.overlaps.append(frozenset(tracker.running))
+                    tracker.running.add(self.scenario)
+                    tracker.peak = max(tracker.peak, len(tracker.running))
+                return self.log_file
+
+            def wait_results_file(self, local_dir):
+                time.sleep(0.02)
+                with tracker.lock:
+                    tracker.running.discard(self.scenario)
+                # a failed task has no results
+                return None
+
+        return FakeTask
+
+
+class TestRallyTaskScheduler(unittest.TestCase):
+    def setUp(self):
+        self.tracker = Tracker()
+
+    def run_scheduler(self, scheduler, failing=()):
+        with mock.patch.object(rally, 'RallyTask',
+                               self.tracker.task_class(failing)):
+            return scheduler.run()
+
+    def test_concurrency_is_bounded(self):
+        scheduler = RallyTaskScheduler(None, {}, max_concurrency=2)
+        for number in range(6):
+            scheduler.add('scenario_{0}'.format(number))
+        results = self.run_scheduler(scheduler)
+        self.assertEqual(list(results),
+                         ['scenario_{0}'.format(n) for n in range(6)])
+        self.assertEqual(self.tracker.peak, 2)
+        self.assertTrue(all(r['error'] is None for r in results.values()))
+
+    def test_scenarios_sharing_tag_do_not_overlap(self):
+        scheduler = RallyTaskScheduler(None, {}, max_concurrency=4)
+        scheduler.add('ips_1', tags=['floating_ips'])
+        scheduler.add('ips_2', tags=['floating_ips'])
+        scheduler.add('other')
+        self.run_scheduler(scheduler)
+        # 'other' does not wait for the tag
+        self.assertEqual(self.tracker.started[-1], 'ips_2')
+        for scenario, overlap in zip(self.tracker.started,
+                                     self.tracker.overlaps):
+            if scenario.startswith('ips'):
+                self.assertFalse(set(['ips_1', 'ips_2']) & overlap)
+
+    def test_failed_scenario(self):
+        scheduler = RallyTaskScheduler(None, {})
+        scheduler.add('broken', tags=['floating_ips'])
+        scheduler.add('ips', tags=['floating_ips'])
+        results = self.run_scheduler(scheduler, failing=['broken'])
+        self.assertIsInstance(results['broken']['error'], RallyTaskError)
+        self.assertEqual(results['broken']['log_file'], 'broken.log')
+        # the tag of the failed scenario is released
+        self.assertIsNone(results['ips']['error'])
+
+
+class TestRallyTaskStart(unittest.TestCase):
+    def setUp(self):
+        deployment = mock.Mock()
+        self.task = rally.RallyTask(deployment, 'scenario', {})
+        patcher = mock.patch('fuelweb_test.helpers.rally.time')
+        self.sleep = patcher.start().sleep
+        self.addCleanup(patcher.stop)
+
+    @mock.patch.object(rally.RallyTask, '_start')
+    def test_locked_database_is_retried(self, start):
+        start.side_effect = [RallyTaskError('database is locked'),
+                             RallyTaskError('database is locked'),
+                             'scenario.log']
+        self.assertEqual(self.task.start(), 'scenario.log')
+        self.assertEqual([c[0][0] for c in self.sleep.call_args_list],
+                         [5, 10])
+
+    @mock.patch.object(rally.RallyTask, '_start')
+    def test_other_errors_are_raised(self, start):
+        start.side_effect = RallyTaskError('No such scenario')
+        self.assertRaises(RallyTaskError, self.task.start)
+        self.assertEqual(start.call_count, 1)
+
+    @mock.patch.object(rally, 'RALLY_TASK_START_RETRIES', 2)
+    @mock.patch.object(rally.RallyTask, '_start')
+    def test_retries_are_limited(self, start):
+        start.side_effect = RallyTaskError('database is locked')
+        self.assertRaises(RallyTaskError, self.task.start)
+        self.assertEqual(start.call_count, 3)
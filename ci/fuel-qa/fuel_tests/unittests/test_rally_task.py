@@ -0,0 +1,129 @@
+#    Copyright 2016 Mirantis, Inc.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+from __future__ import unicode_literals
+
+import unittest
+
+import mock
+
+from fuelweb_test.helpers import rally
+from fuelweb_test.helpers.rally import RallyTask
+from fuelweb_test.helpers.rally import RallyTaskError
+
+
+TASK_UUID = '6fd9a19f-5cf8-4f76-ab72-2e34bb1d4996'
+
+
+def result(stdout=(), exit_code=0):
+    return {'stdout': list(stdout), 'stderr': [], 'exit_code': exit_code}
+
+
+class RallyTaskTestCase(unittest.TestCase):
+    def setUp(self):
+        self.log = ''
+        self.statuses = []
+        self.responses = {}
+        self.engine = mock.Mock()
+        self.engine.rally_container.execute.side_effect = self.execute
+        self.engine.get_task_status.side_effect = \
+            lambda uuid: self.statuses.pop(0)
+        self.engine.list_tasks.return_value = [TASK_UUID]
+        deployment = mock.Mock(rally_engine=self.engine)
+        self.task = RallyTask(deployment, 'scenario', {})
+        # the container shell is not waited for in these tests
+        for name in ('time', 'wait'):
+            patcher = mock.patch.object(rally, name)
+            setattr(self, name, patcher.start())
+            self.addCleanup(patcher.stop)
+        self.time.time.return_value = 0
+
+    def execute(self, cmd):
+        if cmd.startswith('tail -c'):
+            offset = int(cmd.split()[2]) - 1
+            return result([self.log[offset:]])
+        if cmd.startswith('tail -n'):
+            return result([self.log])
+        for prefix, response in self.responses.items():
+            if cmd.startswith(prefix):
+                return response
+        return result()
+
+
+class TestRallyTaskStart(RallyTaskTestCase):
+    def setUp(self):
+        super(TestRallyTaskStart, self).setUp()
+        self.log = 'Using task: {0}\n'.format(TASK_UUID)
+        self.responses['awk'] = result([TASK_UUID + '\n'])
+
+    def test_start(self):
+        self.assertEqual(self.task._start(), 'scenario_results.tmp.log')
+        self.assertEqual(self.task.uuid, TASK_UUID)
+
+    def test_failed_launch(self):
+        self.responses['setsid'] = result(exit_code=127)
+        self.assertRaises(RallyTaskError, self.task._start)
+
+    def test_task_is_not_created(self):
+        self.log = 'Task config is invalid\n'
+        self.wait.side_effect = rally.TimeoutError()
+        with self.assertRaises(RallyTaskError) as context:
+            self.task._start()
+        self.assertIn('Task config is invalid', str(context.exception))
+
+    def test_task_is_not_listed(self):
+        self.engine.list_tasks.return_value = []
+        self.assertRaises(RallyTaskError, self.task._start)
+        self.assertIsNone(self.task.uuid)
+
+
+class TestRallyTaskWait(RallyTaskTestCase):
+    def setUp(self):
+        super(TestRallyTaskWait, self).setUp()
+        self.task.uuid = TASK_UUID
+        self.task.log_file = 'scenario_results.tmp.log'
+
+    def test_backoff(self):
+        self.statuses = ['init', 'running', 'running', 'running', 'running',
+                         'running', 'finished']
+        self.assertEqual(self.task.wait(interval=2, max_interval=10),
+                         'finished')
+        self.assertEqual([c[0][0] for c in self.time.sleep.call_args_list],
+                         [2, 4, 8, 10, 10, 10])
+
+    def test_failed_task(self):
+        for status in ('failed', 'aborted', 'crashed', 'validation_failed'):
+            self.statuses = ['running', status]
+            self.assertEqual(self.task.wait(), status)
+
+    def test_timeout(self):
+        self.statuses = ['running', 'running']
+        self.time.time.side_effect = [0, 5, 7, 11]
+        self.assertRaises(AssertionError, self.task.wait, timeout=10,
+                          interval=5)
+        # the last sleep does not go past the deadline
+        self.assertEqual([c[0][0] for c in self.time.sleep.call_args_list],
+                         [3])
+
+    def test_log_is_streamed(self):
+        self.log = 'first\n'
+        self.assertEqual(self.task.tail_log(), 'first\n')
+        self.log += 'second\n'
+        self.assertEqual(self.task.tail_log(), 'second\n')
+        self.assertEqual(self.task.tail_log(), '')
+
+    def test_results_of_failed_task(self):
+        self.statuses = ['failed']
+        self.assertIsNone(self.task.download_results('/tmp/results'))
+        self.assertFalse(self.engine.admin_remote.download.called)
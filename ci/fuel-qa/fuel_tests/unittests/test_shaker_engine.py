@@ -0,0 +1,153 @@
+#    Copyright 2016 Mirantis, Inc.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+from __future__ import unicode_literals
+
+import unittest
+
+from devops.error import TimeoutError
+import mock
+
+from fuelweb_test.helpers import shaker
+from fuelweb_test.helpers.shaker import ShakerEngine
+
+
+SCENARIO = """
+title: OpenStack L2
+execution:
+  tests:
+  - title: Download
+    time: 10
+  - title: Upload
+"""
+
+
+class FakeChannel(object):
+    """Channel getting the next batch of output on every select()."""
+
+    def __init__(self, batches, exits=False):
+        self.batches = list(batches)
+        self.exits = exits
+        self.pending = ""
+        self.closed = False
+
+    def release(self):
+        if self.batches:
+            self.pending += self.batches.pop(0)
+
+    def recv_ready(self):
+        return bool(self.pending)
+
+    def recv(self, size):
+        data, self.pending = self.pending[:size], self.pending[size:]
+        return data
+
+    def exit_status_ready(self):
+        return self.exits and not self.batches
+
+    def close(self):
+        self.closed = True
+
+
+class TestShakerEngine(unittest.TestCase):
+    def setUp(self):
+        self.clock = 0
+        self.scenario = {'stdout': SCENARIO.splitlines(True), 'stderr': [],
+                         'exit_code': 0}
+        self.remote = mock.Mock()
+        self.remote.execute.side_effect = self.execute
+        self.engine = ShakerEngine(self.remote, 'instances.sh', 'nodes.sh')
+        for name, value in (('SHAKER_SETUP_TIMEOUT', 100),
+                            ('SHAKER_TIMEOUT_FACTOR', 3),
+                            ('select', mock.Mock()),
+                            ('time', mock.Mock())):
+            patcher = mock.patch.object(shaker, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        shaker.time.time.side_effect = lambda: self.clock
+        shaker.select.select.side_effect = self.select
+
+    def execute(self, cmd):
+        if cmd.startswith('cat '):
+            return self.scenario
+        return {'stdout': [], 'stderr': [], 'exit_code': 0}
+
+    def select(self, rlist, wlist, xlist, timeout):
+        self.clock += 60
+        for chan in rlist:
+            chan.release()
+        return rlist, [], []
+
+    def follow(self, batches, exits=False):
+        self.clock = 0
+        self.chan = FakeChannel(batches, exits)
+        self.chan.release()
+        self.remote.execute_async.return_value = (self.chan, None, None,
+                                                  None)
+        return self.engine.follow_test()
+
+    def commands(self):
+        return [c[0][0] for c in self.remote.execute.call_args_list]
+
+    def test_scenario_duration(self):
+        self.assertEqual(self.engine.scenario_duration(), 70)
+        self.engine.scenario_duration(between_nodes=True)
+        self.assertEqual(self.commands(), [
+            'cat {0}'.format(ShakerEngine.REMOTE_PATH_TO_SCENARIO_INSTANCES),
+            'cat {0}'.format(ShakerEngine.REMOTE_PATH_TO_SCENARIO_NODES)])
+
+    def test_unknown_scenario_duration(self):
+        self.scenario = {'stdout': [], 'stderr': [], 'exit_code': 1}
+        self.assertIsNone(self.engine.scenario_duration())
+        self.scenario = {'stdout': ['execution: [\n'], 'stderr': [],
+                         'exit_code': 0}
+        self.assertIsNone(self.engine.scenario_duration())
+        self.scenario = {'stdout': ['- title\n'], 'stderr': [],
+                         'exit_code': 0}
+        self.assertIsNone(self.engine.scenario_duration())
+
+    @mock.patch.object(shaker, 'logger')
+    def test_exit_code_is_returned(self, logger):
+        exit_code = self.follow([
+            "1234\nInstalling Shaker\n",
+            "Run scen",
+            "arios\nprogress\n{0} 3\n".format(ShakerEngine.SCRIPT_EXITED)])
+        self.assertEqual(exit_code, 3)
+        self.assertEqual(
+            [c[0][0] for c in logger.info.call_args_list
+             if c[0][0].startswith('shaker: ')],
+            ['shaker: Installing Shaker', 'shaker: Run scenarios',
+             'shaker: progress'])
+        self.assertTrue(self.chan.closed)
+        self.assertEqual(self.commands()[-1], 'kill 1234')
+
+    def test_setup_timeout(self):
+        self.assertRaises(TimeoutError, self.follow, ["1234\n", "setup\n"])
+        self.assertEqual(self.clock, 120)
+        self.assertEqual(self.commands(), ['kill 1234'])
+
+    def test_deadline_is_extended_by_scenario(self):
+        # 70 s scenario may take 300 s after it is started at 60 s
+        batches = ["1234\n", "Run scenarios\n"] + [""] * 4
+        exit_code = self.follow(
+            batches + ["{0} 0\n".format(ShakerEngine.SCRIPT_EXITED)])
+        self.assertEqual((exit_code, self.clock), (0, 360))
+        self.assertRaises(TimeoutError, self.follow, batches + [""])
+        self.assertEqual(self.clock, 420)
+
+    def test_unexpected_exit(self):
+        self.assertRaises(AssertionError, self.follow, ["1234\n", "setup\n"],
+                          exits=True)
+        self.assertTrue(self.chan.closed)
+        self.assertEqual(self.commands(), ['kill 1234'])
@@ -0,0 +1,80 @@
+#    Copyright 2016 Mirantis, Inc.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+from __future__ import unicode_literals
+
+import unittest
+
+import mock
+
+from fuelweb_test.helpers.shaker import ShakerMatrix
+from fuelweb_test.helpers.shaker import ShakerMatrixRunner
+
+
+CONFIGURATIONS = [
+    ("tun", True, False, False, "instances"),
+    ("vlan", False, True, True, "nodes"),
+    ("tun", True, False, False, "instances"),
+    ("vlan", False, True, True, "instances"),
+]
+
+
+class TestShakerMatrix(unittest.TestCase):
+    def test_targets_are_grouped_by_deployment(self):
+        matrix = ShakerMatrix(CONFIGURATIONS)
+        self.assertEqual(len(matrix), 3)
+        self.assertEqual(matrix.ordered(), [
+            (("tun", True, False, False), ["instances"]),
+            (("vlan", False, True, True), ["nodes", "instances"])])
+
+    def test_deployed_go_first(self):
+        matrix = ShakerMatrix(CONFIGURATIONS)
+        ordered = matrix.ordered(lambda deployment: deployment[0] == "vlan")
+        self.assertEqual([deployment for deployment, _ in ordered],
+                         [("vlan", False, True, True),
+                          ("tun", True, False, False)])
+
+    def test_invalid_configurations(self):
+        matrix = ShakerMatrix()
+        self.assertRaises(ValueError, matrix.add, "gre", False, False,
+                          False, "nodes")
+        self.assertRaises(ValueError, matrix.add, "tun", True, True,
+                          False, "nodes")
+        self.assertRaises(ValueError, matrix.add, "tun", False, False,
+                          False, "routers")
+        self.assertEqual(len(matrix), 0)
+
+
+class TestShakerMatrixRunner(unittest.TestCase):
+    def test_each_deployment_is_prepared_once(self):
+        calls = []
+        deploy = mock.Mock(side_effect=lambda *deployment: calls.append(
+            ('deploy',) + deployment))
+        runner = ShakerMatrixRunner(
+            None, ShakerMatrix(CONFIGURATIONS), deploy, 'instances.sh',
+            'nodes.sh',
+            is_deployed=lambda segmentation, dvr, l3ha, offloading:
+            segmentation == "vlan")
+        with mock.patch.object(runner, 'measure') as measure:
+            measure.side_effect = lambda configuration: calls.append(
+                ('measure', configuration[-1])) or configuration[-1]
+            results = runner.run()
+        self.assertEqual(calls, [
+            ('deploy', "vlan", False, True, True),
+            ('measure', "nodes"),
+            ('measure', "instances"),
+            ('deploy', "tun", True, False, False),
+            ('measure', "instances")])
+        self.assertEqual(results[("tun", True, False, False, "instances")],
+                         "instances")
@@ -0,0 +1,102 @@
+#    Copyright 2016 Mirantis, Inc.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+from __future__ import unicode_literals
+
+import gzip
+import io
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+import mock
+
+from fuelweb_test.helpers import shaker
+from fuelweb_test.helpers.shaker import parse_shaker_results
+from fuelweb_test.helpers.shaker import read_shaker_results
+
+
+AGENTS = {
+    'a-1': {'id': 'a-1', 'mode': 'master', 'node': 'node-1', 'slave': {
+        'id': 'a-2', 'mode': 'slave', 'node': 'node-2'}},
+    'a-2': {'id': 'a-2', 'mode': 'slave', 'node': 'node-2'},
+}
+
+RECORD = {
+    'id': 'r-1', 'type': 'agent', 'status': 'ok', 'agent': 'a-1',
+    'node': 'node-1', 'concurrency': 1, 'scenario': 'L2', 'test': 'tcp',
+    'samples': [[0.5, 904.25, 3], [1.5, None, 0]],
+    'meta': [['time', 's'], ['bandwidth', 'Mbit/s'],
+             ['retransmits', '']],
+    'stats': {'bandwidth': {'max': 904.25, 'unit': 'Mbit/s'}},
+    # not loaded
+    'stdout': '{"start": {"connected": [{"socket": 4}]}}',
+    'executor': {'args': [1, {'nested': True}], 'time': 60.5},
+}
+
+RESULTS = {
+    'records': {
+        'r-1': RECORD,
+        'r-2': {'id': 'r-2', 'type': 'concurrency', 'concurrency': 1,
+                'stats': {}, 'stdout': ''},
+    },
+    'agents': AGENTS,
+    'scenarios': {'L2': {'title': 'OpenStack L2'}},
+    'tests': {'tcp': {'class': 'iperf3', 'time': 60.5}},
+}
+
+EXPECTED = {
+    'records': {
+        'r-1': dict((key, value) for key, value in RECORD.items()
+                    if key not in ('stdout', 'executor')),
+        'r-2': {'id': 'r-2', 'type': 'concurrency', 'concurrency': 1,
+                'stats': {}},
+    },
+    'agents': AGENTS,
+}
+
+
+def results_file():
+    return io.BytesIO(json.dumps(RESULTS).encode('utf-8'))
+
+
+class TestParseShakerResults(unittest.TestCase):
+    @unittest.skipIf(shaker.ijson is None, 'ijson is not installed')
+    def test_incremental_parsing(self):
+        results = parse_shaker_results(results_file())
+        self.assertEqual(results, EXPECTED)
+        # numbers are not left as Decimal
+        samples = results['records']['r-1']['samples']
+        self.assertIs(type(samples[0][1]), float)
+        self.assertIs(type(results['agents']['a-1']['slave']), dict)
+
+    @mock.patch.object(shaker, 'logger')
+    @mock.patch.object(shaker, 'ijson', None)
+    def test_without_ijson(self, logger):
+        self.assertEqual(parse_shaker_results(results_file()), EXPECTED)
+        self.assertTrue(logger.warning.called)
+
+    def test_empty_results(self):
+        self.assertEqual(parse_shaker_results(io.BytesIO(b'{}')),
+                         {'records': {}, 'agents': {}})
+
+    def test_read_shaker_results(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        path = os.path.join(directory, 'results.json.gz')
+        with gzip.open(path, 'wb') as f:
+            f.write(results_file().getvalue())
+        self.assertEqual(read_shaker_results(path), EXPECTED)
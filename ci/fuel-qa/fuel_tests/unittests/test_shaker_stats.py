@@ -0,0 +1,115 @@
+#    Copyright 2016 Mirantis, Inc.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+from __future__ import unicode_literals
+
+import unittest
+
+from fuelweb_test.helpers.shaker import distribution
+from fuelweb_test.helpers.shaker import ShakerStats
+
+
+META = [['time', 's'], ['bandwidth', 'Mbit/s'], ['retransmits', '']]
+
+
+def record(agent, node, samples, record_type='agent'):
+    return {'type': record_type, 'agent': agent, 'node': node,
+            'samples': samples, 'meta': META}
+
+
+RESULTS = {
+    'agents': {
+        'a-1': {'node': 'node-1', 'slave': {'node': 'node-2'}},
+        'a-2': {'node': 'node-3', 'slave_id': 'a-2s'},
+        'a-2s': {'node': 'node-4'},
+        'a-3': {'node': 'node-1', 'slave': {'node': 'node-2'}},
+    },
+    'records': {
+        'r-1': record('a-1', 'node-1', [[1, 900, 0], [2, 800, 2]]),
+        'r-2': record('a-2', 'node-3', [[1, 400, 1], [2, None, 3]]),
+        'r-3': record('a-3', 'node-1', [[1, 1000, 0]]),
+        'r-4': record(None, None, [[1, 1, 1]], record_type='concurrency'),
+        'r-5': record('a-4', 'node-5', []),
+        # the same agent in another test
+        'r-6': record('a-1', 'node-1', [[1, 700, 0]]),
+    },
+}
+
+
+class TestDistribution(unittest.TestCase):
+    def test_nan_is_ignored(self):
+        stats = distribution([1, float('nan'), 3], percentiles=(0, 100))
+        self.assertEqual(list(stats.items()), [
+            ('count', 2), ('min', 1.0), ('p0', 1.0), ('p100', 3.0),
+            ('max', 3.0), ('mean', 2.0), ('stdev', 1.0)])
+
+    def test_no_values(self):
+        stats = distribution([])
+        self.assertEqual(list(stats), ['count', 'min', 'p5', 'p50', 'p95',
+                                       'max', 'mean', 'stdev'])
+        self.assertEqual(stats['count'], 0)
+        self.assertEqual(set(list(stats.values())[1:]), {None})
+
+
+class TestShakerStats(unittest.TestCase):
+    def setUp(self):
+        self.stats = ShakerStats(RESULTS)
+
+    def test_samples(self):
+        self.assertEqual(self.stats.metrics, ['bandwidth', 'retransmits'])
+        self.assertEqual(self.stats.units['bandwidth'], 'Mbit/s')
+        self.assertEqual(list(self.stats.samples), ['a-1', 'a-2', 'a-3'])
+        self.assertEqual(list(self.stats.values('bandwidth', 'a-1')),
+                         [900.0, 800.0, 700.0])
+        self.assertEqual(len(self.stats.values('bandwidth')), 6)
+        self.assertEqual(len(self.stats.values('jitter')), 0)
+        self.assertEqual(self.stats.pairs, {
+            'a-1': ('node-1', 'node-2'), 'a-2': ('node-3', 'node-4'),
+            'a-3': ('node-1', 'node-2')})
+
+    def test_stats(self):
+        stats = self.stats.stats('bandwidth')
+        self.assertEqual((stats['count'], stats['min'], stats['p50'],
+                          stats['max'], stats['mean']),
+                         (5, 400.0, 800.0, 1000.0, 760.0))
+        self.assertNotIn('total', stats)
+        self.assertEqual(self.stats.stats('retransmits')['total'], 6.0)
+        self.assertEqual(self.stats.stats('retransmits', 'a-2')['total'],
+                         4.0)
+
+    def test_agent_and_pair_stats(self):
+        agents = self.stats.agent_stats('bandwidth')
+        self.assertEqual(list(agents), ['a-1', 'a-2', 'a-3'])
+        self.assertEqual(agents['a-2']['count'], 1)
+        pairs = self.stats.pair_stats('bandwidth')
+        self.assertEqual(list(pairs), [('node-1', 'node-2'),
+                                       ('node-3', 'node-4')])
+        self.assertEqual(pairs[('node-1', 'node-2')]['p50'], 850.0)
+
+    def test_slowest_pair(self):
+        pair, stats = self.stats.slowest_pair()
+        self.assertEqual((pair, stats['p50']), (('node-3', 'node-4'), 400.0))
+        self.assertEqual(ShakerStats({}).slowest_pair(), (None, None))
+
+    def test_report(self):
+        lines = self.stats.report().splitlines()
+        self.assertTrue(lines[0].startswith('bandwidth: count=5, '
+                                            'min=400.00, p5='))
+        self.assertTrue(lines[0].endswith(' [Mbit/s]'))
+        self.assertTrue(lines[1].startswith('  node-1 -> node-2: count=4'))
+        self.assertTrue(lines[3].startswith('retransmits: count=6'))
+        self.assertTrue(lines[3].endswith('total=6.00'))
+        self.assertEqual(lines[-1], 'Slowest pair node-3 -> node-4: median '
+                                    '400.00 is 50% of the overall median')
+        self.assertEqual(ShakerStats({}).report(), '')
@@ -0,0 +1,126 @@
+#    Copyright 2016 Mirantis, Inc.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+from __future__ import unicode_literals
+
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+import mock
+
+from fuelweb_test.helpers import snapshot_cache
+from fuelweb_test.helpers.snapshot_cache import SnapshotCache
+
+
+GB = 1024 ** 3
+
+
+class FakeNode(object):
+    def __init__(self, snapshots):
+        self.snapshots = snapshots
+
+    def has_snapshot(self, name):
+        return name in self.snapshots
+
+    def erase_snapshot(self, name):
+        self.snapshots.remove(name)
+
+
+class FakeEnv(object):
+    """Environment with snapshots taking sizes[name] GB of free space."""
+
+    def __init__(self):
+        self.snapshots = set()
+        self.sizes = {}
+        self.free = 100 * GB
+        self.d_env = mock.Mock()
+        self.d_env.has_snapshot.side_effect = self.snapshots.__contains__
+        self.d_env.get_nodes.side_effect = lambda: [FakeNode(self.snapshots)]
+
+    def make_snapshot(self, name, is_make=False):
+        self.snapshots.add(name)
+        self.free -= self.sizes.get(name, 0) * GB
+
+
+class TestSnapshotCache(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        self.index_path = os.path.join(directory, 'index.json')
+        patcher = mock.patch.object(snapshot_cache, 'time')
+        self.time = patcher.start()
+        self.addCleanup(patcher.stop)
+        self.time.time.return_value = 1000
+        self.env = FakeEnv()
+        self.cache = SnapshotCache(self.env, index_path=self.index_path,
+                                   budget_gb=10)
+        self.cache.free_space = lambda: self.env.free
+
+    def index(self):
+        with open(self.index_path) as f:
+            return json.load(f)
+
+    def make(self, name, size, used):
+        self.env.sizes[name] = size
+        self.time.time.return_value = used
+        self.cache.make_snapshot(name)
+
+    def test_size_is_recorded(self):
+        self.make('vlan', 4, 1000)
+        self.assertEqual(self.index(), {'vlan': {'size': 4 * GB,
+                                                 'used': 1000}})
+
+    def test_unknown_free_space(self):
+        self.cache.free_space = lambda: None
+        self.make('vlan', 4, 1000)
+        self.assertEqual(self.index()['vlan']['size'], 0)
+
+    def test_least_recently_used_is_erased(self):
+        self.make('vlan', 4, 1000)
+        self.make('tun', 4, 1010)
+        self.time.time.return_value = 1020
+        self.cache.touch('vlan')
+        self.make('tun_dvr', 4, 1030)
+        self.assertEqual(self.env.snapshots, {'vlan', 'tun_dvr'})
+        self.assertEqual(sorted(self.index()), ['tun_dvr', 'vlan'])
+
+    def test_new_snapshot_is_kept(self):
+        self.make('vlan', 4, 1000)
+        self.make('tun', 12, 1010)
+        self.assertEqual(self.env.snapshots, {'tun'})
+        self.assertEqual(list(self.index()), ['tun'])
+
+    def test_snapshots_removed_elsewhere_are_dropped(self):
+        self.make('vlan', 4, 1000)
+        self.make('tun', 4, 1010)
+        self.env.snapshots.discard('vlan')
+        self.make('tun_dvr', 4, 1020)
+        self.assertEqual(self.env.snapshots, {'tun', 'tun_dvr'})
+        self.assertEqual(sorted(self.index()), ['tun', 'tun_dvr'])
+
+    def test_untracked_snapshots(self):
+        self.env.snapshots.add('ready')
+        self.cache.touch('ready')
+        self.assertFalse(os.path.exists(self.index_path))
+        self.make('vlan', 12, 1000)
+        self.assertEqual(self.env.snapshots, {'ready', 'vlan'})
+
+    def test_broken_index(self):
+        with open(self.index_path, 'w') as f:
+            f.write('{')
+        self.make('vlan', 4, 1000)
+        self.assertEqual(list(self.index()), ['vlan'])
@@ -0,0 +1,176 @@
+#    Copyright 2016 Mirantis, Inc.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+from __future__ import unicode_literals
+
+import json
+import os
+import shutil
+import tempfile
+import time
+import unittest
+
+import mock
+
+from fuelweb_test.testrail import submission
+from fuelweb_test.testrail.submission import ResultQueue
+from fuelweb_test.testrail.testrail import APIError
+
+
+class FakeClient(object):
+    def __init__(self, errors=None):
+        # uri -> exception to raise for it
+        self.errors = errors or {}
+        self.sent = []
+
+    def send_post(self, uri, data):
+        if uri in self.errors:
+            raise self.errors[uri]
+        self.sent.append((uri, data))
+        return {'uri': uri}
+
+
+class TestResultQueue(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.journal = os.path.join(self.directory, 'results_1_test.json')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def read_journal(self):
+        with open(self.journal) as f:
+            return json.load(f)
+
+    def test_one_batch_per_run(self):
+        client = FakeClient()
+        queue = ResultQueue(client, max_delay=0)
+        queue.add_for_test(1, 10, {'status_id': 1})
+        queue.add_for_test(1, 11, {'status_id': 5})
+        queue.add_for_case(2, 20, {'status_id': 1})
+        self.assertEqual(len(queue), 3)
+        self.assertEqual(len(queue.flush()), 2)
+        self.assertEqual(client.sent, [
+            ('add_results/1', {'results': [
+                {'test_id': 10, 'status_id': 1},
+                {'test_id': 11, 'status_id': 5}]}),
+            ('add_results_for_cases/2', {'results': [
+                {'case_id': 20, 'status_id': 1}]})])
+        self.assertEqual(len(queue), 0)
+
+    def test_flush_when_full(self):
+        client = FakeClient()
+        queue = ResultQueue(client, max_size=2, max_delay=0)
+        queue.add_for_test(1, 10, {})
+        self.assertEqual(client.sent, [])
+        queue.add_for_test(1, 11, {})
+        self.assertEqual(len(client.sent), 1)
+
+    def test_flush_after_delay(self):
+        client = FakeClient()
+        queue = ResultQueue(client, max_delay=0.05)
+        queue.add_for_test(1, 10, {})
+        deadline = time.time() + 5
+        while not client.sent and time.time() < deadline:
+            time.sleep(0.01)
+        self.assertEqual(len(client.sent), 1)
+
+    def test_failed_batch_is_journaled_and_replayed(self):
+        client = FakeClient({'add_results/1': APIError('Error', 500)})
+        on_sent = mock.Mock()
+        queue = ResultQueue(client, max_delay=0, journal_path=self.journal,
+                            on_sent=on_sent)
+        queue.add_for_test(1, 10, {})
+        queue.add_for_test(2, 20, {})
+        queue.flush()
+        on_sent.assert_called_once_with('add_results/2')
+        self.assertEqual([b['uri'] for b in self.read_journal()],
+                         ['add_results/1'])
+        client.errors.clear()
+        self.assertEqual(queue.replay(), [{'uri': 'add_results/1'}])
+        self.assertFalse(os.path.exists(self.journal))
+
+    def test_rejected_batch_is_dropped(self):
+        client = FakeClient({'add_results/1': APIError('Bad', 400)})
+        queue = ResultQueue(client, max_delay=0, journal_path=self.journal)
+        queue.add_for_test(1, 10, {})
+        queue.flush()
+        self.assertFalse(os.path.exists(self.journal))
+
+    def test_rate_limited_batch_is_journaled(self):
+        client = FakeClient({'add_results/1': APIError('Limit', 429)})
+        queue = ResultQueue(client, max_delay=0, journal_path=self.journal)
+        queue.add_for_test(1, 10, {})
+        queue.flush()
+        self.assertEqual(len(self.read_journal()), 1)
+
+    def test_unexpected_error_keeps_unsent_batches(self):
+        client = FakeClient({'add_results/1': ValueError('Broken')})
+        queue = ResultQueue(client, max_delay=0, journal_path=self.journal)
+        queue.add_for_test(1, 10, {})
+        queue.add_for_test(2, 20, {})
+        self.assertRaises(ValueError, queue.flush)
+        self.assertEqual([b['uri'] for b in self.read_journal()],
+                         ['add_results/1', 'add_results/2'])
+
+    @mock.patch.object(submission, 'logger')
+    def test_failed_batch_without_journal_is_logged(self, logger):
+        client = FakeClient({'add_results/1': APIError('Error', 500)})
+        queue = ResultQueue(client, max_delay=0)
+        queue.add_for_test(1, 10, {'comment': 'lost'})
+        queue.flush()
+        self.assertIn('lost', logger.error.call_args[0][0])
+
+    def test_flush_at_exit(self):
+        client = FakeClient()
+        queue = ResultQueue(client, max_delay=30)
+        queue.add_for_test(1, 10, {})
+        submission._flush_at_exit()
+        self.assertEqual(len(client.sent), 1)
+
+
+class TestReplayAll(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.batch = [{'uri': 'add_results/1',
+                       'data': {'results': [{'test_id': 10}]}}]
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def write_journal(self, name):
+        with open(os.path.join(self.directory, name), 'w') as f:
+            json.dump(self.batch, f)
+
+    @mock.patch.object(submission, '_pid_alive',
+                       side_effect=lambda pid: pid == 2)
+    def test_journals_of_dead_processes(self, pid_alive):
+        self.write_journal('results_1_aaaa.json')
+        self.write_journal('results_2_bbbb.json')
+        self.write_journal('other.json')
+        client = FakeClient()
+        responses = ResultQueue(client).replay_all(self.directory)
+        self.assertEqual(responses, [{'uri': 'add_results/1'}])
+        self.assertEqual(sorted(os.listdir(self.directory)),
+                         ['other.json', 'results_2_bbbb.json'])
+
+    @mock.patch.object(submission, '_pid_alive', return_value=False)
+    def test_failed_replay_keeps_journal(self, pid_alive):
+        self.write_journal('results_1_aaaa.json')
+        client = FakeClient({'add_results/1': APIError('Error', 503)})
+        ResultQueue(client).replay_all(self.directory)
+        self.assertEqual(os.listdir(self.directory), ['results_1_aaaa.json'])
+
+    def test_pid_alive(self):
+        self.assertTrue(submission._pid_alive(os.getpid()))
@@ -0,0 +1,102 @@
+#    Copyright 2016 Mirantis, Inc.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+from __future__ import unicode_literals
+
+import os
+import shutil
+import subprocess
+import tempfile
+import unittest
+
+from fuelweb_test.helpers.sync import local_files
+from fuelweb_test.helpers.sync import MANIFEST_NAME
+from fuelweb_test.helpers.sync import sync_files
+
+
+class LocalRemote(object):
+    """Remote running commands and uploading files on this host."""
+
+    def __init__(self):
+        self.uploads = []
+
+    def execute(self, cmd):
+        process = subprocess.Popen(cmd, shell=True, stdout=subprocess.PIPE,
+                                   stderr=subprocess.PIPE)
+        stdout, stderr = process.communicate()
+        return {'stdout': stdout.decode('utf-8').splitlines(True),
+                'stderr': stderr.decode('utf-8').splitlines(True),
+                'exit_code': process.returncode}
+
+    def upload(self, source, target):
+        self.uploads.append(source)
+        shutil.copy(source, target)
+
+
+class TestSyncFiles(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        self.plugins = os.path.join(self.directory, 'plugins')
+        self.write('plugins/horizon.py', 'horizon')
+        self.write('plugins/context/selenium.py', 'selenium')
+        self.write('rally_args.json', '{}')
+        self.sources = [self.plugins + '/',
+                        os.path.join(self.directory, 'rally_args.json')]
+        self.remote_dir = os.path.join(self.directory, 'remote')
+        self.remote = LocalRemote()
+
+    def write(self, rel_path, content):
+        path = os.path.join(self.directory, rel_path)
+        if not os.path.isdir(os.path.dirname(path)):
+            os.makedirs(os.path.dirname(path))
+        with open(path, 'w') as f:
+            f.write(content)
+
+    def read_remote(self, rel_path):
+        with open(os.path.join(self.remote_dir, rel_path)) as f:
+            return f.read()
+
+    def test_local_files(self):
+        self.assertEqual(sorted(local_files(self.sources)),
+                         ['plugins/context/selenium.py',
+                          'plugins/horizon.py', 'rally_args.json'])
+
+    def test_only_changed_files_are_uploaded(self):
+        self.assertEqual(sync_files(self.remote, self.sources,
+                                    self.remote_dir), 3)
+        self.assertEqual(self.read_remote('plugins/context/selenium.py'),
+                         'selenium')
+        self.assertTrue(os.path.isfile(os.path.join(self.remote_dir,
+                                                    MANIFEST_NAME)))
+        self.assertEqual(sync_files(self.remote, self.sources,
+                                    self.remote_dir), 0)
+        self.write('plugins/horizon.py', 'horizon 2')
+        self.assertEqual(sync_files(self.remote, self.sources,
+                                    self.remote_dir), 1)
+        self.assertEqual(self.read_remote('plugins/horizon.py'), 'horizon 2')
+        self.assertEqual(len(self.remote.uploads), 2)
+
+    def test_broken_manifest(self):
+        sync_files(self.remote, self.sources, self.remote_dir)
+        with open(os.path.join(self.remote_dir, MANIFEST_NAME), 'w') as f:
+            f.write('{')
+        self.assertEqual(sync_files(self.remote, self.sources,
+                                    self.remote_dir), 3)
+
+    def test_failed_extraction(self):
+        # the target directory can not be created over a file
+        self.write('remote', '')
+        self.assertRaises(AssertionError, sync_files, self.remote,
+                          self.sources, self.remote_dir)
@@ -0,0 +1,88 @@
+#    Copyright 2016 Mirantis, Inc.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+from __future__ import unicode_literals
+
+import unittest
+
+import mock
+
+from fuelweb_test.settings import TestRailSettings
+from fuelweb_test.testrail.fake_server import FakeTestRailServer
+from fuelweb_test.testrail.testrail import APIClient
+from fuelweb_test.testrail.testrail import APIError
+from fuelweb_test.testrail.testrail import get_session
+
+
+class TestSession(unittest.TestCase):
+    def test_session_is_shared(self):
+        self.assertIs(get_session(), get_session())
+        self.assertIs(APIClient('http://a').session,
+                      APIClient('http://b').session)
+
+    def test_one_pool_for_both_schemes(self):
+        session = get_session()
+        adapter = session.get_adapter('http://testrail')
+        self.assertIs(adapter, session.get_adapter('https://testrail'))
+        self.assertEqual(adapter._pool_maxsize,
+                         TestRailSettings.connection_pool_size)
+
+    def test_auth_header_follows_credentials(self):
+        client = APIClient('http://testrail')
+        client.user = 'user'
+        client.password = 'one'
+        header = client.auth_header
+        self.assertIs(header, client.auth_header)
+        client.password = 'two'
+        self.assertNotEqual(header, client.auth_header)
+
+
+class TestAPIClient(unittest.TestCase):
+    def setUp(self):
+        self.server = FakeTestRailServer().start()
+        self.server.data.add_project('Project')
+        self.client = APIClient(self.server.url)
+        self.client.user = 'user'
+        self.client.password = 'password'
+
+    def tearDown(self):
+        get_session().close()
+        self.server.stop()
+
+    def test_connection_is_kept_alive(self):
+        for _ in range(3):
+            self.client.send_get('get_projects')
+        self.assertEqual(self.server.request_counts['get_projects'], 3)
+        self.assertEqual(len(self.server.connections), 1)
+
+    def test_error_response(self):
+        with self.assertRaises(APIError) as context:
+            self.client.send_get('get_project/100500')
+        self.assertEqual(context.exception.status_code, 400)
+
+    @mock.patch.object(APIClient, 'retry_after', return_value=0.3)
+    def test_rate_limited_request_is_retried(self, retry_after):
+        self.server.rate_limit = 1
+        self.server.rate_period = 0.2
+        self.client.send_get('get_projects')
+        projects = self.client.send_get('get_projects')
+        self.assertEqual([p['name'] for p in projects], ['Project'])
+        self.assertEqual(self.server.rate_limited, 1)
+        self.assertEqual(retry_after.call_count, 1)
+
+    def test_retry_after_header(self):
+        response = mock.Mock(headers={'Retry-After': '7'})
+        self.assertEqual(APIClient.retry_after(response, 3), 7)
+        response = mock.Mock(headers={})
+        self.assertEqual(APIClient.retry_after(response, 3), 8)
@@ -0,0 +1,109 @@
+#    Copyright 2016 Mirantis, Inc.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+from __future__ import unicode_literals
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from fuelweb_test.helpers.timeseries import atomic_actions_of
+from fuelweb_test.helpers.timeseries import compare_runs
+from fuelweb_test.helpers.timeseries import ITERATION
+from fuelweb_test.helpers.timeseries import RallyTimeSeries
+
+
+def iteration(timestamp, duration, actions, error=None):
+    return {'timestamp': timestamp, 'duration': duration,
+            'error': error or [], 'atomic_actions': actions}
+
+
+RESULTS = [
+    {'key': {'name': 'Horizon.open_page'},
+     'result': [iteration(100, 2.0, {'open_page': 1.5}),
+                iteration(105, 4.0, {'open_page': 3.5}),
+                iteration(110, 9.0, {'open_page': None}, ['Timeout'])]},
+    {'key': {'name': 'Authenticate.keystone'},
+     'result': [iteration(200, 1.0, [{'name': 'keystone.token',
+                                      'started_at': 200.0,
+                                      'finished_at': 200.5}])]},
+]
+
+
+class TestAtomicActions(unittest.TestCase):
+    def test_dict(self):
+        self.assertEqual(atomic_actions_of({'atomic_actions': {'a': 1,
+                                                               'b': None}}),
+                         [('a', 1.0)])
+
+    def test_list(self):
+        self.assertEqual(atomic_actions_of({'atomic_actions': [
+            {'name': 'a', 'started_at': 1, 'finished_at': 3},
+            {'name': 'b', 'started_at': 3, 'finished_at': None}]}),
+            [('a', 2.0)])
+
+    def test_missing(self):
+        self.assertEqual(atomic_actions_of({}), [])
+
+
+class TestRallyTimeSeries(unittest.TestCase):
+    def setUp(self):
+        self.series = RallyTimeSeries.from_results(RESULTS, name='run',
+                                                   meta={'build': 1})
+
+    def test_rows(self):
+        # a row per iteration and per atomic action with a duration
+        self.assertEqual(len(self.series), 7)
+        self.assertEqual(self.series.workloads,
+                         ['Horizon.open_page', 'Authenticate.keystone'])
+        self.assertEqual(self.series.actions,
+                         [ITERATION, 'open_page', 'keystone.token'])
+
+    def test_durations(self):
+        self.assertEqual(list(self.series.durations(workload=0)), [2.0, 4.0])
+        self.assertEqual(
+            list(self.series.durations(workload=0, successful=False)),
+            [2.0, 4.0, 9.0])
+        self.assertEqual(
+            list(self.series.durations('Horizon.open_page', 'open_page')),
+            [1.5, 3.5])
+        self.assertEqual(list(self.series.durations(action='missing')), [])
+
+    def test_stats(self):
+        stats = self.series.stats(workload=0, percentiles=(50,))
+        self.assertEqual(stats, {'count': 2, 'errors': 1, 'mean': 3.0,
+                                 'stdev': 1.0, 'p50': 3.0})
+        stats = self.series.stats(action='missing')
+        self.assertEqual((stats['count'], stats['mean']), (0, None))
+
+    def test_save_and_load(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        path = self.series.save(os.path.join(directory, 'runs', 'run.npz'))
+        loaded = RallyTimeSeries.load(path)
+        self.assertEqual((loaded.name, loaded.meta), ('run', {'build': 1}))
+        self.assertEqual(loaded.workloads, self.series.workloads)
+        self.assertEqual(loaded.actions, self.series.actions)
+        for column, values in self.series.columns.items():
+            self.assertEqual(list(loaded.columns[column]), list(values))
+        # loaded series can be extended
+        loaded.add_iteration(1, iteration(201, 3.0, {'keystone.token': 1}))
+        self.assertEqual(list(loaded.durations(workload=1)), [1.0, 3.0])
+
+        other = RallyTimeSeries.from_results(RESULTS[:1], name='other')
+        other_path = other.save(os.path.join(directory, 'other.npz'))
+        runs = compare_runs([path, other_path], workload='Horizon.open_page')
+        self.assertEqual(list(runs), ['run', 'other'])
+        self.assertEqual(runs['run'], runs['other'])
@@ -14,25 +14,218 @@
 
 from __future__ import division
 
+import hashlib
+import io
 import json
 import re
 import os
+import select
+import threading
+import time
+import uuid
+from array import array
+from collections import OrderedDict
+from multiprocessing.pool import ThreadPool
 
 from pipes import quote
+from devops.error import TimeoutError
 from devops.helpers.helpers import wait
+import numpy
+try:
+    import ijson
+except ImportError:
+    ijson = None
 from proboscis.asserts import assert_equal
 from proboscis.asserts import assert_true
 
 from fuelweb_test import logger
+from fuelweb_test.helpers.sync import sync_files
+from fuelweb_test.helpers.timeseries import atomic_actions_of
+from fuelweb_test.helpers.timeseries import RallyTimeSeries
+
+
+# Run commands in containers through one long-lived shell on the admin
+# node instead of a new SSH command per command
+DOCKER_PERSISTENT_SHELL = os.environ.get('DOCKER_PERSISTENT_SHELL',
+                                         'true') == 'true'
+# Seconds to wait for the result of a command run through the shell
+DOCKER_SHELL_TIMEOUT = int(os.environ.get('DOCKER_SHELL_TIMEOUT', 60 * 60))
+
+# Local directory with 'docker save' tarballs of prepared Rally images,
+# images are loaded from it instead of being built when it has them
+RALLY_IMAGE_CACHE_DIR = os.environ.get('RALLY_IMAGE_CACHE_DIR')
+# Number of the newest prepared image tarballs to keep in the cache, other
+# jobs on the slave may still use images of other plugin revisions
+RALLY_IMAGE_CACHE_KEEP = int(os.environ.get('RALLY_IMAGE_CACHE_KEEP', 3))
+# Local 'docker save' tarball of the base Rally image to load instead of
+# pulling it from the registry
+RALLY_BASE_IMAGE_PATH = os.environ.get('RALLY_BASE_IMAGE_PATH')
+# Number of Rally tasks RallyTaskScheduler runs at the same time
+RALLY_MAX_CONCURRENCY = int(os.environ.get('RALLY_MAX_CONCURRENCY', 4))
+# Seconds to wait for a started Rally task to finish
+RALLY_TASK_TIMEOUT = int(os.environ.get('RALLY_TASK_TIMEOUT', 4 * 60 * 60))
+# Times to start a task again when its creation failed because the Rally
+# database was locked
+RALLY_TASK_START_RETRIES = int(os.environ.get('RALLY_TASK_START_RETRIES', 3))
+# Seconds a pooled Rally container may stay unused before it is removed
+RALLY_CONTAINER_IDLE_TIMEOUT = int(
+    os.environ.get('RALLY_CONTAINER_IDLE_TIMEOUT', 60 * 60))
+
+
+class DockerShellError(Exception):
+    def __init__(self, message, sent=False):
+        super(DockerShellError, self).__init__(message)
+        # True when the command could have been started in the container
+        self.sent = sent
+
+
+class RallyTaskError(Exception):
+    pass
+
+
+class DockerShell(object):
+    """Bash session on the admin node kept open over one SSH channel.
+
+    Commands are run in the container with the same
+    'docker exec <id> /bin/bash -c "<cmd>"' line as one-shot execution,
+    so they are quoted and expanded by the admin node shell as before,
+    but without a new SSH command each. Every command is followed by end
+    markers with a random session token written to stdout (with the exit
+    code) and stderr, so the output of consecutive commands can be split
+    without reopening the channel. stdin of commands is /dev/null, so they
+    can not consume the following ones.
+    """
+
+    # seconds to block in select() before checking the channel is alive
+    select_interval = 1
+
+    def __init__(self, admin_remote, container_id, timeout=DOCKER_SHELL_TIMEOUT):
+        self.admin_remote = admin_remote
+        self.container_id = container_id
+        self.timeout = timeout
+        self.token = uuid.uuid4().hex
+        self._counter = 0
+        self._chan = None
+        self._stdin = None
+
+    @property
+    def alive(self):
+        return self._chan is not None and not self._chan.exit_status_ready()
+
+    def open(self):
+        try:
+            self._chan, self._stdin, _, _ = self.admin_remote.execute_async(
+                '/bin/bash')
+        except Exception as e:
+            raise DockerShellError('Failed to open shell for container '
+                                   '{0}: {1}'.format(self.container_id, e))
+        logger.debug('Opened shell for container {0}'.format(
+            self.container_id))
+
+    def close(self):
+        if self._chan is None:
+            return
+        try:
+            if not self._chan.exit_status_ready():
+                self._stdin.write('exit\n')
+                self._stdin.flush()
+            self._chan.close()
+        except Exception as e:
+            logger.debug('Closing shell for container {0} failed: {1}'.format(
+                self.container_id, e))
+        self._chan = None
+        self._stdin = None
+
+    def execute(self, cmd):
+        if not self.alive:
+            self.close()
+            self.open()
+        self._counter += 1
+        marker = '__FUEL_QA_{0}_{1}__'.format(self.token, self._counter)
+        line = ('docker exec {id} /bin/bash -c "{cmd}" </dev/null; '
+                'printf "\\n{marker} %d\\n" $?; '
+                'printf "\\n{marker}\\n" >&2\n').format(
+            id=self.container_id, cmd=cmd, marker=marker)
+        try:
+            self._stdin.write(line)
+            self._stdin.flush()
+        except Exception as e:
+            self.close()
+            raise DockerShellError('Failed to send command for container '
+                                   '{0}: {1}'.format(self.container_id, e))
+        return self._read_result(marker)
+
+    def _read_result(self, marker):
+        stdout_end = '\n{0} '.format(marker)
+        stderr_end = '\n{0}\n'.format(marker)
+        stdout = []
+        stderr = []
+        # only the last bytes are searched for the markers, long enough to
+        # find one split between chunks
+        out_tail = err_tail = ''
+        out_size = 0
+        # offset of stdout_end and the exit code line following it
+        out_pos = None
+        exit_line = ''
+        deadline = time.time() + self.timeout
+        while True:
+            if self._chan.recv_ready():
+                data = self._chan.recv(65536)
+                stdout.append(data)
+                if out_pos is None:
+                    window = out_tail + data
+                    pos = window.find(stdout_end)
+                    if pos >= 0:
+                        out_pos = out_size - len(out_tail) + pos
+                        exit_line = window[pos + len(stdout_end):]
+                    out_tail = window[-len(stdout_end):]
+                else:
+                    exit_line += data
+                out_size += len(data)
+            if self._chan.recv_stderr_ready():
+                data = self._chan.recv_stderr(65536)
+                stderr.append(data)
+                err_tail = (err_tail + data)[-len(stderr_end):]
+            if (out_pos is not None and exit_line.endswith('\n') and
+                    err_tail == stderr_end):
+                break
+            if self._chan.recv_ready() or self._chan.recv_stderr_ready():
+                continue
+            if self._chan.exit_status_ready():
+                self.close()
+                raise DockerShellError(
+                    'Shell for container {0} exited, output: {1!r}'.format(
+                        self.container_id,
+                        ''.join(stdout) + ''.join(stderr)), sent=True)
+            remaining = deadline - time.time()
+            if remaining <= 0:
+                # the command may still be running, the session can not
+                # be used for the next ones
+                self.close()
+                raise DockerShellError(
+                    'No result of command in container {0} in {1}s'.format(
+                        self.container_id, self.timeout), sent=True)
+            select.select([self._chan], [], [],
+                          min(remaining, self.select_interval))
+
+        exit_code = int(exit_line.strip())
+        stdout = ''.join(stdout)[:out_pos]
+        stderr = ''.join(stderr)[:-len(stderr_end)]
+        return {'stdout': stdout.splitlines(True),
+                'stderr': stderr.splitlines(True),
+                'exit_code': exit_code}
 
 
 class DockerContainer(object):
     def _execute_on_remote_node(self, cmd):
         return self.admin_remote.execute(cmd)
 
-    def __init__(self, admin_remote):
+    def __init__(self, admin_remote, persistent_shell=DOCKER_PERSISTENT_SHELL):
         self.admin_remote = admin_remote
         self.id = None
+        self.persistent_shell = persistent_shell
+        self._shell = None
+        self._shell_lock = threading.Lock()
 
     def run(self, image, user, bindings, env_vars, network):
         opts = ""
@@ -53,16 +246,48 @@ class DockerContainer(object):
         result = self._execute_on_remote_node("docker ps -lq")
         assert_equal(result["exit_code"], 0, "Failed to get last container id")
         logger.debug(str(result["stdout"]))
+        self.close_shell()
         self.id = result["stdout"][0].strip()
         logger.debug("Container id is {id}".format(id=self.id))
 
     def execute(self, cmd):
+        # The shell runs one command at a time, concurrent callers use
+        # one-shot 'docker exec' instead of waiting for it
+        if self.persistent_shell and self._shell_lock.acquire(False):
+            try:
+                if self._shell is None:
+                    self._shell = DockerShell(self.admin_remote, self.id)
+                return self._shell.execute(cmd)
+            except DockerShellError as e:
+                self._shell = None
+                if e.sent:
+                    logger.error('Command {0!r} in container {1} failed: '
+                                 '{2}'.format(cmd, self.id, e))
+                    return {'stdout': [], 'stderr': [str(e)], 'exit_code': -1}
+                logger.warning('{0}, falling back to docker exec'.format(e))
+            finally:
+                self._shell_lock.release()
         return self._execute_on_remote_node("docker exec {id} /bin/bash -c \"{cmd}\"".format(id=self.id, cmd=cmd))
 
+    def is_running(self):
+        if self.id is None:
+            return False
+        result = self._execute_on_remote_node(
+            "docker inspect -f '{{{{.State.Running}}}}' {id}".format(id=self.id))
+        return (result['exit_code'] == 0 and
+                ''.join(result['stdout']).strip() == 'true')
+
+    def close_shell(self):
+        with self._shell_lock:
+            if self._shell is not None:
+                self._shell.close()
+                self._shell = None
+
     def commit(self, repotag):
         return self._execute_on_remote_node("docker commit {id} {repotag}".format(id=self.id, repotag=repotag))
 
     def stop(self):
+        self.close_shell()
         return self._execute_on_remote_node("docker stop {id}".format(id=self.id))
 
     def remove(self):
@@ -86,54 +311,167 @@ class RallyEngine(object):
         self.home_bind_path = home_bind_path
         self.rally_plugins_dir = "/opt/rally/plugins"
         self.rally_container = DockerContainer(admin_remote)
+        self._deployments = None
         self.setup()
 
-    def image_exists(self, tag='latest'):
+    def list_images(self):
         cmd = "docker images | awk 'NR > 1{print $1\" \"$2}'"
         logger.debug('Checking Docker images...')
         result = self.admin_remote.execute(cmd)
         logger.debug(result)
-        existing_images = [line.strip().split() for line in result['stdout']]
-        return [self.container_repo, tag] in existing_images
+        return [line.strip().split() for line in result['stdout']]
+
+    def image_exists(self, tag='latest'):
+        return [self.container_repo, tag] in self.list_images()
 
     def pull_image(self):
-        # TODO(apanchenko): add possibility to load image from local path or
-        # remote link provided in settings, in order to speed up downloading
+        if RALLY_BASE_IMAGE_PATH:
+            logger.debug('Loading Rally image from {0}...'.format(
+                RALLY_BASE_IMAGE_PATH))
+            self.load_image(RALLY_BASE_IMAGE_PATH)
+            return self.image_exists()
         cmd = 'docker pull {0}'.format(self.container_repo)
         logger.debug('Downloading Rally repository/image from registry...')
         result = self.admin_remote.execute(cmd)
         logger.debug(result)
         return self.image_exists()
 
+    utils = ['gawk', 'vim', 'curl', 'firefox', 'python-pip', 'xvfb']
+    pip_packages = ['pyvirtualdisplay', 'selenium', 'xvfbwrapper']
+    geckodriver_url = ('https://github.com/mozilla/geckodriver/releases/'
+                       'download/v0.10.0/geckodriver-v0.10.0-linux64.tar.gz')
+
     def setup_utils(self):
-        utils = ['gawk', 'vim', 'curl', 'firefox', 'python-pip', 'xvfb']
-        cmd = ('unset http_proxy https_proxy; apt-get update; apt-get install -y {0}'.format(' '.join(utils)))
-        logger.debug('Installing utils "{0}" to the Rally container...'.format(utils))
+        cmd = ('unset http_proxy https_proxy; apt-get update; apt-get install -y {0}'.format(' '.join(self.utils)))
+        logger.debug('Installing utils "{0}" to the Rally container...'.format(self.utils))
         result = self.rally_container.execute(cmd)
         assert_equal(result['exit_code'], 0,
                      'Utils installation failed in Rally container: '
                      '{0}'.format(result))
-        cmd = "pip install pyvirtualdisplay selenium xvfbwrapper"
+        cmd = "pip install {0}".format(' '.join(self.pip_packages))
         result = self.rally_container.execute(cmd)
         assert_equal(result['exit_code'], 0,
                      'Pip packages installation failed in Rally container: '
                      '{0}'.format(result))
-        cmd = ("wget https://github.com/mozilla/geckodriver/releases/download/v0.10.0/geckodriver-v0.10.0-linux64.tar.gz; "
-               "tar zxf geckodriver-v0.10.0-linux64.tar.gz; "
-               "sudo mv geckodriver /usr/local/bin/")
+        cmd = ("wget {0}; "
+               "tar zxf {1}; "
+               "sudo mv geckodriver /usr/local/bin/").format(
+            self.geckodriver_url, os.path.basename(self.geckodriver_url))
 
         result = self.rally_container.execute(cmd)
         assert_equal(result['exit_code'], 0,
                      'Chrome driver installation failed in Rally container: '
                      '{0}'.format(result))
 
-    def upload_rally_plugins(self):
+    @property
+    def local_plugins_dir(self):
         work_dir = os.environ.get("WORKSPACE", "./")
-        base_dir = os.path.join(work_dir, "fuelweb_test/rally/plugins")
-        files = os.listdir(base_dir)
+        return os.path.join(work_dir, "fuelweb_test/rally/plugins")
+
+    def upload_rally_plugins(self):
+        sync_files(self.admin_remote, [self.local_plugins_dir],
+                   self.rally_plugins_dir)
+
+    def image_hash(self):
+        """Return hash of everything the prepared ('ready') image is built of.
+
+        It covers the base image ID, installed utils and the Rally plugins,
+        so the image is rebuilt only when one of them changes.
+        """
+        cmd = "docker inspect --format '{{{{.Id}}}}' {0}:latest".format(
+            self.container_repo)
+        result = self.admin_remote.execute(cmd)
+        assert_equal(result['exit_code'], 0,
+                     'Failed to inspect Rally base image: {0}'.format(result))
+        digest = hashlib.sha1(''.join(result['stdout']).strip())
+        digest.update(json.dumps([self.utils, self.pip_packages,
+                                  self.geckodriver_url]))
+        for root, dirs, files in os.walk(self.local_plugins_dir):
+            dirs.sort()
+            for name in sorted(files):
+                path = os.path.join(root, name)
+                digest.update(os.path.relpath(path, self.local_plugins_dir))
+                with open(path, 'rb') as f:
+                    digest.update(f.read())
+        return digest.hexdigest()[:12]
+
+    def image_tarball(self, tag):
+        return os.path.join(RALLY_IMAGE_CACHE_DIR, '{0}-{1}.tar'.format(
+            self.container_repo.replace('/', '_'), tag))
+
+    def load_image(self, local_path):
+        remote_path = os.path.join('/tmp', os.path.basename(local_path))
+        self.admin_remote.upload(local_path, remote_path)
+        result = self.admin_remote.execute(
+            'docker load -i {0}; rc=$?; rm -f {0}; exit $rc'.format(
+                remote_path))
+        assert_equal(result['exit_code'], 0,
+                     'Failed to load Docker image {0}: {1}'.format(
+                         local_path, result))
 
-        self.rally_container.execute("mkdir /opt/rally/plugins")
-        self.admin_remote.upload(base_dir, self.rally_plugins_dir)
+    def load_cached_image(self, tag):
+        if not RALLY_IMAGE_CACHE_DIR:
+            return False
+        tarball = self.image_tarball(tag)
+        if not os.path.isfile(tarball):
+            return False
+        logger.info('Loading Rally image {0} from {1}'.format(tag, tarball))
+        self.load_image(tarball)
+        return self.image_exists(tag=tag)
+
+    def save_image_to_cache(self, tag):
+        if not RALLY_IMAGE_CACHE_DIR:
+            return
+        tarball = self.image_tarball(tag)
+        remote_path = os.path.join('/tmp', os.path.basename(tarball))
+        result = self.admin_remote.execute('docker save -o {0} {1}:{2}'.format(
+            remote_path, self.container_repo, tag))
+        if result['exit_code'] != 0:
+            logger.warning('Failed to save Rally image {0}: {1}'.format(
+                tag, result))
+            return
+        if not os.path.isdir(RALLY_IMAGE_CACHE_DIR):
+            os.makedirs(RALLY_IMAGE_CACHE_DIR)
+        tmp_path = '{0}.tmp'.format(tarball)
+        self.admin_remote.download(remote_path, tmp_path)
+        os.rename(tmp_path, tarball)
+        self.admin_remote.execute('rm -f {0}'.format(remote_path))
+        logger.info('Saved Rally image {0} to {1}'.format(tag, tarball))
+
+    def prune_images(self, keep_tag):
+        """Remove prepared images other than keep_tag and old tarballs.
+
+        Images of the Rally repository tagged 'ready-*' are removed from the
+        admin node, of the tarballs in RALLY_IMAGE_CACHE_DIR the one of
+        keep_tag and the RALLY_IMAGE_CACHE_KEEP newest are kept.
+        """
+        for repo, tag in self.list_images():
+            if (repo == self.container_repo and tag.startswith('ready-') and
+                    tag != keep_tag):
+                result = self.admin_remote.execute('docker rmi {0}:{1}'.format(
+                    repo, tag))
+                if result['exit_code'] == 0:
+                    logger.info('Removed old Rally image {0}'.format(tag))
+                else:
+                    logger.warning('Failed to remove old Rally image {0}: '
+                                   '{1}'.format(tag, result))
+        if not RALLY_IMAGE_CACHE_DIR or not os.path.isdir(
+                RALLY_IMAGE_CACHE_DIR):
+            return
+        keep = self.image_tarball(keep_tag)
+        prefix = os.path.basename(self.image_tarball('ready-'))[:-len('.tar')]
+        tarballs = [os.path.join(RALLY_IMAGE_CACHE_DIR, name)
+                    for name in os.listdir(RALLY_IMAGE_CACHE_DIR)
+                    if name.startswith(prefix) and name.endswith('.tar')]
+        tarballs.sort(key=os.path.getmtime, reverse=True)
+        for path in tarballs[RALLY_IMAGE_CACHE_KEEP:]:
+            if path == keep:
+                continue
+            try:
+                os.remove(path)
+                logger.info('Removed old Rally image tarball {0}'.format(path))
+            except OSError as e:
+                logger.warning('Failed to remove {0}: {1}'.format(path, e))
 
     def init_rally_container(self):
         bindings = [(self.dir_for_home, self.home_bind_path),
@@ -161,7 +499,7 @@ class RallyEngine(object):
         assert_equal(result['exit_code'], 0, 'Failed to create Database for '
                                              'Rally: {0} !'.format(result))
 
-    def prepare_image(self):
+    def prepare_image(self, tag='ready'):
         self.init_rally_container()
 
         self.create_database()
@@ -169,10 +507,10 @@ class RallyEngine(object):
         self.upload_rally_plugins()
 
         self.rally_container.stop()
-        self.rally_container.commit("{0}:{1}".format(self.container_repo, "ready"))
+        self.rally_container.commit("{0}:{1}".format(self.container_repo, tag))
         self.rally_container.remove()
 
-        return self.image_exists(tag='ready')
+        return self.image_exists(tag=tag)
 
     def setup_bash_alias(self):
         alias_name = 'rally_docker'
@@ -206,10 +544,19 @@ class RallyEngine(object):
         if not self.image_exists():
             assert_true(self.pull_image(),
                         "Docker image for Rally not found!")
-        if not self.image_exists(tag='ready'):
-            assert_true(self.prepare_image(),
+        ready_tag = 'ready-{0}'.format(self.image_hash())
+        if self.image_exists(tag=ready_tag):
+            logger.info('Rally image {0} is up to date'.format(ready_tag))
+        elif self.load_cached_image(ready_tag):
+            # plugins are bound into the container from the admin node
+            self.upload_rally_plugins()
+            self.prune_images(ready_tag)
+        else:
+            assert_true(self.prepare_image(tag=ready_tag),
                         "Docker image for Rally is not ready!")
-        self.repository_tag = 'ready'
+            self.save_image_to_cache(ready_tag)
+            self.prune_images(ready_tag)
+        self.repository_tag = ready_tag
 
         # init one more time but now using other image with 'ready' tag
         self.init_rally_container()
@@ -235,6 +582,72 @@ class RallyEngine(object):
         header, deployment  = result['stdout']
         return dict(zip(header.strip().split(), deployment.strip().split()))
 
+    @staticmethod
+    def deployment_key(auth_url, username, tenant_name):
+        return auth_url.rstrip('/'), username, tenant_name
+
+    def read_deployments(self):
+        """Return dict deployment key -> uuid of all Rally deployments.
+
+        Configs of all deployments are printed by one command, each one
+        after a marker line with its uuid. Later deployments win, so the
+        most recently created one is found for a duplicated key.
+        """
+        marker = '=== deployment'
+        cmd = (r"for d in \$(rally deployment list | awk -F "
+               r"'[[:space:]]*\\\\|[[:space:]]*' '/\ydeploy\y/{{print \$2}}'); "
+               r"do echo {0} \$d; rally deployment config \$d; done"
+               ).format(marker)
+        result = self.rally_container.execute(cmd)
+        assert_equal(result['exit_code'], 0,
+                     "Listing Rally deployments failed: {0}".format(result))
+        configs = OrderedDict()
+        d_uuid = None
+        for line in result['stdout']:
+            if line.startswith(marker):
+                d_uuid = line[len(marker):].strip()
+                configs[d_uuid] = []
+            elif d_uuid is not None:
+                configs[d_uuid].append(line)
+        deployments = {}
+        for d_uuid, lines in configs.items():
+            try:
+                config = json.loads(''.join(lines))
+            except ValueError:
+                logger.warning('Failed to read config of Rally deployment '
+                               '{0}: {1}'.format(d_uuid, ''.join(lines)))
+                continue
+            # Newer Rally nests the credentials under 'openstack'
+            config = config.get('openstack', config)
+            admin = config.get('admin') or {}
+            key = self.deployment_key(config.get('auth_url', ''),
+                                      admin.get('username'),
+                                      admin.get('tenant_name'))
+            deployments[key] = d_uuid
+        logger.debug('Rally deployments: {0}'.format(deployments))
+        return deployments
+
+    def find_deployment(self, auth_url, username, tenant_name):
+        """Return uuid of the matching deployment or None.
+
+        Deployments are read once and cached until a deployment is created
+        or destroyed (see invalidate_deployments).
+        """
+        if self._deployments is None:
+            self._deployments = self.read_deployments()
+        return self._deployments.get(
+            self.deployment_key(auth_url, username, tenant_name))
+
+    def invalidate_deployments(self):
+        self._deployments = None
+
+    def destroy_deployment(self, deployment_uuid):
+        cmd = 'rally deployment destroy {0}'.format(deployment_uuid)
+        result = self.rally_container.execute(cmd)
+        self.invalidate_deployments()
+        assert_equal(result['exit_code'], 0,
+                     "Destroying Rally deployment failed: {0}".format(result))
+
     def list_tasks(self):
         cmd = "rally task list --uuids-only"
         result = self.rally_container.execute(cmd)
@@ -273,14 +686,8 @@ class RallyDeployment(object):
     @property
     def uuid(self):
         if self._uuid is None:
-            for d_uuid in self.rally_engine.list_deployments():
-                deployment = self.rally_engine.show_deployment(d_uuid)
-                logger.debug("Deployment info: {0}".format(deployment))
-                if self.auth_url in deployment['auth_url'] and \
-                                self.username == deployment['username'] and \
-                                self.tenant_name == deployment['tenant_name']:
-                    self._uuid = d_uuid
-                    break
+            self._uuid = self.rally_engine.find_deployment(
+                self.auth_url, self.username, self.tenant_name)
         return self._uuid
 
     @property
@@ -315,6 +722,8 @@ class RallyDeployment(object):
         cmd = 'rally deployment create --name {0} --filename depl.conf'.format(self.cluster_vip)
         aaa = self.rally_engine.rally_container.execute(cmd)
         logger.info(aaa)
+        self.rally_engine.invalidate_deployments()
+        self._uuid = None
         logger.info(self.uuid)
         self.check_deployment(self.uuid)
 
@@ -337,6 +746,8 @@ class RallyTask(object):
         self.uuid = None
         self._status = None
         self.rally_args = rally_args
+        self.log_file = None
+        self._log_offset = 0
 
     @property
     def status(self):
@@ -346,33 +757,149 @@ class RallyTask(object):
             self._status = self.engine.get_task_status(self.uuid)
         return self._status
 
+    # every final status but 'finished' means the task failed and has
+    # no results
+    final_statuses = ('finished', 'failed', 'aborted', 'crashed',
+                      'validation_failed')
+
+    # threads waiting for results of tasks started with run_async()
+    _wait_pool = None
+    _wait_pool_lock = threading.Lock()
+
+    # tasks of a container share its sqlite Rally database, they are
+    # created one at a time
+    _create_lock = threading.Lock()
+
     def start(self):
+        """Start the task in background, return name of its log file.
+
+        'rally task start' runs detached from the command which started
+        it, use wait() or run_async() to get its results. Tasks are created
+        one at a time, creation failed because the Rally database was
+        locked by a running task is retried.
+        """
+        for attempt in range(RALLY_TASK_START_RETRIES + 1):
+            with RallyTask._create_lock:
+                try:
+                    return self._start()
+                except RallyTaskError as e:
+                    if ('database is locked' not in str(e) or
+                            attempt == RALLY_TASK_START_RETRIES):
+                        raise
+            delay = 2 ** attempt * 5
+            logger.warning('Rally database is locked, starting scenario {0} '
+                           'again in {1}s'.format(self.scenario, delay))
+            time.sleep(delay)
+
+    def _start(self):
         log_file = '{0}_results.tmp.log'.format(self.scenario)
-        cmd = ('rally task start {}  --task-args-file rally_args.json &> {}'.format(self.scenario, log_file)
-        )
+        self.log_file = log_file
+        self._log_offset = 0
+        cmd = ('setsid nohup rally task start {} --task-args-file rally_args.json '
+               '&> {} < /dev/null &'.format(self.scenario, log_file))
         result = self.engine.rally_container.execute(cmd)
         if result['exit_code']:
-           logger.warn('Scenario {} failed to start!'.format(self.scenario))
-           return log_file
+            raise RallyTaskError('Rally scenario {0} failed to start: '
+                                 '{1}'.format(self.scenario, result))
 
         logger.info('Started Rally task: {0}'.format(result))
         cmd = ("awk 'BEGIN{{retval=1}};/^Using task:/{{print $NF; retval=0}};"
                "END {{exit retval}}' {0}").format(log_file)
-        wait(lambda: self.engine.rally_container.execute(cmd)['exit_code'] == 0,
-             timeout=30, timeout_msg='Rally task {!r} creation timeout'
-                                     ''.format(result))
+        try:
+            wait(lambda: self.engine.rally_container.execute(
+                cmd)['exit_code'] == 0, timeout=30)
+        except TimeoutError:
+            raise RallyTaskError(
+                'Rally task of scenario {0} was not created, end of {1}:\n'
+                '{2}'.format(self.scenario, log_file, self.log_tail()))
         result = self.engine.rally_container.execute(cmd)
-        m = re.match("Using task: ([a-z0-9-]+)", result["stdout"][0])
-        assert_true(m is not None, "Cannot find task id")
+        # awk prints the last field of the 'Using task: <uuid>' line
+        m = re.match("(?:Using task: )?([a-z0-9-]+)",
+                     ''.join(result["stdout"]).strip())
+        if m is None:
+            raise RallyTaskError(
+                'Cannot find task id of scenario {0} in {1}:\n{2}'.format(
+                    self.scenario, log_file, self.log_tail()))
         task_uuid = m.group(1)
         logger.debug("!!! task_uuid = {}".format(task_uuid))
         tasks = self.engine.list_tasks()
         logger.debug("!!! tasks = {}".format(str(tasks)))
-        assert_true(task_uuid in tasks,
-                    "Rally task creation failed: {0}".format(result))
+        if task_uuid not in tasks:
+            raise RallyTaskError(
+                'Rally task {0} of scenario {1} is not in the task list, end '
+                'of {2}:\n{3}'.format(task_uuid, self.scenario, log_file,
+                                      self.log_tail()))
         self.uuid = task_uuid
         return log_file
 
+    def log_tail(self, lines=20):
+        """Return the last lines of the task log."""
+        cmd = 'tail -n {0} {1}'.format(lines, self.log_file)
+        result = self.engine.rally_container.execute(cmd)
+        return ''.join(result['stdout'] + result.get('stderr', []))
+
+    def tail_log(self):
+        """Return part of the task log written since the previous call."""
+        cmd = 'tail -c +{0} {1}'.format(self._log_offset + 1, self.log_file)
+        result = self.engine.rally_container.execute(cmd)
+        if result['exit_code'] != 0:
+            return ''
+        new_data = ''.join(result['stdout'])
+        self._log_offset += len(new_data)
+        for line in new_data.splitlines():
+            logger.debug('[{0}] {1}'.format(self.scenario, line))
+        return new_data
+
+    def wait(self, timeout=RALLY_TASK_TIMEOUT, interval=2, max_interval=30):
+        """Wait for the started task to finish, return its final status.
+
+        Status is polled with exponential backoff from ``interval`` up to
+        ``max_interval`` seconds, the task log is streamed to the debug log
+        between polls.
+        """
+        assert_true(self.uuid is not None,
+                    'Rally task {0} was not started'.format(self.scenario))
+        deadline = time.time() + timeout
+        while True:
+            self.tail_log()
+            status = self.status
+            if status == 'finished':
+                logger.info('Rally task {0} ({1}) is {2}'.format(
+                    self.uuid, self.scenario, status))
+                return status
+            if status in self.final_statuses:
+                logger.error('Rally task {0} ({1}) is {2}, see {3}'.format(
+                    self.uuid, self.scenario, status, self.log_file))
+                return status
+            assert_true(time.time() < deadline,
+                        'Rally task {0} ({1}) timeout, status is {2}'.format(
+                            self.uuid, self.scenario, status))
+            time.sleep(min(interval, max(deadline - time.time(), 0)))
+            interval = min(interval * 2, max_interval)
+
+    def wait_results(self, timeout=RALLY_TASK_TIMEOUT):
+        self.wait(timeout=timeout)
+        return self.get_results()
+
+    def run_async(self, timeout=RALLY_TASK_TIMEOUT, results_dir=None):
+        """Start the task, return AsyncResult resolving to its results.
+
+        The results are waited for in a background thread, use ready(),
+        wait() or get() of the returned object. With ``results_dir`` the
+        AsyncResult resolves to the path of the downloaded results file
+        instead of the results themselves. Results are waited for by a
+        pool of RALLY_MAX_CONCURRENCY threads shared by all tasks.
+        """
+        self.start()
+        with RallyTask._wait_pool_lock:
+            if RallyTask._wait_pool is None:
+                RallyTask._wait_pool = ThreadPool(RALLY_MAX_CONCURRENCY)
+        if results_dir is None:
+            return RallyTask._wait_pool.apply_async(self.wait_results,
+                                                    (timeout,))
+        return RallyTask._wait_pool.apply_async(self.wait_results_file,
+                                                (results_dir, timeout))
+
     def abort(self, task_id):
         logger.debug('Stop Rally task {0}'.format(task_id))
         cmd = 'rally task abort {0}'.format(task_id)
@@ -392,32 +919,506 @@ class RallyTask(object):
                                                              result))
             return ''.join(result['stdout'])
 
+    @property
+    def results_file(self):
+        return '{0}_results.json'.format(self.scenario)
+
+    def download_results(self, local_dir):
+        """Save results of the finished task to a file, return local path.
+
+        'rally task results' is written to a file in the Rally home
+        directory, which is downloaded once instead of being passed through
+        the command output.
+        """
+        if self.status != 'finished':
+            return None
+        cmd = 'rally task results {0} > {1}'.format(self.uuid,
+                                                    self.results_file)
+        result = self.engine.rally_container.execute(cmd)
+        assert_equal(result['exit_code'], 0,
+                     "Getting task results failed: {0}".format(result))
+        if not os.path.isdir(local_dir):
+            os.makedirs(local_dir)
+        self.engine.admin_remote.download(
+            os.path.join(self.engine.dir_for_home, self.results_file),
+            local_dir)
+        return os.path.join(local_dir, os.path.basename(self.results_file))
+
+    def wait_results_file(self, local_dir, timeout=RALLY_TASK_TIMEOUT):
+        self.wait(timeout=timeout)
+        return self.download_results(local_dir)
+
+
+class RallyTaskScheduler(object):
+    """Run independent Rally scenarios concurrently.
+
+    Every scenario is started as a separate 'rally task start' process in
+    the Rally container of the deployment. At most ``max_concurrency``
+    tasks run at the same time, and scenarios sharing a resource tag (e.g.
+    'floating_ips' for scenarios which need most of the floating IP quota)
+    are never run together. Scenarios are started in the order they were
+    added, unless the next one has to wait for a tag. Tasks share the
+    sqlite database of the container, so they are created one at a time
+    (see RallyTask.start()).
+    """
+
+    def __init__(self, rally_deployment, rally_args,
+                 max_concurrency=RALLY_MAX_CONCURRENCY,
+                 results_dir='./rally_logs/'):
+        self.deployment = rally_deployment
+        self.rally_args = rally_args
+        self.results_dir = results_dir
+        self.max_concurrency = max(max_concurrency, 1)
+        self.scenarios = OrderedDict()
+        self.results = OrderedDict()
+        self._pending = []
+        self._busy_tags = set()
+        self._cond = threading.Condition()
+
+    def add(self, scenario, tags=()):
+        self.scenarios[scenario] = frozenset(tags)
+
+    def _next_scenario(self):
+        """Take the first pending scenario whose tags are all free."""
+        with self._cond:
+            while self._pending:
+                for scenario in self._pending:
+                    tags = self.scenarios[scenario]
+                    if not tags & self._busy_tags:
+                        self._pending.remove(scenario)
+                        self._busy_tags |= tags
+                        return scenario
+                self._cond.wait()
+            return None
+
+    def _release(self, scenario):
+        with self._cond:
+            self._busy_tags -= self.scenarios[scenario]
+            self._cond.notify_all()
+
+    def _run_scenario(self, scenario):
+        task = RallyTask(self.deployment, scenario, self.rally_args)
+        result = {'task': task, 'log_file': None, 'results_file': None,
+                  'workloads': None, 'timeseries_file': None, 'error': None}
+        try:
+            logger.info('Starting Rally scenario {0}'.format(scenario))
+            result['log_file'] = task.start()
+            result['results_file'] = task.wait_results_file(self.results_dir)
+            if result['results_file']:
+                result['workloads'], result['timeseries_file'] = \
+                    read_results_file(result['results_file'], scenario,
+                                      task.uuid)
+        except Exception as e:
+            logger.error('Rally scenario {0} failed: {1}'.format(scenario, e))
+            result['log_file'] = task.log_file
+            result['error'] = e
+        return result
+
+    def _worker(self):
+        while True:
+            scenario = self._next_scenario()
+            if scenario is None:
+                return
+            try:
+                self.results[scenario] = self._run_scenario(scenario)
+            finally:
+                self._release(scenario)
+
+    def run(self):
+        """Run all added scenarios, return dict scenario -> result.
+
+        Result is a dict with the RallyTask ('task'), its log file name
+        ('log_file'), local path of its results ('results_file'), list of
+        WorkloadSummary of the results ('workloads'), path of the saved
+        RallyTimeSeries ('timeseries_file') and the exception the scenario
+        failed with ('error').
+        """
+        self._pending = [s for s in self.scenarios if s not in self.results]
+        workers = [threading.Thread(target=self._worker)
+                   for _ in range(min(self.max_concurrency,
+                                      len(self._pending)))]
+        for worker in workers:
+            worker.daemon = True
+            worker.start()
+        for worker in workers:
+            worker.join()
+        return OrderedDict((scenario, self.results[scenario])
+                           for scenario in self.scenarios)
+
+
+class WorkloadSummary(object):
+    """SLA and totals of one workload, updated iteration by iteration."""
+
+    def __init__(self, index):
+        self.index = index
+        self.key = None
+        self.sla = []
+        self.full_duration = 0.0
+        self.load_duration = 0.0
+        self.iterations = 0
+        self.errors = 0
+        self.duration_total = 0.0
+        self.duration_min = None
+        self.duration_max = None
+        # name -> {'count': .., 'total': .., 'min': .., 'max': ..}
+        self.atomic_actions = OrderedDict()
+
+    def add_iteration(self, iteration):
+        self.iterations += 1
+        if iteration.get('error'):
+            self.errors += 1
+            return
+        duration = float(iteration.get('duration') or 0)
+        self.duration_total += duration
+        if self.duration_min is None:
+            self.duration_min = self.duration_max = duration
+        else:
+            self.duration_min = min(self.duration_min, duration)
+            self.duration_max = max(self.duration_max, duration)
+        for name, action_duration in atomic_actions_of(iteration):
+            stats = self.atomic_actions.setdefault(
+                name, {'count': 0, 'total': 0.0, 'min': None, 'max': None})
+            stats['count'] += 1
+            stats['total'] += action_duration
+            if stats['min'] is None:
+                stats['min'] = stats['max'] = action_duration
+            else:
+                stats['min'] = min(stats['min'], action_duration)
+                stats['max'] = max(stats['max'], action_duration)
+
+    @property
+    def name(self):
+        return (self.key or {}).get('name')
+
+    @property
+    def sla_success(self):
+        return all(sla['success'] for sla in self.sla)
+
+    def failed_sla(self):
+        return [sla for sla in self.sla if not sla['success']]
+
+
+def iter_rally_workloads(results_file, on_iteration=None):
+    """Yield WorkloadSummary of every workload of 'rally task results'.
+
+    With ijson installed the file object is parsed incrementally and only
+    one iteration is held in memory at a time, otherwise the whole file is
+    loaded with json. on_iteration(workload, iteration) is called for
+    every iteration.
+    """
+    if ijson is None:
+        logger.warning('ijson is not installed, Rally results {0} are loaded '
+                       'into memory at once'.format(
+                           getattr(results_file, 'name', results_file)))
+        for index, data in enumerate(json.load(results_file)):
+            workload = WorkloadSummary(index)
+            workload.key = data.get('key')
+            workload.sla = data.get('sla', [])
+            workload.full_duration = float(data.get('full_duration') or 0)
+            workload.load_duration = float(data.get('load_duration') or 0)
+            for iteration in data.get('result', []):
+                workload.add_iteration(iteration)
+                if on_iteration is not None:
+                    on_iteration(workload, iteration)
+            yield workload
+        return
+
+    workload = None
+    builder = None
+    depth = 0
+    for prefix, event, value in ijson.parse(results_file):
+        if builder is not None:
+            builder.event(event, value)
+            if event in ('start_map', 'start_array'):
+                depth += 1
+            elif event in ('end_map', 'end_array'):
+                depth -= 1
+            if depth:
+                continue
+            if builder_prefix == 'item.result.item':
+                workload.add_iteration(builder.value)
+                if on_iteration is not None:
+                    on_iteration(workload, builder.value)
+            elif builder_prefix == 'item.sla.item':
+                workload.sla.append(builder.value)
+            else:
+                workload.key = builder.value
+            builder = None
+        elif prefix == 'item':
+            if event == 'start_map':
+                workload = WorkloadSummary(
+                    0 if workload is None else workload.index + 1)
+            elif event == 'end_map':
+                yield workload
+        elif (prefix in ('item.key', 'item.sla.item', 'item.result.item') and
+                event in ('start_map', 'start_array')):
+            builder = ijson.common.ObjectBuilder()
+            builder.event(event, value)
+            builder_prefix = prefix
+            depth = 1
+        elif prefix == 'item.full_duration' and event == 'number':
+            workload.full_duration = float(value)
+        elif prefix == 'item.load_duration' and event == 'number':
+            workload.load_duration = float(value)
+
+
+def read_results_file(path, scenario, task_uuid):
+    """Summarize a results file and save its time series next to it.
+
+    The file is read once, returns list of WorkloadSummary and path of
+    the saved RallyTimeSeries.
+    """
+    series = RallyTimeSeries(
+        name='{0} {1}'.format(scenario, task_uuid),
+        meta={'scenario': scenario, 'task': task_uuid})
+
+    def on_iteration(workload, iteration):
+        series.add_iteration(workload.index, iteration)
+
+    with open(path, 'rb') as f:
+        workloads = list(iter_rally_workloads(f, on_iteration))
+    for workload in workloads:
+        series.set_workload_name(workload.index, workload.name)
+    return workloads, series.save('{0}.npz'.format(os.path.splitext(path)[0]))
+
+
+class WorkloadTimings(object):
+    """Per-iteration timings of one workload in numpy arrays.
+
+    ``durations`` and ``failed`` have an element per iteration, atomic
+    actions have an array of durations each. Statistics are computed over
+    successful iterations.
+    """
+
+    stat_percentiles = (50, 90, 95, 99)
+
+    def __init__(self, summary, durations, failed, atomic_actions):
+        self.summary = summary
+        self.durations = numpy.asarray(durations, dtype=numpy.float64)
+        self.failed = numpy.asarray(failed, dtype=numpy.bool_)
+        self.atomic_actions = OrderedDict(
+            (name, numpy.asarray(values, dtype=numpy.float64))
+            for name, values in atomic_actions.items())
+
+    @property
+    def name(self):
+        return self.summary.name
+
+    @property
+    def iterations(self):
+        return int(self.durations.size)
+
+    @property
+    def errors(self):
+        return int(numpy.count_nonzero(self.failed))
+
+    @property
+    def error_rate(self):
+        if not self.iterations:
+            return 0.0
+        return self.errors / self.iterations
+
+    @property
+    def throughput(self):
+        """Successful iterations per second of load."""
+        if not self.summary.load_duration:
+            return 0.0
+        return (self.iterations - self.errors) / self.summary.load_duration
+
+    def values(self, action=None):
+        if action is None:
+            return self.durations[~self.failed]
+        return self.atomic_actions[action]
+
+    def percentile(self, percent, action=None):
+        """Return percentile(s) of iteration or atomic action durations."""
+        values = self.values(action)
+        if not values.size:
+            return None
+        return numpy.percentile(values, percent)
+
+    def stats(self, action=None):
+        values = self.values(action)
+        result = OrderedDict([('count', int(values.size))])
+        keys = ['min', 'max', 'mean', 'stdev'] + [
+            'p{0}'.format(percent) for percent in self.stat_percentiles]
+        if not values.size:
+            result.update((key, None) for key in keys)
+            return result
+        percentiles = numpy.percentile(values, self.stat_percentiles)
+        result.update(zip(keys, [values.min(), values.max(), values.mean(),
+                                 values.std()] + list(percentiles)))
+        for key in keys:
+            result[key] = float(result[key])
+        return result
+
+    def report(self):
+        return OrderedDict([
+            ('name', self.name),
+            ('iterations', self.iterations),
+            ('errors', self.errors),
+            ('error_rate', self.error_rate),
+            ('throughput', self.throughput),
+            ('duration', self.stats()),
+            ('atomic_actions', OrderedDict(
+                (name, self.stats(name)) for name in self.atomic_actions))
+        ])
+
 
 class RallyResult(object):
-    def __init__(self, json_results):
+    """Results of a Rally task with any number of workloads.
+
+    ``workloads`` is a list of WorkloadTimings, ``values`` holds totals
+    over all of them.
+    """
+
+    def __init__(self, json_results=None, results_file=None):
         self.values = {
             'full_duration': 0.00,
             'load_duration': 0.00,
             'errors': 0
         }
-        self.raw_data = []
-        self.parse_raw_results(json_results)
+        self.workloads = []
+        if results_file is not None:
+            self.parse_results_file(results_file)
+        else:
+            self.parse_raw_results(json_results)
 
     def parse_raw_results(self, raw_results):
-        data = json.loads(raw_results)
-        assert_equal(len(data), 1,
-                     "Current implementation of RallyResult class doesn't "
-                     "support results with length greater than '1'!")
-        self.raw_data = data[0]
-        self.values['full_duration'] = data[0]['full_duration']
-        self.values['load_duration'] = data[0]['load_duration']
-        self.values['errors'] = sum([len(result['error'])
-                                     for result in data[0]['result']])
+        if isinstance(raw_results, unicode):
+            raw_results = raw_results.encode('utf-8')
+        self.parse(io.BytesIO(raw_results))
+
+    def parse_results_file(self, path):
+        with open(path, 'rb') as f:
+            self.parse(f)
+
+    def parse(self, results_file):
+        # workload index -> (durations, failed flags, atomic actions)
+        columns = {}
+
+        def on_iteration(workload, iteration):
+            if workload.index not in columns:
+                columns[workload.index] = (array('d'), array('b'),
+                                           OrderedDict())
+            durations, failed, actions = columns[workload.index]
+            durations.append(float(iteration.get('duration') or 0))
+            failed.append(1 if iteration.get('error') else 0)
+            if iteration.get('error'):
+                return
+            for name, duration in atomic_actions_of(iteration):
+                if name not in actions:
+                    actions[name] = array('d')
+                actions[name].append(duration)
+
+        for summary in iter_rally_workloads(results_file, on_iteration):
+            durations, failed, actions = columns.pop(
+                summary.index, (array('d'), array('b'), {}))
+            self.workloads.append(
+                WorkloadTimings(summary, durations, failed, actions))
+
+        self.values['full_duration'] = sum(
+            w.summary.full_duration for w in self.workloads)
+        self.values['load_duration'] = sum(
+            w.summary.load_duration for w in self.workloads)
+        self.values['errors'] = sum(w.errors for w in self.workloads)
+
+    def report(self):
+        return [workload.report() for workload in self.workloads]
+
+
+class RallyContainerPool(object):
+    """Rally engines and deployments shared by test classes of a session.
+
+    An engine, with its running container, is reused for the same admin
+    node, image repository, proxy and Rally home while the container is
+    running. Deployments are reused for the same engine and credentials.
+    Containers unused for idle_timeout seconds are removed when another
+    engine is requested, reap() removes all of them.
+    """
+
+    def __init__(self, idle_timeout=RALLY_CONTAINER_IDLE_TIMEOUT):
+        self.idle_timeout = idle_timeout
+        self._engines = {}
+        self._last_used = {}
+        self._deployments = {}
+        self._lock = threading.RLock()
+
+    def get_engine(self, admin_remote, container_repo, proxy_url,
+                   dir_for_home):
+        key = (getattr(admin_remote, 'host', None), container_repo,
+               proxy_url or '', dir_for_home)
+        with self._lock:
+            engine = self._engines.get(key)
+            if engine is not None and not engine.rally_container.is_running():
+                logger.warning('Rally container {0} is not running, starting '
+                               'a new one'.format(engine.rally_container.id))
+                engine.rally_container.remove()
+                self._forget(key)
+                engine = None
+            if engine is None:
+                engine = RallyEngine(
+                    admin_remote=admin_remote,
+                    container_repo=container_repo,
+                    proxy_url=proxy_url,
+                    dir_for_home=dir_for_home
+                )
+                self._engines[key] = engine
+            else:
+                logger.info('Reusing Rally container {0}'.format(
+                    engine.rally_container.id))
+            self._last_used[key] = time.time()
+            self.reap(max_idle=self.idle_timeout)
+            return engine
+
+    def get_deployment(self, engine, cluster_vip, username, password,
+                       tenant, proxy_url=''):
+        key = (engine, cluster_vip, username, password, tenant)
+        with self._lock:
+            deployment = self._deployments.get(key)
+            if deployment is None:
+                # an existing deployment with the same credentials is used
+                deployment = RallyDeployment(
+                    rally_engine=engine,
+                    cluster_vip=cluster_vip,
+                    username=username,
+                    password=password,
+                    tenant=tenant,
+                    proxy_url=proxy_url,
+                    force_create=False
+                )
+                self._deployments[key] = deployment
+            return deployment
+
+    def _forget(self, key):
+        engine = self._engines.pop(key)
+        self._last_used.pop(key, None)
+        for d_key in [d_key for d_key in self._deployments
+                      if d_key[0] is engine]:
+            del self._deployments[d_key]
+
+    def reap(self, max_idle=None):
+        """Stop and remove containers unused for max_idle seconds.
+
+        All pooled containers are removed if max_idle is None.
+        """
+        with self._lock:
+            now = time.time()
+            for key in self._engines.keys():
+                if (max_idle is not None and
+                        now - self._last_used[key] < max_idle):
+                    continue
+                container = self._engines[key].rally_container
+                logger.info('Removing Rally container {0}'.format(
+                    container.id))
+                container.stop()
+                container.remove()
+                self._forget(key)
 
 
 class RallyBenchmarkTest(object):
     def __init__(self, container_repo, environment, cluster_id,
-                 test_type, rally_args):
+                 test_type, rally_args, pool=None):
         self.admin_remote = environment.d_env.get_admin_remote()
         self.cluster_vip = environment.fuel_web.get_mgmt_vip(cluster_id)
         self.cluster_credentials = \
@@ -428,6 +1429,23 @@ class RallyBenchmarkTest(object):
         self.home_dir = 'rally-{0}'.format(cluster_id)
         self.test_type = test_type
         self.rally_args = rally_args
+        self.current_task = None
+        if pool is not None:
+            self.engine = pool.get_engine(
+                admin_remote=self.admin_remote,
+                container_repo=self.container_repo,
+                proxy_url=self.proxy_url,
+                dir_for_home='/var/{0}/'.format(self.home_dir)
+            )
+            self.deployment = pool.get_deployment(
+                engine=self.engine,
+                cluster_vip=self.cluster_vip,
+                username=self.cluster_credentials['username'],
+                password=self.cluster_credentials['password'],
+                tenant=self.cluster_credentials['tenant'],
+                proxy_url=self.proxy_url
+            )
+            return
         self.engine = RallyEngine(
             admin_remote=self.admin_remote,
             container_repo=self.container_repo,
@@ -443,18 +1461,22 @@ class RallyBenchmarkTest(object):
             proxy_url=self.proxy_url,
             force_create=True
         )
-        self.current_task = None
 
-    def run(self, timeout=60 * 10, result=True):
+    def run_parallel(self, scenarios, max_concurrency=RALLY_MAX_CONCURRENCY):
+        """Run scenarios concurrently, scenarios is dict scenario -> tags."""
+        scheduler = RallyTaskScheduler(self.deployment, self.rally_args,
+                                       max_concurrency=max_concurrency)
+        for scenario, tags in scenarios.items():
+            scheduler.add(scenario, tags)
+        return scheduler.run()
+
+    def run(self, timeout=RALLY_TASK_TIMEOUT, result=True):
         self.current_task = RallyTask(self.deployment, self.test_type, self.rally_args)
         logger.info('Starting Rally benchmark test...')
         self.current_task.start()
-        return self.current_task.get_results()
-        # assert_equal(self.current_task.status, 'running',
-        #              'Rally task was started, but it is not running, status: '
-        #              '{0}'.format(self.current_task.status))
-        # if result:
-        #     wait(lambda: self.current_task.status == 'finished',
-        #          timeout=timeout, timeout_msg='Rally benchmark test timeout')
-        #     logger.info('Rally benchmark test is finished.')
-        #     return RallyResult(json_results=self.current_task.get_results())
+        return self.current_task.wait_results(timeout=timeout)
+
+    def run_async(self, timeout=RALLY_TASK_TIMEOUT):
+        self.current_task = RallyTask(self.deployment, self.test_type, self.rally_args)
+        logger.info('Starting Rally benchmark test...')
+        return self.current_task.run_async(timeout=timeout)
@@ -1,7 +1,273 @@
+import gzip
 import json
+import os
+import select
+import time
+from collections import OrderedDict
+from decimal import Decimal
+
+import numpy
+import yaml
+try:
+    import ijson
+except ImportError:
+    ijson = None
 
 from fuelweb_test import logger
-from devops.helpers.helpers import wait
+from fuelweb_test.settings import LOGS_DIR
+from devops.error import TimeoutError
+
+
+# Targets of Shaker measurements: between instances or between nodes
+SHAKER_TARGETS = ("instances", "nodes")
+# Seconds the run script may take before the scenario starts: installing
+# Shaker, building its image and starting agents
+SHAKER_SETUP_TIMEOUT = int(os.environ.get('SHAKER_SETUP_TIMEOUT', 900))
+# Seconds the scenario may take per second of its configured test time
+SHAKER_TIMEOUT_FACTOR = float(os.environ.get('SHAKER_TIMEOUT_FACTOR', 3))
+# Shaker runs a test for 60 seconds unless its 'time' is set
+SHAKER_DEFAULT_TEST_TIME = 60
+# Directory the compressed raw Shaker results are archived to
+SHAKER_RESULTS_DIR = os.environ.get('SHAKER_RESULTS_DIR',
+                                    os.path.join(LOGS_DIR, 'shaker'))
+# Keys of Shaker result records used for reporting, raw agent output and
+# the rest are not loaded
+SHAKER_RECORD_KEYS = ('id', 'type', 'status', 'scenario', 'test',
+                      'concurrency', 'node', 'agent', 'stats', 'samples',
+                      'meta')
+# Percentiles of Shaker samples in reports
+SHAKER_PERCENTILES = (5, 50, 95)
+
+
+def _to_float(value):
+    # ijson returns numbers as Decimal
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, list):
+        return [_to_float(item) for item in value]
+    if isinstance(value, dict):
+        return dict((key, _to_float(item)) for key, item in value.items())
+    return value
+
+
+def parse_shaker_results(results_file):
+    """Return {'records': {id: record}, 'agents': {id: agent}} of Shaker JSON.
+
+    Only SHAKER_RECORD_KEYS of every record are kept, 'agents' describes
+    agents and the peers they measure with. With ijson installed the file
+    object is parsed incrementally and the other keys of a record (e.g.
+    raw 'stdout' of agents) are never built, otherwise the whole file is
+    loaded with json.
+    """
+    if ijson is None:
+        logger.warning('ijson is not installed, Shaker results {0} are '
+                       'loaded into memory at once'.format(
+                           getattr(results_file, 'name', results_file)))
+        data = json.load(results_file)
+        records = dict(
+            (record_id, dict((key, value) for key, value in record.items()
+                             if key in SHAKER_RECORD_KEYS))
+            for record_id, record in data.get('records', {}).items())
+        return {'records': records, 'agents': data.get('agents', {})}
+
+    results = {'records': {}, 'agents': {}}
+    record_id = None
+    record_prefix = None
+    record = None
+    builder = None
+    # dict and key the value being built goes to
+    target = None
+    depth = 0
+    for prefix, event, value in ijson.parse(results_file):
+        if builder is not None:
+            builder.event(event, value)
+            if event in ('start_map', 'start_array'):
+                depth += 1
+            elif event in ('end_map', 'end_array'):
+                depth -= 1
+            if not depth:
+                target[0][target[1]] = _to_float(builder.value)
+                builder = None
+        elif prefix == 'agents' and event == 'start_map':
+            builder = ijson.common.ObjectBuilder()
+            builder.event(event, value)
+            depth = 1
+            target = (results, 'agents')
+        elif prefix == 'records' and event == 'map_key':
+            record_id = value
+            record_prefix = 'records.{0}'.format(value)
+            record = {}
+        elif record_id is None:
+            continue
+        elif prefix == record_prefix:
+            if event == 'end_map':
+                results['records'][record_id] = record
+                record_id = None
+        elif prefix.startswith(record_prefix + '.'):
+            key = prefix[len(record_prefix) + 1:]
+            # nested events of the keys which are not kept have dots
+            if key not in SHAKER_RECORD_KEYS:
+                continue
+            if event in ('start_map', 'start_array'):
+                builder = ijson.common.ObjectBuilder()
+                builder.event(event, value)
+                depth = 1
+                target = (record, key)
+            else:
+                record[key] = _to_float(value)
+    return results
+
+
+def read_shaker_results(path):
+    """Return parse_shaker_results() of gzipped Shaker results."""
+    with gzip.open(path, 'rb') as f:
+        return parse_shaker_results(f)
+
+
+def distribution(values, percentiles=SHAKER_PERCENTILES):
+    """Return OrderedDict of count, min, percentiles, max, mean and stdev.
+
+    NaN values (missing samples) are ignored, statistics of no values are
+    None.
+    """
+    values = numpy.asarray(values, dtype=numpy.float64)
+    values = values[~numpy.isnan(values)]
+    keys = (['min'] + ['p{0}'.format(p) for p in percentiles] +
+            ['max', 'mean', 'stdev'])
+    result = OrderedDict([('count', int(values.size))])
+    if not values.size:
+        result.update((key, None) for key in keys)
+        return result
+    result.update(zip(keys, [float(v) for v in
+                             [values.min()] +
+                             list(numpy.percentile(values, percentiles)) +
+                             [values.max(), values.mean(), values.std()]]))
+    return result
+
+
+class ShakerStats(object):
+    """Distribution of per-second samples of Shaker agents.
+
+    Samples of every metric of agent records (a 'meta' column other than
+    time, e.g. bandwidth, retransmits or jitter) are gathered into numpy
+    arrays, so they can be summarized for all agents together, per agent
+    and per pair of nodes an agent measures between. A single slow pair
+    stands out in the per-pair breakdown while a fabric-wide regression
+    moves the overall distribution.
+    """
+
+    def __init__(self, results, percentiles=SHAKER_PERCENTILES):
+        self.percentiles = percentiles
+        # metric -> unit
+        self.units = OrderedDict()
+        # agent -> (node, peer node)
+        self.pairs = {}
+        # agent -> metric -> [numpy array, ...]
+        chunks = OrderedDict()
+        agents = results.get('agents') or {}
+        records = results.get('records') or {}
+        for record_id in sorted(records):
+            record = records[record_id]
+            if (record.get('type', 'agent') != 'agent' or
+                    not record.get('samples') or not record.get('meta')):
+                continue
+            agent = record.get('agent') or record_id
+            self.pairs.setdefault(agent, (record.get('node'),
+                                          self._peer_node(agents, agent)))
+            # None of missing samples becomes NaN
+            samples = numpy.array(record['samples'], dtype=numpy.float64)
+            if samples.ndim != 2:
+                continue
+            for column, (metric, unit) in enumerate(record['meta']):
+                if metric == 'time' or column >= samples.shape[1]:
+                    continue
+                self.units.setdefault(metric, unit)
+                chunks.setdefault(agent, OrderedDict()).setdefault(
+                    metric, []).append(samples[:, column])
+        self.samples = OrderedDict(
+            (agent, OrderedDict((metric, numpy.concatenate(arrays))
+                                for metric, arrays in metrics.items()))
+            for agent, metrics in chunks.items())
+
+    @staticmethod
+    def _peer_node(agents, agent):
+        info = agents.get(agent) or {}
+        peer = info.get('slave') or agents.get(info.get('slave_id')) or {}
+        return peer.get('node')
+
+    @property
+    def metrics(self):
+        return list(self.units)
+
+    def values(self, metric, agent=None):
+        """Return numpy array of samples of the metric of one or all agents."""
+        if agent is not None:
+            return self.samples.get(agent, {}).get(
+                metric, numpy.empty(0))
+        arrays = [metrics[metric] for metrics in self.samples.values()
+                  if metric in metrics]
+        if not arrays:
+            return numpy.empty(0)
+        return numpy.concatenate(arrays)
+
+    def stats(self, metric, agent=None):
+        result = distribution(self.values(metric, agent), self.percentiles)
+        if metric == 'retransmits':
+            result['total'] = float(numpy.nansum(self.values(metric, agent)))
+        return result
+
+    def agent_stats(self, metric):
+        """Return OrderedDict agent -> stats of the metric."""
+        return OrderedDict((agent, self.stats(metric, agent))
+                           for agent, metrics in self.samples.items()
+                           if metric in metrics)
+
+    def pair_stats(self, metric):
+        """Return OrderedDict (node, peer node) -> stats of the metric.
+
+        Samples of all agents measuring between the same nodes (e.g. with
+        several instances per compute) are summarized together.
+        """
+        by_pair = OrderedDict()
+        for agent, metrics in self.samples.items():
+            if metric in metrics:
+                by_pair.setdefault(self.pairs[agent], []).append(
+                    metrics[metric])
+        return OrderedDict(
+            (pair, distribution(numpy.concatenate(arrays), self.percentiles))
+            for pair, arrays in by_pair.items())
+
+    def slowest_pair(self, metric='bandwidth'):
+        """Return ((node, peer node), stats) with the lowest median."""
+        pairs = [(pair, stats) for pair, stats in
+                 self.pair_stats(metric).items() if stats['count']]
+        if not pairs:
+            return None, None
+        return min(pairs, key=lambda item: item[1]['p50'])
+
+    def report(self):
+        def line(name, stats, unit):
+            return '{0}: {1}'.format(name, ', '.join(
+                '{0}={1}'.format(key, value if key == 'count' or value is None
+                                 else '{0:.2f}'.format(value))
+                for key, value in stats.items())) + (
+                ' [{0}]'.format(unit) if unit else '')
+
+        lines = []
+        for metric, unit in self.units.items():
+            lines.append(line(metric, self.stats(metric), unit))
+            for (node, peer), stats in self.pair_stats(metric).items():
+                lines.append('  ' + line('{0} -> {1}'.format(node, peer),
+                                         stats, unit))
+        overall = self.stats('bandwidth')
+        pair, stats = self.slowest_pair('bandwidth')
+        if pair is not None and overall['p50']:
+            lines.append('Slowest pair {0} -> {1}: median {2:.2f} is '
+                         '{3:.0f}% of the overall median'.format(
+                             pair[0], pair[1], stats['p50'],
+                             100.0 * stats['p50'] / overall['p50']))
+        return '\n'.join(lines)
+
 
 class ShakerEngine(object):
 
@@ -9,9 +275,18 @@ class ShakerEngine(object):
     REMOTE_PATH_TO_RUN_SHAKER_BETWEEN_NODES = "/root/run_shaker_nodes.sh"
     REMOTE_PATH_TO_TEST_STATUS = "/root/shaker_test_status.txt"
     REMOTE_PATH_TO_TEST_RESULT = "/root/results.json"
+    REMOTE_PATH_TO_LOG = "/root/shaker_run.log"
+    # scenarios are downloaded by the run scripts
+    REMOTE_PATH_TO_SCENARIO_INSTANCES = "/root/VMs.yaml"
+    REMOTE_PATH_TO_SCENARIO_NODES = "/root/nodes.yaml"
+    # printed by the run scripts when the setup is done
+    SCENARIO_STARTED = "Run scenarios"
+    SCRIPT_EXITED = "__SHAKER_SCRIPT_EXITED__"
     FILES_TO_CLEANUP = [
         "/root/nodes*",
         REMOTE_PATH_TO_TEST_RESULT,
+        REMOTE_PATH_TO_TEST_RESULT + ".gz",
+        REMOTE_PATH_TO_LOG,
         REMOTE_PATH_TO_RUN_SHAKER_BETWEEN_INSTANCES,
         REMOTE_PATH_TO_RUN_SHAKER_BETWEEN_NODES,
         REMOTE_PATH_TO_TEST_STATUS,
@@ -28,6 +303,8 @@ class ShakerEngine(object):
         self.admin_remote.upload(path_to_run_shaker_instances, ShakerEngine.REMOTE_PATH_TO_RUN_SHAKER_BETWEEN_INSTANCES)
         self.admin_remote.upload(path_to_run_shaker_nodes, ShakerEngine.REMOTE_PATH_TO_RUN_SHAKER_BETWEEN_NODES)
 
+    poll_interval = 1
+
     @property
     def current_test_status(self):
         cmd = "cat {}".format(ShakerEngine.REMOTE_PATH_TO_TEST_STATUS)
@@ -36,25 +313,104 @@ class ShakerEngine(object):
         logger.info(result["stdout"][0].strip('\n'))
         return result["stdout"][0].strip('\n')
 
-    def start_shaker_test(self, between_nodes = False):
-        cmd = "screen -dm bash {}".format(ShakerEngine.REMOTE_PATH_TO_RUN_SHAKER_BETWEEN_INSTANCES)
+    def scenario_duration(self, between_nodes=False):
+        """Return configured time of all tests of the scenario in seconds."""
+        path = ShakerEngine.REMOTE_PATH_TO_SCENARIO_INSTANCES
         if between_nodes:
-            cmd = "screen -dm bash {}".format(ShakerEngine.REMOTE_PATH_TO_RUN_SHAKER_BETWEEN_NODES)
+            path = ShakerEngine.REMOTE_PATH_TO_SCENARIO_NODES
+        result = self.admin_remote.execute("cat {}".format(path))
+        if result["exit_code"] != 0:
+            logger.warning("Failed to read Shaker scenario {}".format(path))
+            return None
+        try:
+            scenario = yaml.safe_load("".join(result["stdout"])) or {}
+            tests = scenario.get("execution", {}).get("tests", [])
+            return sum(test.get("time", SHAKER_DEFAULT_TEST_TIME) for test in tests)
+        except (yaml.YAMLError, AttributeError) as e:
+            logger.warning("Failed to parse Shaker scenario {}: {}".format(path, e))
+            return None
 
-        result = self.admin_remote.execute(cmd)
-        assert result["exit_code"] == 0
-        wait(lambda: self.current_test_status == 'running', timeout=10, timeout_msg='Shaker test timeout')
-        logger.info("Shaker test is running")
+    def follow_test(self, between_nodes=False):
+        """Stream the log of the running test until the run script exits.
 
-        wait(lambda: self.current_test_status == 'finished', timeout=900, timeout_msg='Shaker test timeout')
-        logger.info("Shaker test is finished")
+        The log is followed by one 'tail -F' over a single SSH channel and
+        its lines are logged as they come. The script has
+        SHAKER_SETUP_TIMEOUT seconds to start the scenario, then
+        SHAKER_TIMEOUT_FACTOR times the configured time of the scenario to
+        finish. Returns the exit code of the script.
+        """
+        # the pid is printed first to stop tail when the test is finished
+        cmd = "echo $$; exec tail -n +1 -F {} 2>/dev/null".format(ShakerEngine.REMOTE_PATH_TO_LOG)
+        chan, _, _, _ = self.admin_remote.execute_async(cmd)
+        started = time.time()
+        deadline = started + SHAKER_SETUP_TIMEOUT
+        tail_pid = None
+        buf = ""
+        try:
+            while True:
+                while chan.recv_ready():
+                    buf += chan.recv(65536)
+                lines = buf.split("\n")
+                buf = lines.pop()
+                for line in lines:
+                    if tail_pid is None:
+                        tail_pid = line.strip()
+                    elif line.startswith(ShakerEngine.SCRIPT_EXITED):
+                        return int(line.split()[-1])
+                    elif line:
+                        logger.info("shaker: {}".format(line))
+                        if line.startswith(ShakerEngine.SCENARIO_STARTED):
+                            duration = self.scenario_duration(between_nodes)
+                            if duration is not None:
+                                deadline = time.time() + max(duration * SHAKER_TIMEOUT_FACTOR, 300)
+                                logger.info("Shaker scenario takes {}s, waiting for it up to {:.0f}s".format(
+                                    duration, deadline - time.time()))
+                if chan.exit_status_ready() and not chan.recv_ready():
+                    raise AssertionError("Following Shaker test log stopped unexpectedly")
+                if time.time() > deadline:
+                    raise TimeoutError("Shaker test timeout after {:.0f}s".format(time.time() - started))
+                select.select([chan], [], [], self.poll_interval)
+        finally:
+            chan.close()
+            if tail_pid is not None:
+                self.admin_remote.execute("kill {}".format(tail_pid))
+
+    def download_results(self, name):
+        """Download compressed results to SHAKER_RESULTS_DIR, return path."""
+        remote_path = ShakerEngine.REMOTE_PATH_TO_TEST_RESULT + ".gz"
+        result = self.admin_remote.execute("gzip -c {} > {}".format(
+            ShakerEngine.REMOTE_PATH_TO_TEST_RESULT, remote_path))
+        assert result["exit_code"] == 0, "Failed to compress Shaker results: {}".format(result)
+        if not os.path.isdir(SHAKER_RESULTS_DIR):
+            os.makedirs(SHAKER_RESULTS_DIR)
+        local_path = os.path.join(SHAKER_RESULTS_DIR, "{}.json.gz".format(name))
+        self.admin_remote.download(remote_path, local_path)
+        return local_path
+
+    def start_shaker_test(self, between_nodes = False, name=None):
+        script = ShakerEngine.REMOTE_PATH_TO_RUN_SHAKER_BETWEEN_INSTANCES
+        if between_nodes:
+            script = ShakerEngine.REMOTE_PATH_TO_RUN_SHAKER_BETWEEN_NODES
+        # exit of the script is marked in the log, so it is seen at once
+        cmd = ("rm -f {status} {log}; "
+               "screen -dm bash -c 'bash {script} &> {log}; echo {exited} $? >> {log}'").format(
+            status=ShakerEngine.REMOTE_PATH_TO_TEST_STATUS, log=ShakerEngine.REMOTE_PATH_TO_LOG,
+            script=script, exited=ShakerEngine.SCRIPT_EXITED)
 
-        cmd = "cat {}".format(ShakerEngine.REMOTE_PATH_TO_TEST_RESULT)
         result = self.admin_remote.execute(cmd)
         assert result["exit_code"] == 0
-        logger.info(result["stdout"])
-        data = json.loads(result["stdout"][0])
-        logger.info(data)
+        started = time.time()
+        exit_code = self.follow_test(between_nodes)
+        status = self.current_test_status
+        assert status == "finished", "Shaker test is {} after its script exited with {}".format(status, exit_code)
+        logger.info("Shaker test is finished in {:.0f}s".format(time.time() - started))
+
+        if name is None:
+            name = "results_{}_{}".format("nodes" if between_nodes else "instances",
+                                          time.strftime("%Y%m%d_%H%M%S"))
+        path = self.download_results(name)
+        data = read_shaker_results(path)
+        logger.info("Shaker results with {} records are saved to {}".format(len(data["records"]), path))
 
         for file in ShakerEngine.FILES_TO_CLEANUP:
             cmd = "/bin/rm -f {}".format(file)
@@ -62,3 +418,89 @@ class ShakerEngine(object):
             assert result["exit_code"] == 0
 
         return data
+
+
+class ShakerMatrix(object):
+    """Shaker test configurations grouped by the deployment they need.
+
+    A configuration is (segmentation, dvr, l3ha, offloading, target), the
+    first four items describe the deployment. All targets of a deployment
+    are measured on it back to back, so it is deployed once.
+    """
+
+    def __init__(self, configurations=()):
+        # (segmentation, dvr, l3ha, offloading) -> [target, ...]
+        self.deployments = OrderedDict()
+        for configuration in configurations:
+            self.add(*configuration)
+
+    def add(self, segmentation, dvr, l3ha, offloading, target):
+        if segmentation not in ("vlan", "tun"):
+            raise ValueError("Unknown segmentation {}".format(segmentation))
+        if dvr and l3ha:
+            raise ValueError("DVR and L3 HA can't be enabled together")
+        if target not in SHAKER_TARGETS:
+            raise ValueError("Unknown Shaker target {}".format(target))
+        targets = self.deployments.setdefault(
+            (segmentation, dvr, l3ha, offloading), [])
+        if target not in targets:
+            targets.append(target)
+
+    def __len__(self):
+        return sum(len(targets) for targets in self.deployments.values())
+
+    def ordered(self, is_deployed=None):
+        """Return list of (deployment, targets) in the order to run them.
+
+        Deployments for which is_deployed(deployment) is true, e.g. the
+        ones with a snapshot, go first, otherwise the order is kept.
+        """
+        deployments = list(self.deployments.items())
+        if is_deployed is not None:
+            deployments.sort(key=lambda item: not is_deployed(item[0]))
+        return deployments
+
+
+class ShakerMatrixRunner(object):
+    """Runs Shaker on every configuration of a ShakerMatrix.
+
+    deploy(segmentation, dvr, l3ha, offloading) must prepare the cluster,
+    e.g. by reverting its snapshot. Deployments for which is_deployed with
+    the same arguments is true are cheap to prepare and run first.
+    """
+
+    def __init__(self, manager, matrix, deploy,
+                 path_to_run_shaker_instances, path_to_run_shaker_nodes,
+                 is_deployed=None):
+        self.manager = manager
+        self.matrix = matrix
+        self.deploy = deploy
+        self.is_deployed = is_deployed
+        self.path_to_run_shaker_instances = path_to_run_shaker_instances
+        self.path_to_run_shaker_nodes = path_to_run_shaker_nodes
+
+    def measure(self, configuration):
+        # the engine removes its scripts after a test, so one per target
+        engine = ShakerEngine(self.manager.env.d_env.get_admin_remote(),
+                              self.path_to_run_shaker_instances,
+                              self.path_to_run_shaker_nodes)
+        name = "shaker_{}_dvr_{}_l3ha_{}_offloading_{}_{}".format(*configuration)
+        return engine.start_shaker_test(between_nodes=configuration[-1] == "nodes",
+                                        name=name)
+
+    def run(self):
+        """Return dict configuration -> Shaker results."""
+        results = OrderedDict()
+        is_deployed = None
+        if self.is_deployed is not None:
+            is_deployed = lambda deployment: self.is_deployed(*deployment)
+        deployments = self.matrix.ordered(is_deployed)
+        logger.info("Running {} Shaker tests on {} deployments".format(
+            len(self.matrix), len(deployments)))
+        for deployment, targets in deployments:
+            logger.info("Preparing Shaker configuration {}".format(
+                deployment))
+            self.deploy(*deployment)
+            for target in targets:
+                results[deployment + (target,)] = self.measure(deployment + (target,))
+        return results
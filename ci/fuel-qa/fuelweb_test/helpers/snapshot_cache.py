@@ -0,0 +1,123 @@
+#    Copyright 2016 Mirantis, Inc.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import json
+import os
+import time
+
+from fuelweb_test import logger
+
+
+# JSON file with size and last use time of every cached snapshot
+SNAPSHOT_CACHE_INDEX = os.environ.get(
+    'SNAPSHOT_CACHE_INDEX',
+    os.path.expanduser('~/.fuel_snapshot_cache.json'))
+# Disk space in GB cached snapshots may take, least recently used ones
+# are erased when it is exceeded
+SNAPSHOT_CACHE_BUDGET = float(os.environ.get('SNAPSHOT_CACHE_BUDGET', 300))
+# Directory with the libvirt volumes, snapshot sizes are estimated by the
+# change of its free space
+SNAPSHOT_STORAGE_PATH = os.environ.get('SNAPSHOT_STORAGE_PATH',
+                                       '/var/lib/libvirt/images')
+
+
+class SnapshotCache(object):
+    """Environment snapshots evicted in LRU order to fit a disk budget.
+
+    Only snapshots made through make_snapshot() are tracked and may be
+    erased, others (e.g. 'empty' or 'ready') are never touched.
+
+    Snapshots are kept inside the volume files, so there is nothing to
+    measure them by but the drop of free space in storage_path while they
+    are made. The size is approximate: other writes to the same file system
+    at that time are counted too, space freed meanwhile is subtracted.
+    """
+
+    def __init__(self, env, index_path=SNAPSHOT_CACHE_INDEX,
+                 budget_gb=SNAPSHOT_CACHE_BUDGET,
+                 storage_path=SNAPSHOT_STORAGE_PATH):
+        self.env = env
+        self.index_path = index_path
+        self.budget = int(budget_gb * 1024 ** 3)
+        self.storage_path = storage_path
+
+    def _load(self):
+        try:
+            with open(self.index_path) as f:
+                return json.load(f)
+        except (IOError, ValueError):
+            return {}
+
+    def _save(self, index):
+        tmp_path = '{0}.tmp'.format(self.index_path)
+        with open(tmp_path, 'w') as f:
+            json.dump(index, f, indent=4, sort_keys=True)
+        os.rename(tmp_path, self.index_path)
+
+    def free_space(self):
+        try:
+            stat = os.statvfs(self.storage_path)
+        except OSError:
+            return None
+        return stat.f_bavail * stat.f_frsize
+
+    def has_snapshot(self, name):
+        return self.env.d_env.has_snapshot(name)
+
+    def touch(self, name):
+        index = self._load()
+        if name in index:
+            index[name]['used'] = time.time()
+            self._save(index)
+
+    def make_snapshot(self, name):
+        before = self.free_space()
+        self.env.make_snapshot(name, is_make=True)
+        after = self.free_space()
+        size = 0
+        if before is not None and after is not None:
+            size = max(before - after, 0)
+        index = self._load()
+        index[name] = {'size': size, 'used': time.time()}
+        self._save(index)
+        logger.info('Snapshot {0} takes {1:.1f} GB'.format(
+            name, size / 1024.0 ** 3))
+        self.evict(keep=name)
+
+    def erase(self, name):
+        for node in self.env.d_env.get_nodes():
+            if node.has_snapshot(name):
+                node.erase_snapshot(name)
+
+    def evict(self, keep=None):
+        """Erase least recently used snapshots until they fit the budget.
+
+        Only the snapshots considered for eviction are looked up, entries
+        of ones removed by other means are dropped then.
+        """
+        index = self._load()
+        total = sum(entry['size'] for entry in index.values())
+        for name in sorted(index, key=lambda n: index[n]['used']):
+            if total <= self.budget:
+                break
+            if name == keep:
+                continue
+            if not self.has_snapshot(name):
+                total -= index.pop(name)['size']
+                continue
+            logger.info('Erasing snapshot {0} to fit snapshot cache into '
+                        '{1:.0f} GB'.format(name, self.budget / 1024.0 ** 3))
+            self.erase(name)
+            total -= index.pop(name)['size']
+        self._save(index)
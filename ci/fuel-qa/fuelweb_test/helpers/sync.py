@@ -0,0 +1,119 @@
+#    Copyright 2016 Mirantis, Inc.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import hashlib
+import json
+import os
+import posixpath
+import tarfile
+import tempfile
+import uuid
+
+from proboscis.asserts import assert_equal
+
+from fuelweb_test import logger
+
+
+MANIFEST_NAME = '.sync_manifest.json'
+
+
+def file_hash(path):
+    digest = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def local_files(sources):
+    """Return dict remote relative path -> local path of files to sync.
+
+    Like remote.upload() to an existing target directory, a file or a
+    directory goes to the target directory by its name, i.e. files of a
+    directory are put under <target>/<directory name>/.
+    """
+    files = {}
+    for source in sources:
+        source = os.path.normpath(source)
+        base = os.path.basename(source)
+        if not os.path.isdir(source):
+            files[base] = source
+            continue
+        for root, dirs, names in os.walk(source):
+            for name in names:
+                path = os.path.join(root, name)
+                rel_path = os.path.relpath(path, source).replace(os.sep, '/')
+                files[posixpath.join(base, rel_path)] = path
+    return files
+
+
+def read_remote_manifest(remote, remote_dir):
+    result = remote.execute('cat {0} 2>/dev/null'.format(
+        posixpath.join(remote_dir, MANIFEST_NAME)))
+    if result['exit_code'] != 0:
+        return {}
+    try:
+        return json.loads(''.join(result['stdout']))
+    except ValueError:
+        logger.warning('Ignoring broken sync manifest in {0}'.format(
+            remote_dir))
+        return {}
+
+
+def sync_files(remote, sources, remote_dir):
+    """Upload files and directories to remote_dir in one compressed archive.
+
+    Content hashes of uploaded files are kept in a manifest in remote_dir,
+    files whose hash did not change since the last sync are not uploaded.
+    Returns the number of uploaded files.
+    """
+    files = local_files(sources)
+    hashes = dict((rel_path, file_hash(path))
+                  for rel_path, path in files.items())
+    manifest = read_remote_manifest(remote, remote_dir)
+    changed = sorted(rel_path for rel_path, digest in hashes.items()
+                     if manifest.get(rel_path) != digest)
+    if not changed:
+        logger.info('{0} files in {1} are up to date'.format(
+            len(files), remote_dir))
+        return 0
+    manifest.update(hashes)
+
+    fd, archive = tempfile.mkstemp(suffix='.tar.gz')
+    os.close(fd)
+    try:
+        with tarfile.open(archive, 'w:gz') as tar:
+            for rel_path in changed:
+                tar.add(files[rel_path], arcname=rel_path)
+            manifest_path = '{0}.manifest'.format(archive)
+            with open(manifest_path, 'w') as f:
+                json.dump(manifest, f, indent=1, sort_keys=True)
+            try:
+                tar.add(manifest_path, arcname=MANIFEST_NAME)
+            finally:
+                os.remove(manifest_path)
+        remote_archive = '/tmp/sync-{0}.tar.gz'.format(uuid.uuid4().hex)
+        remote.upload(archive, remote_archive)
+    finally:
+        os.remove(archive)
+
+    result = remote.execute(
+        'mkdir -p {0} && tar -xzf {1} -C {0}; rc=$?; rm -f {1}; '
+        'exit $rc'.format(remote_dir, remote_archive))
+    assert_equal(result['exit_code'], 0,
+                 'Failed to extract files to {0}: {1}'.format(remote_dir,
+                                                              result))
+    logger.info('Uploaded {0} of {1} files to {2}'.format(
+        len(changed), len(files), remote_dir))
+    return len(changed)
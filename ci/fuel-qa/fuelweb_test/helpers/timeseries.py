@@ -0,0 +1,228 @@
+#    Copyright 2016 Mirantis, Inc.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+from __future__ import division
+
+import json
+import os
+from array import array
+from collections import OrderedDict
+
+import numpy
+
+from fuelweb_test.settings import LOGS_DIR
+
+
+# Directory for time series of results which are not saved next to a
+# Rally results file (e.g. Horizon results sent to TestRail)
+TIMESERIES_DIR = os.environ.get('TIMESERIES_DIR',
+                                os.path.join(LOGS_DIR, 'timeseries'))
+
+# Name of the pseudo atomic action with durations of whole iterations
+ITERATION = 'iteration'
+
+# column -> (array typecode, numpy dtype)
+COLUMNS = OrderedDict([
+    ('workload', ('h', numpy.int16)),
+    ('iteration', ('i', numpy.int32)),
+    ('action', ('h', numpy.int16)),
+    ('timestamp', ('d', numpy.float64)),
+    ('duration', ('f', numpy.float32)),
+    ('error', ('b', numpy.bool_)),
+])
+
+
+def atomic_actions_of(iteration):
+    """Return list of (name, duration) of atomic actions of the iteration.
+
+    Rally reports them as a dict name -> duration or, in newer versions, as
+    a list of dicts with 'name', 'started_at' and 'finished_at'.
+    """
+    actions = iteration.get('atomic_actions') or {}
+    if isinstance(actions, dict):
+        return [(name, float(duration)) for name, duration in actions.items()
+                if duration is not None]
+    return [(action['name'],
+             float(action['finished_at']) - float(action['started_at']))
+            for action in actions if action.get('finished_at') is not None]
+
+
+class RallyTimeSeries(object):
+    """Durations of every iteration and atomic action of a Rally run.
+
+    A row is (workload, iteration, action, timestamp, duration, error),
+    workloads and actions are stored as indexes into the ``workloads`` and
+    ``actions`` lists. Whole iterations are rows of the ITERATION action.
+    Rows are appended to compact arrays and saved to a compressed .npz file
+    with one array per column.
+    """
+
+    def __init__(self, name=None, meta=None):
+        self.name = name
+        self.meta = meta or {}
+        self.workloads = []
+        self.actions = [ITERATION]
+        self._action_ids = {ITERATION: 0}
+        self._rows = dict((column, array(typecode))
+                          for column, (typecode, _) in COLUMNS.items())
+        self._columns = None
+        self._iterations = {}
+
+    @classmethod
+    def from_results(cls, results, name=None, meta=None):
+        """Build the time series of parsed 'rally task results' JSON."""
+        series = cls(name=name, meta=meta)
+        for index, workload in enumerate(results):
+            series.set_workload_name(index, workload['key']['name'])
+            for iteration in workload['result']:
+                series.add_iteration(index, iteration)
+        return series
+
+    def set_workload_name(self, index, name):
+        if index >= len(self.workloads):
+            self.workloads.extend([None] * (index + 1 - len(self.workloads)))
+        self.workloads[index] = name
+
+    def _action_id(self, name):
+        if name not in self._action_ids:
+            self._action_ids[name] = len(self.actions)
+            self.actions.append(name)
+        return self._action_ids[name]
+
+    def _append(self, workload, number, action, timestamp, duration, error):
+        rows = self._rows
+        rows['workload'].append(workload)
+        rows['iteration'].append(number)
+        rows['action'].append(action)
+        rows['timestamp'].append(timestamp)
+        rows['duration'].append(duration)
+        rows['error'].append(error)
+
+    def add_iteration(self, workload, iteration):
+        """Append rows of the iteration of workload with the given index."""
+        if workload >= len(self.workloads):
+            self.set_workload_name(workload, None)
+        number = self._iterations.get(workload, 0)
+        self._iterations[workload] = number + 1
+        timestamp = float(iteration.get('timestamp') or 0)
+        error = 1 if iteration.get('error') else 0
+        self._append(workload, number, 0, timestamp,
+                     float(iteration.get('duration') or 0), error)
+        for name, duration in atomic_actions_of(iteration):
+            self._append(workload, number, self._action_id(name), timestamp,
+                         duration, error)
+        self._columns = None
+
+    @property
+    def columns(self):
+        if self._columns is None:
+            self._columns = dict(
+                (column, numpy.asarray(self._rows[column], dtype=dtype))
+                for column, (_, dtype) in COLUMNS.items())
+        return self._columns
+
+    def __len__(self):
+        return len(self._rows['duration'])
+
+    def save(self, path):
+        directory = os.path.dirname(path)
+        if directory and not os.path.isdir(directory):
+            os.makedirs(directory)
+        header = json.dumps({'name': self.name, 'meta': self.meta,
+                             'workloads': self.workloads,
+                             'actions': self.actions})
+        numpy.savez_compressed(path, header=numpy.array(header),
+                               **self.columns)
+        return path
+
+    @classmethod
+    def load(cls, path):
+        with numpy.load(path) as data:
+            header = json.loads(data['header'].item())
+            series = cls(name=header['name'] or os.path.basename(path),
+                         meta=header['meta'])
+            series.workloads = header['workloads']
+            series.actions = header['actions']
+            series._action_ids = dict(
+                (name, index) for index, name in enumerate(series.actions))
+            for column, (typecode, dtype) in COLUMNS.items():
+                series._rows[column] = array(
+                    typecode, data[column].astype(dtype).tobytes())
+        return series
+
+    def mask(self, workload=None, action=ITERATION, successful=True):
+        """Return boolean numpy mask of rows of the workload and action.
+
+        workload is a name or an index, None selects all workloads.
+        """
+        columns = self.columns
+        if action not in self._action_ids:
+            return numpy.zeros(len(self), dtype=numpy.bool_)
+        mask = columns['action'] == self._action_ids[action]
+        if workload is not None:
+            if not isinstance(workload, int):
+                workload = self.workloads.index(workload)
+            mask &= columns['workload'] == workload
+        if successful:
+            mask &= ~columns['error']
+        return mask
+
+    def durations(self, workload=None, action=ITERATION, successful=True):
+        return self.columns['duration'][
+            self.mask(workload, action, successful)]
+
+    def stats(self, workload=None, action=ITERATION,
+              percentiles=(50, 90, 95, 99)):
+        selected = self.mask(workload, action, successful=False)
+        errors = int(numpy.count_nonzero(selected & self.columns['error']))
+        values = self.columns['duration'][selected & ~self.columns['error']]
+        result = OrderedDict([('count', int(values.size)),
+                              ('errors', errors)])
+        keys = ['mean', 'stdev'] + ['p{0}'.format(p) for p in percentiles]
+        if not values.size:
+            result.update((key, None) for key in keys)
+            return result
+        values = values.astype(numpy.float64)
+        result.update(zip(keys, [float(v) for v in
+                                 [values.mean(), values.std()] +
+                                 list(numpy.percentile(values, percentiles))]))
+        return result
+
+
+def timeseries_path(name):
+    return os.path.join(TIMESERIES_DIR, '{0}.npz'.format(name))
+
+
+def load_runs(paths):
+    """Return OrderedDict run name -> RallyTimeSeries of the .npz files."""
+    runs = OrderedDict()
+    for path in paths:
+        series = RallyTimeSeries.load(path)
+        runs[series.name if series.name not in runs else path] = series
+    return runs
+
+
+def compare_runs(runs, action=ITERATION, workload=None,
+                 percentiles=(50, 90, 95, 99)):
+    """Return OrderedDict run name -> duration stats of the action.
+
+    runs is a list of .npz paths or a dict returned by load_runs(), stats
+    of every run are computed with the same workload and action filter.
+    """
+    if not isinstance(runs, dict):
+        runs = load_runs(runs)
+    return OrderedDict(
+        (name, series.stats(workload=workload, action=action,
+                            percentiles=percentiles))
+        for name, series in runs.items())
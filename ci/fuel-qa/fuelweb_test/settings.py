@@ -88,3 +88,57 @@ class TestRailSettings(object):
         'blocked': ['blocked']
     }
     max_results_per_request = 250
+    connection_pool_size = int(os.environ.get('TESTRAIL_POOL_SIZE', 10))
+    max_concurrent_requests = int(os.environ.get('TESTRAIL_CONCURRENCY', 8))
+    rate_limit_retries = int(os.environ.get('TESTRAIL_RATE_LIMIT_RETRIES', 5))
+    # Seconds to keep GET responses of the endpoint in the response cache,
+    # endpoints which are not listed here are never cached
+    cache_ttl = {
+        'get_statuses': 24 * 60 * 60,
+        'get_priorities': 24 * 60 * 60,
+        'get_case_fields': 24 * 60 * 60,
+        'get_projects': 60 * 60,
+        'get_users': 60 * 60,
+        'get_user': 60 * 60,
+        'get_configs': 60 * 60,
+        'get_milestones': 10 * 60,
+        'get_milestone': 10 * 60,
+        'get_suites': 10 * 60,
+        'get_suite': 10 * 60,
+        'get_sections': 10 * 60,
+        'get_section': 10 * 60,
+        'get_cases': 5 * 60,
+        'get_case': 5 * 60,
+        'get_plans': 60,
+        'get_plan': 60,
+        'get_runs': 60,
+        'get_run': 60,
+        'get_tests': 60,
+        'get_test': 60
+    }
+    # responses of every TestRail URL and user are saved next to it, in
+    # a file with their hash in the name
+    cache_file = os.environ.get('TESTRAIL_CACHE_FILE', None)
+    # endpoints whose responses do not change during a run, only they are
+    # saved to cache_file and shared with other jobs
+    cache_persistent = ('get_statuses', 'get_priorities', 'get_case_fields',
+                        'get_configs', 'get_suites', 'get_suite',
+                        'get_sections', 'get_section', 'get_cases',
+                        'get_case')
+    results_batch_size = int(os.environ.get('TESTRAIL_RESULTS_BATCH', 100))
+    results_flush_interval = int(os.environ.get('TESTRAIL_RESULTS_FLUSH', 30))
+    # every results queue keeps failed batches in its own file there, files
+    # of crashed processes are sent with
+    # 'python -m fuelweb_test.testrail.submission'
+    results_journal_dir = os.environ.get(
+        'TESTRAIL_RESULTS_JOURNAL_DIR',
+        os.path.join(LOGS_DIR, 'testrail_results_journal'))
+    baselines_cache = os.environ.get(
+        'TESTRAIL_BASELINES_CACHE',
+        os.path.join(LOGS_DIR, 'testrail_baselines.json'))
+    # seconds after which cached baselines are fetched again in full, only
+    # a full fetch notices deleted cases
+    baselines_max_age = int(os.environ.get('TESTRAIL_BASELINES_MAX_AGE',
+                                           24 * 60 * 60))
+    # JSON file to save per-endpoint request stats to at exit
+    stats_file = os.environ.get('TESTRAIL_STATS_FILE', None)
@@ -0,0 +1,152 @@
+#    Copyright 2016 Mirantis, Inc.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+from __future__ import unicode_literals
+
+import json
+import os
+import threading
+import time
+
+from fuelweb_test.settings import TestRailSettings
+from fuelweb_test.testrail.cache import scoped_path
+from fuelweb_test.testrail.settings import logger
+
+
+class SuiteBaseline(object):
+    """Expected step values (baselines) of the test cases of one suite.
+
+    Cases are fetched with one paginated get_cases call on first access and
+    kept in a table keyed by case id and title. When ``path`` is given the
+    table is also stored there; the next process loads it and revalidates
+    it by asking TestRail only for the cases updated after the newest
+    'updated_on' it has, so an unchanged suite costs a single empty page.
+    Deleted cases are not reported that way, so a table older than
+    ``max_age`` seconds is fetched again in full. The table is stored in a
+    file next to ``path`` named after the TestRail URL (see scoped_path()).
+    """
+
+    def __init__(self, project, suite_id, path=None, max_age=None):
+        self.project = project
+        self.suite_id = int(suite_id)
+        self.path = scoped_path(path, project.client.base_url)
+        if max_age is None:
+            max_age = TestRailSettings.baselines_max_age
+        self.max_age = max_age
+        self._cases = None
+        self._by_title = None
+        self._updated_on = 0
+        self._loaded_on = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _entry(case):
+        return {'title': case['title'],
+                'steps': case.get('custom_test_case_steps') or []}
+
+    def load(self):
+        """Fetch or revalidate the table, done once per object."""
+        with self._lock:
+            if self._cases is not None:
+                return
+            cases, updated_on, loaded_on = self._read_cache()
+            full = (cases is None or
+                    time.time() - loaded_on > self.max_age)
+            if full:
+                cases = {}
+                updated_on = 0
+                loaded_on = time.time()
+                changed = self.project.iter_cases(self.suite_id)
+            else:
+                changed = self.project.iter_cases(self.suite_id,
+                                                  updated_after=updated_on)
+            count = 0
+            for case in changed:
+                cases[case['id']] = self._entry(case)
+                updated_on = max(updated_on, case.get('updated_on') or 0)
+                count += 1
+            logger.debug('Baselines of suite {0}: {1} cases, {2} fetched from '
+                         'TestRail'.format(self.suite_id, len(cases), count))
+            self._updated_on = updated_on
+            self._loaded_on = loaded_on
+            self._by_title = dict((case['title'], case_id)
+                                  for case_id, case in cases.items())
+            self._cases = cases
+            if count or full:
+                self._write_cache()
+
+    def steps(self, case_id=None, title=None):
+        """Return steps of the case given by id or title."""
+        self.load()
+        if case_id is None:
+            case_id = self._by_title.get(title)
+        case = self._cases.get(case_id)
+        if case is None:
+            raise KeyError('No case {0} in suite {1}'.format(
+                title if title is not None else case_id, self.suite_id))
+        return case['steps']
+
+    def expected(self, case_id=None, title=None, content=None, index=0):
+        """Return expected value of a step of the case.
+
+        The step is the first one whose content includes ``content`` or,
+        when it is not given, the step with the ``index``.
+        """
+        steps = self.steps(case_id=case_id, title=title)
+        if content is None:
+            return steps[index]['expected']
+        for step in steps:
+            if content in step['content']:
+                return step['expected']
+        raise KeyError('No "{0}" step in case {1}'.format(
+            content, title if title is not None else case_id))
+
+    def _read_cache(self):
+        if not self.path or not os.path.isfile(self.path):
+            return None, 0, 0
+        try:
+            with open(self.path) as f:
+                suite = json.load(f).get(str(self.suite_id))
+        except (IOError, ValueError) as e:
+            logger.warning('Failed to load baselines from {0}: {1}'.format(
+                self.path, e))
+            return None, 0, 0
+        if not suite:
+            return None, 0, 0
+        cases = dict((int(case_id), case)
+                     for case_id, case in suite['cases'].items())
+        # files saved before full reloads were added have no 'loaded_on'
+        return cases, suite['updated_on'], suite.get('loaded_on', 0)
+
+    def _write_cache(self):
+        if not self.path:
+            return
+        suites = {}
+        if os.path.isfile(self.path):
+            try:
+                with open(self.path) as f:
+                    suites = json.load(f)
+            except (IOError, ValueError):
+                suites = {}
+        suites[str(self.suite_id)] = {'updated_on': self._updated_on,
+                                      'loaded_on': self._loaded_on,
+                                      'cases': self._cases}
+        tmp_path = '{0}.tmp'.format(self.path)
+        try:
+            with open(tmp_path, 'w') as f:
+                json.dump(suites, f)
+            os.rename(tmp_path, self.path)
+        except (IOError, OSError) as e:
+            logger.warning('Failed to save baselines to {0}: {1}'.format(
+                self.path, e))
@@ -0,0 +1,200 @@
+#    Copyright 2016 Mirantis, Inc.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Benchmark the performance reporters against the fake TestRail server.
+
+A FakeTestRailServer is seeded with the Shaker and Horizon suites, then
+the Shaker reporter sends a report of generated results and the Horizon
+reporter checks generated Rally results against the suite baselines. Time
+spent in every step, the requests counted by the client (RequestStats) and
+by the server and the response cache counters are printed as JSON.
+
+Run from the fuel-qa root:
+
+    python -m fuelweb_test.testrail.benchmark_reporters --latency 0.05 \\
+        --rate-limit 180 --repeat 3
+"""
+
+from __future__ import print_function
+from __future__ import unicode_literals
+
+import json
+import random
+import time
+from optparse import OptionParser
+
+from fuelweb_test.settings import TestRailSettings
+from fuelweb_test.testrail.cache import ResponseCache
+from fuelweb_test.testrail.fake_server import FakeTestRailServer
+from fuelweb_test.testrail.fake_server import seed_performance_suites
+from fuelweb_test.testrail.performance_testrail_report import \
+    HORIZON_CASES
+from fuelweb_test.testrail.performance_testrail_report import \
+    SHAKER_CONF_TO_TITLE
+from fuelweb_test.testrail.performance_testrail_report import \
+    HorizonTestResult
+from fuelweb_test.testrail.performance_testrail_report import \
+    HorizonTestResultReporter
+from fuelweb_test.testrail.performance_testrail_report import \
+    ShakerTestResultReporter
+from fuelweb_test.testrail.performance_testrail_report import \
+    TestResultReporter
+from fuelweb_test.testrail.testrail import get_session
+from fuelweb_test.testrail.testrail_client import TestRailProject
+
+
+PROJECT_NAME = 'Mirantis OpenStack'
+
+
+def shaker_results(agents=4, samples=60, seed=0):
+    """Return generated Shaker results of every configuration."""
+    rand = random.Random(seed)
+    data = {}
+    for conf in sorted(SHAKER_CONF_TO_TITLE):
+        records = {}
+        agents_info = {}
+        for index in range(agents):
+            agent = 'agent_{0}'.format(index)
+            bandwidth = [rand.gauss(9000, 300) for _ in range(samples)]
+            mean = sum(bandwidth) / len(bandwidth)
+            stdev = (sum((value - mean) ** 2 for value in bandwidth) /
+                     len(bandwidth)) ** 0.5
+            records['record_{0}'.format(index)] = {
+                'type': 'agent',
+                'agent': agent,
+                'node': 'node-{0}'.format(index),
+                'meta': [['time', 's'], ['bandwidth', 'Mbit/s'],
+                         ['retransmits', '']],
+                'samples': [[second, value, rand.randint(0, 3)]
+                            for second, value in enumerate(bandwidth)],
+                'stats': {'bandwidth': {
+                    'median': sorted(bandwidth)[len(bandwidth) // 2],
+                    'stdev': stdev}}
+            }
+            agents_info[agent] = {'id': agent,
+                                  'node': 'node-{0}'.format(index),
+                                  'slave_id': 'agent_{0}'.format(
+                                      (index + 1) % agents)}
+        data[conf] = {'records': records, 'agents': agents_info}
+    return data
+
+
+def horizon_results(iterations=20, seed=0):
+    """Return generated 'rally task results' of the Horizon pages."""
+    rand = random.Random(seed)
+    action = HorizonTestResult.open_page_action
+    results = []
+    for page, cases in sorted(HORIZON_CASES.items()):
+        for objects, case_id in sorted(cases.items()):
+            if case_id is None:
+                continue
+            started = time.time()
+            iterations_data = []
+            for number in range(iterations):
+                duration = rand.uniform(1, 4)
+                iterations_data.append({
+                    'timestamp': started + number * 5,
+                    'duration': duration + 0.5,
+                    'error': [],
+                    'atomic_actions': {action: duration}})
+            results.append({
+                'key': {'name': 'HorizonPerformance.open_page',
+                        'kw': {'args': {'page': page},
+                               'context': {'selenium': {
+                                   'items_per_page': objects}}}},
+                'sla': [{'success': True}],
+                'full_duration': iterations * 5.0,
+                'result': iterations_data})
+    return results
+
+
+def timed(timings, name, func, *args, **kwargs):
+    started = time.time()
+    try:
+        return func(*args, **kwargs)
+    finally:
+        timings[name] = round(time.time() - started, 3)
+
+
+def run_round(server, shaker_data, horizon_data):
+    """Run both reporters against server, return timings and stats."""
+    server.reset_stats()
+    project = TestRailProject(server.url, 'user', 'password', PROJECT_NAME,
+                              cache=ResponseCache(TestRailSettings.cache_ttl))
+    project.client.stats.reset()
+    saved = (TestResultReporter.__dict__['project'],
+             ShakerTestResultReporter.baseline,
+             HorizonTestResultReporter.baseline)
+    # Reporters share a class level project, point it to the fake server
+    # and start without baselines, as a new process would
+    TestResultReporter.project = project
+    ShakerTestResultReporter.baseline = None
+    HorizonTestResultReporter.baseline = None
+    timings = {}
+    try:
+        shaker = timed(timings, 'shaker_results', ShakerTestResultReporter,
+                       shaker_data)
+        timed(timings, 'shaker_send_report', shaker.send_report)
+        horizon = timed(timings, 'horizon_results',
+                        HorizonTestResultReporter, horizon_data)
+        timed(timings, 'horizon_save_timeseries', horizon.save_timeseries)
+    finally:
+        (TestResultReporter.project, ShakerTestResultReporter.baseline,
+         HorizonTestResultReporter.baseline) = saved
+    timings['total'] = round(sum(timings.values()), 3)
+    return {'seconds': timings,
+            'client': project.request_stats(),
+            'cache': project.cache_stats(),
+            'server': server.stats()}
+
+
+def main():
+    parser = OptionParser(
+        description='Benchmark the Shaker and Horizon TestRail reporters '
+                    'against the fake TestRail server.')
+    parser.add_option('--latency', type='float', default=0,
+                      help='seconds the server waits before every answer')
+    parser.add_option('--rate-limit', dest='rate_limit', type='int',
+                      default=None,
+                      help='requests per --rate-period seconds, answer '
+                           'with HTTP 429 above it')
+    parser.add_option('--rate-period', dest='rate_period', type='float',
+                      default=1.0)
+    parser.add_option('--agents', type='int', default=4,
+                      help='Shaker agents per configuration')
+    parser.add_option('--samples', type='int', default=60,
+                      help='Shaker samples per agent')
+    parser.add_option('--iterations', type='int', default=20,
+                      help='Rally iterations per Horizon page')
+    parser.add_option('--repeat', type='int', default=1,
+                      help='number of rounds, each with a new project')
+    options, _ = parser.parse_args()
+
+    shaker_data = shaker_results(options.agents, options.samples)
+    horizon_data = horizon_results(options.iterations)
+    server = FakeTestRailServer(latency=options.latency,
+                                rate_limit=options.rate_limit,
+                                rate_period=options.rate_period)
+    seed_performance_suites(server.data, project_name=PROJECT_NAME)
+    rounds = []
+    with server:
+        for _ in range(options.repeat):
+            rounds.append(run_round(server, shaker_data, horizon_data))
+        # Close kept-alive connections before the server goes away
+        get_session().close()
+    print(json.dumps(rounds, indent=4, sort_keys=True))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,227 @@
+#    Copyright 2016 Mirantis, Inc.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+from __future__ import unicode_literals
+
+import atexit
+import copy
+import hashlib
+import json
+import os
+import threading
+import time
+
+from fuelweb_test.testrail.settings import logger
+
+
+# Read endpoints whose cached responses become stale after a write to the
+# given kind of object (add_run, update_run, delete_run -> 'run', etc.)
+WRITE_INVALIDATES = {
+    'run': ('get_run', 'get_runs', 'get_tests', 'get_test',
+            'get_plan', 'get_plans'),
+    'plan': ('get_plan', 'get_plans', 'get_run', 'get_runs', 'get_tests',
+             'get_test'),
+    'result': ('get_tests', 'get_test', 'get_run', 'get_runs', 'get_plan'),
+    'case': ('get_case', 'get_cases', 'get_tests', 'get_test'),
+    'section': ('get_section', 'get_sections', 'get_cases'),
+    'suite': ('get_suite', 'get_suites'),
+    'milestone': ('get_milestone', 'get_milestones'),
+}
+
+
+# path -> caches persisted to it, they are saved with one atexit handler
+_caches_by_path = {}
+_caches_lock = threading.Lock()
+
+
+def endpoint_of(uri):
+    """Return API method of the uri: 'get_tests/1&status_id=5' -> 'get_tests'
+    """
+    return uri.split('/', 1)[0].split('&', 1)[0]
+
+
+def scoped_path(path, *scope):
+    """Return path of the file for the given TestRail URL, user, etc.
+
+    Responses of different TestRail instances or users must not be mixed
+    in one file: 'cache.json' -> 'cache.<hash of scope>.json'.
+    """
+    if not path:
+        return path
+    digest = hashlib.sha1('\n'.join(scope).encode('utf-8')).hexdigest()
+    root, ext = os.path.splitext(path)
+    return '{0}.{1}{2}'.format(root, digest[:12], ext)
+
+
+def written_object(endpoint):
+    """Return kind of object changed by the write endpoint.
+
+    'add_results_for_cases' -> 'result', 'add_plan_entry' -> 'plan'
+    """
+    parts = endpoint.split('_')
+    if len(parts) < 2:
+        return None
+    noun = parts[1]
+    if noun.endswith('s'):
+        noun = noun[:-1]
+    return noun
+
+
+class ResponseCache(object):
+    """In-process cache of TestRail GET responses with per-endpoint TTLs.
+
+    Only endpoints listed in ``ttl`` are cached. Entries are stored with an
+    absolute expiration time, so they stay valid when persisted to ``path``
+    and loaded by another process (e.g. the next job on the same slave).
+    Only endpoints listed in ``persistent`` are persisted, responses which
+    change during a run (runs, plans, tests) are kept in memory only.
+
+    Callers get copies of cached objects and may modify them. Keys are
+    request URIs only, so a cache (and its file, see scoped_path()) must
+    serve a single TestRail URL and user.
+    """
+
+    def __init__(self, ttl, path=None, persistent=()):
+        self.ttl = dict(ttl)
+        self.path = path
+        self.persistent = frozenset(persistent)
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self._entries = {}
+        self._lock = threading.Lock()
+        if self.path:
+            self.load()
+            with _caches_lock:
+                if self.path not in _caches_by_path:
+                    _caches_by_path[self.path] = []
+                    atexit.register(_save_path, self.path)
+                _caches_by_path[self.path].append(self)
+
+    def is_cacheable(self, uri):
+        return self.ttl.get(endpoint_of(uri), 0) > 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > time.time():
+                self.hits += 1
+                return True, copy.deepcopy(entry[1])
+            self._entries.pop(key, None)
+            self.misses += 1
+            return False, None
+
+    def put(self, key, value):
+        ttl = self.ttl.get(endpoint_of(key), 0)
+        if ttl <= 0:
+            return
+        value = copy.deepcopy(value)
+        with self._lock:
+            self._entries[key] = (time.time() + ttl, value)
+
+    def get_or_fetch(self, key, fetch):
+        """Return cached response for key or call fetch() and cache result."""
+        if not self.is_cacheable(key):
+            return fetch()
+        found, value = self.get(key)
+        if found:
+            return value
+        value = fetch()
+        self.put(key, value)
+        return value
+
+    def invalidate(self, endpoints=None):
+        """Drop cached responses of given endpoints (all when None)."""
+        with self._lock:
+            if endpoints is None:
+                dropped = list(self._entries)
+            else:
+                dropped = [key for key in self._entries
+                           if endpoint_of(key) in endpoints]
+            for key in dropped:
+                del self._entries[key]
+            self.invalidations += len(dropped)
+
+    def invalidate_for_write(self, uri):
+        """Drop responses which may be stale after POST to the uri."""
+        endpoints = WRITE_INVALIDATES.get(written_object(endpoint_of(uri)))
+        if endpoints is None:
+            logger.debug('Unknown TestRail write endpoint {0}, dropping '
+                         'whole response cache'.format(uri))
+        self.invalidate(endpoints)
+
+    def stats(self):
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'invalidations': self.invalidations,
+            'entries': len(self._entries)
+        }
+
+    def _persistent_entries(self, entries, now):
+        return dict((key, entry) for key, entry in entries.items()
+                    if entry[0] > now and endpoint_of(key) in self.persistent)
+
+    def load(self):
+        entries = _read_entries(self.path)
+        with self._lock:
+            self._entries.update(self._persistent_entries(entries,
+                                                          time.time()))
+        logger.debug('Loaded {0} TestRail responses from {1}'.format(
+            len(self._entries), self.path))
+
+    def save(self):
+        _save_path(self.path)
+
+
+def _read_entries(path):
+    if not os.path.isfile(path):
+        return {}
+    try:
+        with open(path) as f:
+            return dict((key, tuple(entry))
+                        for key, entry in json.load(f).items())
+    except (IOError, ValueError) as e:
+        logger.warning('Failed to load TestRail cache from {0}: '
+                       '{1}'.format(path, e))
+        return {}
+
+
+def _save_path(path):
+    """Merge persistent entries of caches of the path into its file.
+
+    Entries saved by other processes meanwhile are kept, the one expiring
+    later wins.
+    """
+    now = time.time()
+    with _caches_lock:
+        caches = list(_caches_by_path.get(path, ()))
+    entries = {}
+    for cache in caches:
+        with cache._lock:
+            cache_entries = dict(cache._entries)
+        entries.update(cache._persistent_entries(cache_entries, now))
+    for key, entry in _read_entries(path).items():
+        if entry[0] > now and entry[0] > entries.get(key, (0, None))[0]:
+            entries[key] = entry
+    tmp_path = '{0}.{1}.tmp'.format(path, os.getpid())
+    try:
+        with open(tmp_path, 'w') as f:
+            json.dump(entries, f)
+        os.rename(tmp_path, path)
+    except (IOError, OSError) as e:
+        logger.warning('Failed to save TestRail cache to {0}: '
+                       '{1}'.format(path, e))
+    for cache in caches:
+        logger.info('TestRail response cache: {0}'.format(cache.stats()))
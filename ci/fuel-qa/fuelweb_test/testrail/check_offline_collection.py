@@ -0,0 +1,113 @@
+#    Copyright 2016 Mirantis, Inc.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Check that importing the reporters and collecting tests is offline.
+
+Every outgoing connection and DNS lookup is refused and recorded while the
+TestRail reporter module is imported and 'pytest --collect-only' runs over
+the given tests, then the time spent and the attempts are printed. The exit
+code is non-zero when anything tried to use the network or a module failed
+to import.
+
+Run from the fuel-qa root:
+
+    python -m fuelweb_test.testrail.check_offline_collection fuel_tests/tests
+"""
+
+from __future__ import print_function
+from __future__ import unicode_literals
+
+import socket
+import sys
+import time
+from optparse import OptionParser
+
+import pytest
+
+
+class NetworkGuard(object):
+    """Refuse and record network access while active."""
+
+    # patched socket methods, their first argument is the socket itself
+    methods = frozenset(['socket.connect', 'socket.connect_ex'])
+
+    def __init__(self):
+        self.attempts = []
+        self._saved = None
+
+    def _refuse(self, name):
+        def refused(*args, **kwargs):
+            self.attempts.append((name, args[1:] if name in self.methods
+                                  else args))
+            raise socket.error('Network access during import: {0}{1}'.format(
+                name, args))
+        return refused
+
+    def __enter__(self):
+        self._saved = (socket.socket.connect, socket.socket.connect_ex,
+                       socket.getaddrinfo, socket.gethostbyname)
+        socket.socket.connect = self._refuse('socket.connect')
+        socket.socket.connect_ex = self._refuse('socket.connect_ex')
+        socket.getaddrinfo = self._refuse('getaddrinfo')
+        socket.gethostbyname = self._refuse('gethostbyname')
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        (socket.socket.connect, socket.socket.connect_ex,
+         socket.getaddrinfo, socket.gethostbyname) = self._saved
+
+
+def main():
+    parser = OptionParser(
+        usage='%prog [options] [TESTS_PATH]',
+        description='Check that TestRail reporters are imported and tests '
+                    'are collected without network access.')
+    parser.add_option('-m', '--module', dest='modules', action='append',
+                      default=[],
+                      help='additional module to import before collection')
+    options, args = parser.parse_args()
+    tests_path = args[0] if args else 'fuel_tests/tests'
+    modules = ['fuelweb_test.testrail.performance_testrail_report']
+    modules.extend(options.modules)
+
+    import_errors = []
+    with NetworkGuard() as guard:
+        start = time.time()
+        for module in modules:
+            try:
+                __import__(module)
+            except Exception as e:
+                import_errors.append((module, e))
+        import_time = time.time() - start
+
+        start = time.time()
+        collect_rc = pytest.main(['--collect-only', '-q', tests_path])
+        collect_time = time.time() - start
+
+    print('Import of {0}: {1:.3f}s'.format(', '.join(modules), import_time))
+    print('Collection of {0}: {1:.3f}s (pytest exit code {2})'.format(
+        tests_path, collect_time, collect_rc))
+    print('Network access attempts: {0}'.format(len(guard.attempts)))
+    for name, address in guard.attempts:
+        print('    {0} {1}'.format(name, address))
+    # a module which failed to import did not show it is offline
+    print('Import failures: {0}'.format(len(import_errors)))
+    for module, error in import_errors:
+        print('    {0}: {1}'.format(module, error))
+    return 1 if (guard.attempts or import_errors or
+                 collect_rc not in (0, 5)) else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,583 @@
+#    Copyright 2016 Mirantis, Inc.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""In-memory stand-in for the TestRail API v2 for offline benchmarks.
+
+The server implements the subset of 'index.php?/api/v2/' used by
+TestRailProject, the performance reporters and the test_suites upload
+scripts. It can add a fixed latency to every request and answer with
+HTTP 429 when more than ``rate_limit`` requests arrive within
+``rate_period`` seconds, like the hosted TestRail does. Requests are
+counted per endpoint.
+
+    server = FakeTestRailServer(latency=0.05, rate_limit=180)
+    seed_performance_suites(server.data)
+    server.start()
+    project = TestRailProject(server.url, 'user', 'password',
+                              'Mirantis OpenStack')
+    ...
+    server.stop()
+    print(server.request_counts)
+
+It can also be started standalone, then TESTRAIL_URL should point to it:
+
+    python -m fuelweb_test.testrail.fake_server --port 8080 --latency 0.05
+
+fuelweb_test.testrail.benchmark_reporters runs the Shaker and Horizon
+reporters against a seeded server and prints timings and request counts.
+"""
+
+from __future__ import print_function
+from __future__ import unicode_literals
+
+import itertools
+import json
+import socket
+import threading
+import time
+from collections import Counter
+from collections import deque
+from optparse import OptionParser
+
+from six.moves import BaseHTTPServer
+from six.moves import socketserver
+
+
+UNTESTED = 3
+
+DEFAULT_STATUSES = [
+    {'id': 1, 'name': 'passed', 'label': 'Passed'},
+    {'id': 2, 'name': 'blocked', 'label': 'Blocked'},
+    {'id': 3, 'name': 'untested', 'label': 'Untested'},
+    {'id': 4, 'name': 'retest', 'label': 'Retest'},
+    {'id': 5, 'name': 'failed', 'label': 'Failed'},
+]
+
+
+class NotFound(Exception):
+    pass
+
+
+class FakeTestRailData(object):
+    """Projects, suites, cases, runs, plans and results of the fake server.
+    """
+
+    def __init__(self):
+        self.statuses = list(DEFAULT_STATUSES)
+        self.projects = {}
+        self.milestones = {}
+        self.suites = {}
+        self.cases = {}
+        self.runs = {}
+        self.tests = {}
+        self.results = {}
+        self.plans = {}
+        self._ids = itertools.count(1)
+        self._lock = threading.RLock()
+
+    def next_id(self):
+        return next(self._ids)
+
+    def add_project(self, name):
+        with self._lock:
+            project = {'id': self.next_id(), 'name': name,
+                       'is_completed': False}
+            self.projects[project['id']] = project
+            return project
+
+    def project_by_name(self, name):
+        for project in self.projects.values():
+            if project['name'] == name:
+                return project
+        return None
+
+    def add_milestone(self, project_id, name):
+        with self._lock:
+            milestone = {'id': self.next_id(), 'name': name,
+                         'project_id': project_id, 'is_completed': False}
+            self.milestones[milestone['id']] = milestone
+            return milestone
+
+    def add_suite(self, project_id, name, suite_id=None):
+        with self._lock:
+            suite = {'id': suite_id or self.next_id(), 'name': name,
+                     'project_id': project_id}
+            self.suites[suite['id']] = suite
+            return suite
+
+    def add_case(self, suite_id, title, steps=None, case_id=None,
+                 group=None):
+        with self._lock:
+            case = {
+                'id': case_id or self.next_id(),
+                'suite_id': suite_id,
+                'section_id': None,
+                'title': title,
+                'custom_test_group': group,
+                'custom_test_case_steps': steps or [],
+                'updated_on': int(time.time())
+            }
+            self.cases[case['id']] = case
+            return case
+
+    def add_run(self, project_id, data, plan_id=None):
+        with self._lock:
+            run = {
+                'id': self.next_id(),
+                'project_id': project_id,
+                'plan_id': plan_id,
+                'suite_id': int(data.get('suite_id') or 0),
+                'name': data.get('name'),
+                'description': data.get('description'),
+                'milestone_id': data.get('milestone_id'),
+                'config_ids': data.get('config_ids') or [],
+                'created_on': int(time.time()),
+                'is_completed': False
+            }
+            self.runs[run['id']] = run
+            self._add_tests(run, data)
+            return run
+
+    def update_run(self, run_id, data):
+        with self._lock:
+            run = self.get(self.runs, run_id)
+            for key in ('name', 'description', 'milestone_id', 'config_ids'):
+                if key in data:
+                    run[key] = data[key]
+            if 'case_ids' in data or 'include_all' in data:
+                self._add_tests(run, data)
+            return run
+
+    def _add_tests(self, run, data):
+        case_ids = data.get('case_ids')
+        if data.get('include_all', True) or not case_ids:
+            cases = [case for case in self.cases.values()
+                     if case['suite_id'] == run['suite_id']]
+        else:
+            cases = [self.get(self.cases, case_id) for case_id in case_ids]
+        existing = set(test['case_id'] for test in self.tests.values()
+                       if test['run_id'] == run['id'])
+        for case in sorted(cases, key=lambda c: c['id']):
+            if case['id'] in existing:
+                continue
+            test = {
+                'id': self.next_id(),
+                'run_id': run['id'],
+                'case_id': case['id'],
+                'title': case['title'],
+                'status_id': UNTESTED,
+                'custom_test_group': case['custom_test_group'],
+                'custom_test_case_steps': case['custom_test_case_steps']
+            }
+            self.tests[test['id']] = test
+
+    def add_plan(self, project_id, data):
+        with self._lock:
+            plan = {
+                'id': self.next_id(),
+                'project_id': project_id,
+                'name': data.get('name'),
+                'description': data.get('description'),
+                'milestone_id': data.get('milestone_id'),
+                'created_on': int(time.time()),
+                'is_completed': False,
+                'entries': []
+            }
+            self.plans[plan['id']] = plan
+            return plan
+
+    def plan_with_entries(self, plan_id):
+        plan = dict(self.get(self.plans, plan_id))
+        runs = [run for run in self.runs.values()
+                if run['plan_id'] == plan_id]
+        plan['entries'] = [{'id': run['id'], 'suite_id': run['suite_id'],
+                            'name': run['name'], 'runs': [run]}
+                           for run in sorted(runs, key=lambda r: r['id'])]
+        return plan
+
+    def add_result(self, test_id, data):
+        with self._lock:
+            test = self.get(self.tests, test_id)
+            result = dict(data, id=self.next_id(), test_id=test_id,
+                          created_on=int(time.time()))
+            self.results[result['id']] = result
+            if result.get('status_id'):
+                test['status_id'] = result['status_id']
+            return result
+
+    def test_for_case(self, run_id, case_id):
+        for test in self.tests.values():
+            if test['run_id'] == run_id and test['case_id'] == case_id:
+                return test
+        raise NotFound('No test for case {0} in run {1}'.format(case_id,
+                                                                 run_id))
+
+    @staticmethod
+    def get(objects, object_id):
+        try:
+            return objects[int(object_id)]
+        except (KeyError, ValueError):
+            raise NotFound('Object {0} not found'.format(object_id))
+
+
+def seed_performance_suites(data, project_name='Mirantis OpenStack',
+                            milestone='9.1'):
+    """Fill data with the suites used by the performance reporters."""
+    from fuelweb_test.testrail.performance_testrail_report import \
+        HORIZON_CASES
+    from fuelweb_test.testrail.performance_testrail_report import \
+        SHAKER_CONF_TO_TITLE
+    from fuelweb_test.testrail.performance_testrail_report import \
+        HorizonTestResultReporter
+    from fuelweb_test.testrail.performance_testrail_report import \
+        ShakerTestResultReporter
+
+    project = data.add_project(project_name)
+    data.add_milestone(project['id'], milestone)
+    suite = data.add_suite(project['id'], 'Shaker',
+                           suite_id=ShakerTestResultReporter.suite_id)
+    for title in sorted(SHAKER_CONF_TO_TITLE.values()):
+        data.add_case(suite['id'], title, steps=[
+            {'content': 'Check [network bandwidth, Median; Mbps]',
+             'expected': '9000'},
+            {'content': 'Check [deviation; pcs]', 'expected': '500'}])
+    suite = data.add_suite(project['id'], 'Horizon',
+                           suite_id=HorizonTestResultReporter.suite_id)
+    for page, cases in sorted(HORIZON_CASES.items()):
+        for objects, case_id in sorted(cases.items()):
+            if case_id is not None:
+                data.add_case(suite['id'],
+                              '{0} - {1} objects'.format(page, objects),
+                              case_id=case_id, steps=[
+                                  {'content': 'Check [response_time; '
+                                              '90_percentile_s]',
+                                   'expected': '5'}])
+    return project
+
+
+class FakeTestRailHandler(BaseHTTPServer.BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        pass
+
+    def setup(self):
+        BaseHTTPServer.BaseHTTPRequestHandler.setup(self)
+        self.server.connections.add(self.connection)
+
+    def finish(self):
+        self.server.connections.discard(self.connection)
+        BaseHTTPServer.BaseHTTPRequestHandler.finish(self)
+
+    def do_GET(self):
+        self._handle('GET')
+
+    def do_POST(self):
+        self._handle('POST')
+
+    def _handle(self, method):
+        length = int(self.headers.get('Content-Length') or 0)
+        body = self.rfile.read(length) if length else b''
+        if '?/api/v2/' not in self.path:
+            return self._reply(404, {'error': 'Unknown path'})
+        uri = self.path.split('?/api/v2/', 1)[1]
+        parts = uri.split('&')
+        endpoint, _, arg = parts[0].partition('/')
+        params = dict(part.partition('=')[::2] for part in parts[1:])
+        server = self.server
+        server.count(endpoint)
+
+        if server.latency:
+            time.sleep(server.latency)
+        if not server.allow_request():
+            return self._reply(429, {'error': 'API rate limit reached'},
+                               headers={'Retry-After': '1'})
+
+        handler = getattr(self, 'api_{0}'.format(endpoint), None)
+        if handler is None:
+            return self._reply(400, {'error': 'Unknown method {0}'.format(
+                endpoint)})
+        try:
+            data = json.loads(body.decode('utf-8')) if body else {}
+            with server.data._lock:
+                result = handler(arg, params, data)
+        except NotFound as e:
+            return self._reply(400, {'error': str(e)})
+        except (ValueError, KeyError) as e:
+            return self._reply(400, {'error': 'Bad request: {0}'.format(e)})
+        self._reply(200, result)
+
+    def _reply(self, code, result, headers=None):
+        content = json.dumps(result).encode('utf-8')
+        self.send_response(code)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(content)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(content)
+        self.server.count_bytes(len(content))
+
+    @staticmethod
+    def _page(items, params, newest_first=False):
+        items = sorted(items, key=lambda item: item['id'],
+                       reverse=newest_first)
+        offset = int(params.get('offset') or 0)
+        limit = int(params.get('limit') or 250)
+        return items[offset:offset + limit]
+
+    @property
+    def data(self):
+        return self.server.data
+
+    # Read methods
+
+    def api_get_statuses(self, arg, params, body):
+        return self.data.statuses
+
+    def api_get_projects(self, arg, params, body):
+        return sorted(self.data.projects.values(), key=lambda p: p['id'])
+
+    def api_get_project(self, arg, params, body):
+        return self.data.get(self.data.projects, arg)
+
+    def api_get_milestones(self, arg, params, body):
+        return [m for m in self.data.milestones.values()
+                if m['project_id'] == int(arg)]
+
+    def api_get_suites(self, arg, params, body):
+        return [s for s in self.data.suites.values()
+                if s['project_id'] == int(arg)]
+
+    def api_get_suite(self, arg, params, body):
+        return self.data.get(self.data.suites, arg)
+
+    def api_get_cases(self, arg, params, body):
+        suite_id = int(params['suite_id'])
+        updated_after = int(params.get('updated_after') or 0)
+        cases = [c for c in self.data.cases.values()
+                 if c['suite_id'] == suite_id and
+                 c['updated_on'] > updated_after]
+        return self._page(cases, params)
+
+    def api_get_case(self, arg, params, body):
+        return self.data.get(self.data.cases, arg)
+
+    def api_get_runs(self, arg, params, body):
+        runs = [r for r in self.data.runs.values()
+                if r['project_id'] == int(arg) and r['plan_id'] is None]
+        if params.get('suite_id'):
+            runs = [r for r in runs
+                    if r['suite_id'] == int(params['suite_id'])]
+        return self._page(runs, params)
+
+    def api_get_run(self, arg, params, body):
+        return self.data.get(self.data.runs, arg)
+
+    def api_get_tests(self, arg, params, body):
+        run_id = self.data.get(self.data.runs, arg)['id']
+        tests = [t for t in self.data.tests.values()
+                 if t['run_id'] == run_id]
+        if params.get('status_id'):
+            statuses = [int(s) for s in params['status_id'].split(',')]
+            tests = [t for t in tests if t['status_id'] in statuses]
+        return self._page(tests, params)
+
+    def api_get_test(self, arg, params, body):
+        return self.data.get(self.data.tests, arg)
+
+    def api_get_results(self, arg, params, body):
+        test_id = self.data.get(self.data.tests, arg)['id']
+        results = [r for r in self.data.results.values()
+                   if r['test_id'] == test_id]
+        return self._page(results, params, newest_first=True)
+
+    def api_get_results_for_run(self, arg, params, body):
+        run_id = self.data.get(self.data.runs, arg)['id']
+        results = [r for r in self.data.results.values()
+                   if self.data.tests[r['test_id']]['run_id'] == run_id]
+        return self._page(results, params, newest_first=True)
+
+    def api_get_plans(self, arg, params, body):
+        plans = [p for p in self.data.plans.values()
+                 if p['project_id'] == int(arg)]
+        return self._page(plans, params)
+
+    def api_get_plan(self, arg, params, body):
+        return self.data.plan_with_entries(int(arg))
+
+    # Write methods
+
+    def api_add_run(self, arg, params, body):
+        return self.data.add_run(int(arg), body)
+
+    def api_update_run(self, arg, params, body):
+        return self.data.update_run(arg, body)
+
+    def api_add_plan(self, arg, params, body):
+        return self.data.add_plan(int(arg), body)
+
+    def api_add_plan_entry(self, arg, params, body):
+        plan = self.data.get(self.data.plans, arg)
+        run = self.data.add_run(plan['project_id'], body, plan_id=plan['id'])
+        return {'id': run['id'], 'suite_id': run['suite_id'],
+                'name': run['name'], 'runs': [run]}
+
+    def api_add_result(self, arg, params, body):
+        return self.data.add_result(arg, body)
+
+    def api_add_results(self, arg, params, body):
+        run_id = self.data.get(self.data.runs, arg)['id']
+        results = []
+        for result in body['results']:
+            test = self.data.get(self.data.tests, result['test_id'])
+            if test['run_id'] != run_id:
+                raise NotFound('Test {0} is not in run {1}'.format(
+                    test['id'], run_id))
+            results.append(self.data.add_result(test['id'], result))
+        return results
+
+    def api_add_results_for_cases(self, arg, params, body):
+        run_id = self.data.get(self.data.runs, arg)['id']
+        return [self.data.add_result(
+                self.data.test_for_case(run_id, result['case_id'])['id'],
+                result)
+                for result in body['results']]
+
+
+class FakeTestRailServer(socketserver.ThreadingMixIn,
+                         BaseHTTPServer.HTTPServer):
+    """Threaded HTTP server answering TestRail API requests from data.
+
+    :param latency: seconds to wait before answering every request
+    :param rate_limit: requests allowed within rate_period seconds, more
+                       requests are answered with HTTP 429 (no limit if None)
+    """
+
+    daemon_threads = True
+
+    def __init__(self, host='127.0.0.1', port=0, data=None, latency=0,
+                 rate_limit=None, rate_period=1.0):
+        BaseHTTPServer.HTTPServer.__init__(self, (host, port),
+                                           FakeTestRailHandler)
+        self.data = data or FakeTestRailData()
+        self.latency = latency
+        self.rate_limit = rate_limit
+        self.rate_period = rate_period
+        self.request_counts = Counter()
+        self.rate_limited = 0
+        self.bytes_sent = 0
+        self.connections = set()
+        self._recent = deque()
+        self._stats_lock = threading.Lock()
+        self._thread = None
+
+    @property
+    def url(self):
+        return 'http://{0}:{1}/'.format(*self.server_address[:2])
+
+    def count(self, endpoint):
+        with self._stats_lock:
+            self.request_counts[endpoint] += 1
+
+    def count_bytes(self, size):
+        with self._stats_lock:
+            self.bytes_sent += size
+
+    def allow_request(self):
+        if not self.rate_limit:
+            return True
+        now = time.time()
+        with self._stats_lock:
+            while self._recent and self._recent[0] <= now - self.rate_period:
+                self._recent.popleft()
+            if len(self._recent) >= self.rate_limit:
+                self.rate_limited += 1
+                return False
+            self._recent.append(now)
+            return True
+
+    def reset_stats(self):
+        with self._stats_lock:
+            self.request_counts.clear()
+            self.rate_limited = 0
+            self.bytes_sent = 0
+
+    def stats(self):
+        with self._stats_lock:
+            return {
+                'requests': dict(self.request_counts),
+                'total': sum(self.request_counts.values()),
+                'rate_limited': self.rate_limited,
+                'bytes_sent': self.bytes_sent
+            }
+
+    def start(self):
+        self._thread = threading.Thread(target=self.serve_forever)
+        self._thread.daemon = True
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+        # Wake up handlers waiting on kept-alive connections
+        for connection in list(self.connections):
+            try:
+                connection.shutdown(socket.SHUT_RDWR)
+            except socket.error:
+                pass
+        if self._thread is not None:
+            self._thread.join()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.stop()
+
+
+def main():
+    parser = OptionParser(
+        description='Run fake TestRail API server with the suites of the '
+                    'performance reporters.')
+    parser.add_option('--host', default='127.0.0.1')
+    parser.add_option('--port', type='int', default=8080)
+    parser.add_option('--latency', type='float', default=0,
+                      help='seconds to wait before every answer')
+    parser.add_option('--rate-limit', dest='rate_limit', type='int',
+                      default=None,
+                      help='requests per --rate-period seconds, answer '
+                           'with HTTP 429 above it')
+    parser.add_option('--rate-period', dest='rate_period', type='float',
+                      default=1.0)
+    options, _ = parser.parse_args()
+
+    server = FakeTestRailServer(options.host, options.port,
+                                latency=options.latency,
+                                rate_limit=options.rate_limit,
+                                rate_period=options.rate_period)
+    seed_performance_suites(server.data)
+    print('Fake TestRail listens on {0}'.format(server.url))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        print(json.dumps(server.stats(), indent=4, sort_keys=True))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,80 @@
+#    Copyright 2016 Mirantis, Inc.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+from __future__ import unicode_literals
+
+from collections import defaultdict
+
+
+class TestRunIndex(object):
+    """Lookup tables over the tests of one TestRail run.
+
+    The tests are fetched once and indexed by title, group and case id, so
+    matching results to tests does not scan the whole list each time.
+    Reporter-specific keys (e.g. a test configuration tuple) can be indexed
+    with by_key().
+    """
+
+    def __init__(self, tests):
+        self.tests = list(tests)
+        self.by_id = {}
+        self.by_title = {}
+        self.by_case_id = {}
+        self.by_group = defaultdict(list)
+        for test in self.tests:
+            self.by_id[test['id']] = test
+            self.by_title.setdefault(test['title'], test)
+            if test.get('case_id') is not None:
+                self.by_case_id.setdefault(test['case_id'], test)
+            group = test.get('custom_test_group')
+            if group is not None:
+                self.by_group[group].append(test)
+        self._custom = {}
+
+    def __len__(self):
+        return len(self.tests)
+
+    def get_by_title(self, title):
+        return self.by_title.get(title)
+
+    def get_by_group(self, group):
+        tests = self.by_group.get(group)
+        return tests[0] if tests else None
+
+    def get_all_by_group(self, group):
+        return list(self.by_group.get(group, []))
+
+    def get_by_case_id(self, case_id):
+        return self.by_case_id.get(case_id)
+
+    def get_by_title_and_group(self, title, group):
+        for test in self.by_group.get(group, []):
+            if test['title'] == title:
+                return test
+        return None
+
+    def by_key(self, key_func):
+        """Return dict of tests indexed by key_func(test).
+
+        The dict is built on the first call for the key_func and reused
+        afterwards. Tests for which key_func returns None are skipped.
+        """
+        if key_func not in self._custom:
+            index = {}
+            for test in self.tests:
+                key = key_func(test)
+                if key is not None:
+                    index.setdefault(key, test)
+            self._custom[key_func] = index
+        return self._custom[key_func]
@@ -0,0 +1,128 @@
+#    Copyright 2016 Mirantis, Inc.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+from __future__ import unicode_literals
+
+import atexit
+import json
+import threading
+from collections import defaultdict
+
+from fuelweb_test.settings import TestRailSettings
+from fuelweb_test.testrail.cache import endpoint_of
+from fuelweb_test.testrail.settings import logger
+
+
+def percentile(sorted_values, percent):
+    """Return nearest-rank percentile of already sorted values."""
+    if not sorted_values:
+        return None
+    rank = int(round(percent / 100.0 * (len(sorted_values) - 1)))
+    return sorted_values[rank]
+
+
+class EndpointStats(object):
+    def __init__(self):
+        self.calls = 0
+        self.errors = 0
+        self.rate_limited = 0
+        self.bytes_sent = 0
+        self.decoded_bytes_received = 0
+        self.latencies = []
+
+    def as_dict(self):
+        latencies = sorted(self.latencies)
+        return {
+            'calls': self.calls,
+            'errors': self.errors,
+            'rate_limited': self.rate_limited,
+            'bytes_sent': self.bytes_sent,
+            'decoded_bytes_received': self.decoded_bytes_received,
+            'latency': {
+                'total': round(sum(latencies), 3),
+                'max': latencies[-1] if latencies else None,
+                'p50': percentile(latencies, 50),
+                'p90': percentile(latencies, 90),
+                'p99': percentile(latencies, 99)
+            }
+        }
+
+
+class RequestStats(object):
+    """Per-endpoint counters of TestRail API requests.
+
+    Every HTTP request is recorded, including retries of rate limited ones.
+    Received bytes are the size of decoded (gunzipped) response bodies, so
+    they do not depend on whether TestRail compressed the response.
+    Responses served from the response cache are not requests and are not
+    counted here (see ResponseCache.stats()).
+    """
+
+    def __init__(self):
+        self._endpoints = defaultdict(EndpointStats)
+        self._lock = threading.Lock()
+
+    def record(self, uri, seconds, bytes_sent=0, decoded_bytes_received=0,
+               status_code=None):
+        with self._lock:
+            stats = self._endpoints[endpoint_of(uri)]
+            stats.calls += 1
+            stats.bytes_sent += bytes_sent
+            stats.decoded_bytes_received += decoded_bytes_received
+            stats.latencies.append(seconds)
+            if status_code == 429:
+                stats.rate_limited += 1
+            elif status_code is None or status_code >= 400:
+                stats.errors += 1
+
+    def reset(self):
+        with self._lock:
+            self._endpoints.clear()
+
+    def as_dict(self):
+        with self._lock:
+            endpoints = dict((endpoint, stats.as_dict())
+                             for endpoint, stats in self._endpoints.items())
+        return {
+            'endpoints': endpoints,
+            'calls': sum(e['calls'] for e in endpoints.values()),
+            'seconds': round(sum(e['latency']['total']
+                                 for e in endpoints.values()), 3),
+            'bytes_sent': sum(e['bytes_sent'] for e in endpoints.values()),
+            'decoded_bytes_received': sum(e['decoded_bytes_received']
+                                          for e in endpoints.values())
+        }
+
+    def dump(self, path):
+        stats = self.as_dict()
+        try:
+            with open(path, 'w') as f:
+                json.dump(stats, f, indent=4, sort_keys=True)
+        except (IOError, OSError) as e:
+            logger.warning('Failed to save TestRail request stats to {0}: '
+                           '{1}'.format(path, e))
+            return
+        logger.info('TestRail API: {0} requests, {1}s, saved to {2}'.format(
+            stats['calls'], stats['seconds'], path))
+
+
+request_stats = RequestStats()
+
+
+def _dump_at_exit():
+    if TestRailSettings.stats_file and request_stats.as_dict()['calls']:
+        request_stats.dump(TestRailSettings.stats_file)
+
+
+atexit.register(_dump_at_exit)
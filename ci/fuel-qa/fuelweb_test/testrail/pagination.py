@@ -0,0 +1,92 @@
+#    Copyright 2016 Mirantis, Inc.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+from __future__ import unicode_literals
+
+import sys
+import threading
+
+import six
+
+
+class PageFetcher(threading.Thread):
+    """Fetch one page of a TestRail list in a background thread."""
+
+    def __init__(self, client, uri):
+        super(PageFetcher, self).__init__()
+        self.daemon = True
+        self.client = client
+        self.uri = uri
+        self._page = None
+        self._exc_info = None
+
+    def run(self):
+        try:
+            self._page = self.client.send_get(self.uri)
+        except Exception:
+            self._exc_info = sys.exc_info()
+
+    def result(self):
+        if self.ident is not None:
+            self.join()
+        if self._exc_info is not None:
+            six.reraise(*self._exc_info)
+        return self._page
+
+
+def page_items(page, key, limit):
+    """Return items of the page and whether the next page should be fetched.
+
+    Old TestRail versions return a plain list, newer ones return a dict
+    with the list under ``key`` and a link to the next page in '_links'.
+    """
+    if isinstance(page, dict):
+        items = page.get(key, [])
+        return items, page.get('_links', {}).get('next') is not None
+    return page, len(page) == limit
+
+
+def iter_paginated(client, uri, key, limit, prefetch=True):
+    """Lazily yield items of a paginated TestRail GET endpoint.
+
+    Pages of ``limit`` items are requested with limit/offset parameters.
+    While the items of the current page are consumed, the next page is
+    already being fetched in a background thread. Stopping the iteration
+    early does not request the remaining pages.
+    """
+    def start(offset):
+        fetcher = PageFetcher(
+            client, '{0}&limit={1}&offset={2}'.format(uri, limit, offset))
+        if prefetch:
+            fetcher.start()
+        else:
+            fetcher.run()
+        return fetcher
+
+    offset = 0
+    first_id = None
+    pending = start(offset)
+    while pending is not None:
+        items, has_next = page_items(pending.result(), key, limit)
+        pending = None
+        if items and items[0].get('id') == first_id:
+            # The endpoint ignores offset, everything was returned already
+            break
+        if items:
+            first_id = items[0].get('id')
+        if has_next and items:
+            offset += len(items)
+            pending = start(offset)
+        for item in items:
+            yield item
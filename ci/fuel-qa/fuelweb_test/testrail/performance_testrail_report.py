@@ -2,7 +2,55 @@ import os
 import numpy
 
 from fuelweb_test import logger
-from fuelweb_test.testrail.testrail_client import TestRailProject
+from fuelweb_test.settings import TestRailSettings
+from fuelweb_test.testrail.baseline import SuiteBaseline
+from fuelweb_test.testrail.testrail_client import LazyTestRailProject
+
+
+# KEY = (segmentation vlan/tun, dvr on/off, l3ha on/off, tcp offloading on/off, target nodes/instances)
+SHAKER_CONF_TO_TITLE = {
+    # GROUP: TCP offloading: OFF; DVR:ON
+    ("tun", True, False, False, "instances"): "Neutron VxLAN Instance-to-Instance; bonding: on; Ubuntu",
+    ("vlan", True, False, False, "instances"): "Neutron VLAN Instance-to-Instance; bonding: on; Ubuntu",
+    # GROUP: TCP offloading: ON; DVR:ON
+    ("tun", True, False, True, "instances"): "Neutron VxLAN Instance-to-Instance; DVR on, bonding: on; Ubuntu",
+    ("vlan", True, False, True, "instances"): "Neutron VLAN Instance-to-Instance; DVR on, bonding: on; Ubuntu",
+    # GROUP: TCP offloading: ON: Neutron L3 HA: ON
+    ("tun", False, True, True, "nodes"): "Neutron VxLAN Node-to-Node; L3 HA on, bonding: on; Ubuntu",
+    ("tun", False, True, True, "instances"): "Neutron VxLAN Instance-to-Instance; L3 HA on, bonding: on; Ubuntu",
+    ("vlan", False, True, True, "nodes"): "Neutron VLAN Node-to-Node; L3 HA on, bonding: on; Ubuntu",
+    ("vlan", False, True, True, "instances"): "Neutron VLAN Instance-to-Instance; L3 HA on, bonding: on; Ubuntu",
+}
+# Title of a test in a run -> configuration whose results it gets. This is
+# how results have always been matched to tests and it is not the inverse
+# of SHAKER_CONF_TO_TITLE for the VLAN Node-to-Node and the VxLAN
+# Instance-to-Instance L3 HA tests
+SHAKER_TITLE_TO_CONF = {
+    "Neutron VxLAN Instance-to-Instance; bonding: on; Ubuntu": ("tun", True, False, False, "instances"),
+    "Neutron VLAN Instance-to-Instance; bonding: on; Ubuntu": ("vlan", True, False, False, "instances"),
+    "Neutron VxLAN Instance-to-Instance; DVR on, bonding: on; Ubuntu": ("tun", True, False, True, "instances"),
+    "Neutron VLAN Instance-to-Instance; DVR on, bonding: on; Ubuntu": ("vlan", True, False, True, "instances"),
+    "Neutron VxLAN Node-to-Node; L3 HA on, bonding: on; Ubuntu": ("tun", False, True, True, "nodes"),
+    "Neutron VLAN Node-to-Node; L3 HA on, bonding: on; Ubuntu": ("tun", False, True, True, "instances"),
+    "Neutron VxLAN Instance-to-Instance; L3 HA on, bonding: on; Ubuntu": ("vlan", False, True, True, "nodes"),
+    "Neutron VLAN Instance-to-Instance; L3 HA on, bonding: on; Ubuntu": ("vlan", False, True, True, "instances"),
+}
+
+# Horizon page -> {objects per page: id of the case with the baseline}
+HORIZON_CASES = {
+    "project/images": {100: 1673818, 500: 1673819},
+    "admin/volumes": {100: 1673820, 500: 1673821},
+    "identity/users": {100: 1673824, 500: 1673825},
+    "identity": {100: 1673826, 500: 1673827},
+    "admin/instances": {100: 1673828, 500: 1673829},
+    "admin/networks": {100: 1673830, 500: 1673831},
+    "admin/images": {100: None, 500: None},
+    "project/instances": {100: 1681254, 500: 1681255},
+    "project/flavors": {100: None, 500: None},
+    "admin/volume_snapshots": {100: None, 500: None},
+    "admin/routers": {100: None, 500: None},
+    "project/volumes": {100: None, 500: None},
+}
 
 
 class TestResult(object):
@@ -50,6 +98,8 @@ class ShakerTestResult(TestResult):
         median = -1
         stdev = -1
 
+        # expected values are baselines of the stats Shaker computes per
+        # record, so they are checked against those
         items = [each for each in self.json_data['records']]
         for i in range(len(items)):
             try:
@@ -58,19 +108,28 @@ class ShakerTestResult(TestResult):
             except KeyError:
                 continue
 
+        # distribution of samples of all agents is reported for reference
+        # imported here, helpers.shaker needs devops and yaml
+        from fuelweb_test.helpers.shaker import ShakerStats
+        stats = ShakerStats(self.json_data)
+        if stats.stats("bandwidth")["count"]:
+            self.comments = stats.report()
+            logger.info("Shaker statistics of {}:\n{}".format(self.conf, self.comments))
+
         if median == -1 or stdev == -1:
             logger.error("Failed shaker scenario! There are no steps to send to testrail.")
             self.status = "failed"
             return None
 
         median_status_id = self.test_status_to_id["passed"]
-        median_expected = float(ShakerTestResultReporter.expected_values[self.conf][0])
+        median_expected, stdev_expected = ShakerTestResultReporter.get_expected_values(self.conf)
+        median_expected = float(median_expected)
         if median < float(median_expected) * 0.9:
             median_status_id = self.test_status_to_id["failed"]
             self.status = "failed"
 
         stdev_status_id = self.test_status_to_id["passed"]
-        stdev_expected = float(ShakerTestResultReporter.expected_values[self.conf][1])
+        stdev_expected = float(stdev_expected)
         if stdev > float(stdev_expected) * 0.5:
             stdev_status_id = self.test_status_to_id["failed"]
 
@@ -117,7 +176,11 @@ class RallyTestResult(TestResult):
 
 
 class HorizonTestResult(RallyTestResult):
-    def __init__(self, json_data, test_status_to_id):
+    open_page_action = "horizon_performance.open_page"
+
+    def __init__(self, json_data, test_status_to_id, open_page_times=None):
+        # open_page_times: numpy array of durations from RallyTimeSeries
+        self.open_page_times = open_page_times
         super(HorizonTestResult, self).__init__(json_data, test_status_to_id)
 
     @property
@@ -135,11 +198,13 @@ class HorizonTestResult(RallyTestResult):
         if len(self.json_data["result"]) == 0:
             return None
 
-        expected = float(HorizonTestResultReporter.expected_values[self.page][self.number_of_objects])
+        expected = float(HorizonTestResultReporter.get_expected_value(self.page, self.number_of_objects))
 
-        times = []
-        for result in self.json_data["result"]:
-            times.append(result["atomic_actions"]["horizon_performance.open_page"])
+        times = self.open_page_times
+        if times is None:
+            times = [result["atomic_actions"][self.open_page_action] for result in self.json_data["result"]]
+        if len(times) == 0:
+            return None
         actual = numpy.percentile(times, 90)
 
         status_id = self.test_status_to_id["passed"]
@@ -155,8 +220,8 @@ class HorizonTestResult(RallyTestResult):
 
 
 class TestResultReporter(object):
-    project = TestRailProject("https://mirantis.testrail.com", "pshvetsov@mirantis.com", "UFSvw69f",
-                              "Mirantis OpenStack")
+    project = LazyTestRailProject(TestRailSettings.url or "https://mirantis.testrail.com", "pshvetsov@mirantis.com", "UFSvw69f",
+                                  "Mirantis OpenStack")
 
     def __init__(self):
         self.test_results = []
@@ -170,89 +235,25 @@ class TestResultReporter(object):
 
 
 class ShakerTestResultReporter(TestResultReporter):
-    cases = TestResultReporter.project.get_cases(4259)
-
-    # KEY = (segmentation vlan/tun, dvr on/off, l3ha on/off, tcp offloading on/off, target nodes/instances)
-    expected_values = {}
-
-    # GROUP: TCP offloading: OFF; DVR:ON
-    steps = [item for item in cases if item["title"] == "Neutron VxLAN Instance-to-Instance; bonding: on; Ubuntu"][0][
-        "custom_test_case_steps"]
-    band = [item for item in steps if "bandwidth" in item["content"]][0]["expected"]
-    dev = [item for item in steps if "deviation" in item["content"]][0]["expected"]
-    expected_values[("tun", True, False, False, "instances")] = [band, dev]
-
-    steps = [item for item in cases if item["title"] == "Neutron VLAN Instance-to-Instance; bonding: on; Ubuntu"][0][
-        "custom_test_case_steps"]
-    band = [item for item in steps if "bandwidth" in item["content"]][0]["expected"]
-    dev = [item for item in steps if "deviation" in item["content"]][0]["expected"]
-    expected_values[("vlan", True, False, False, "instances")] = [band, dev]
-
-    # GROUP: TCP offloading: ON; DVR:ON
-    steps = \
-    [item for item in cases if item["title"] == "Neutron VxLAN Instance-to-Instance; DVR on, bonding: on; Ubuntu"][0][
-        "custom_test_case_steps"]
-    band = [item for item in steps if "bandwidth" in item["content"]][0]["expected"]
-    dev = [item for item in steps if "deviation" in item["content"]][0]["expected"]
-    expected_values[("tun", True, False, True, "instances")] = [band, dev]
-
-    steps = \
-    [item for item in cases if item["title"] == "Neutron VLAN Instance-to-Instance; DVR on, bonding: on; Ubuntu"][0][
-        "custom_test_case_steps"]
-    band = [item for item in steps if "bandwidth" in item["content"]][0]["expected"]
-    dev = [item for item in steps if "deviation" in item["content"]][0]["expected"]
-    expected_values[("vlan", True, False, True, "instances")] = [band, dev]
-
-    # GROUP: TCP offloading: ON: Neutron L3 HA: ON
-    steps = [item for item in cases if item["title"] == "Neutron VxLAN Node-to-Node; L3 HA on, bonding: on; Ubuntu"][0][
-        "custom_test_case_steps"]
-    band = [item for item in steps if "bandwidth" in item["content"]][0]["expected"]
-    dev = [item for item in steps if "deviation" in item["content"]][0]["expected"]
-    expected_values[("tun", False, True, True, "nodes")] = [band, dev]
-
-    steps = \
-    [item for item in cases if item["title"] == "Neutron VxLAN Instance-to-Instance; L3 HA on, bonding: on; Ubuntu"][0][
-        "custom_test_case_steps"]
-    band = [item for item in steps if "bandwidth" in item["content"]][0]["expected"]
-    dev = [item for item in steps if "deviation" in item["content"]][0]["expected"]
-    expected_values[("tun", False, True, True, "instances")] = [band, dev]
-
-    steps = [item for item in cases if item["title"] == "Neutron VLAN Node-to-Node; L3 HA on, bonding: on; Ubuntu"][0][
-        "custom_test_case_steps"]
-    band = [item for item in steps if "bandwidth" in item["content"]][0]["expected"]
-    dev = [item for item in steps if "deviation" in item["content"]][0]["expected"]
-    expected_values[("vlan", False, True, True, "nodes")] = [band, dev]
-
-    steps = \
-    [item for item in cases if item["title"] == "Neutron VLAN Instance-to-Instance; L3 HA on, bonding: on; Ubuntu"][0][
-        "custom_test_case_steps"]
-    band = [item for item in steps if "bandwidth" in item["content"]][0]["expected"]
-    dev = [item for item in steps if "deviation" in item["content"]][0]["expected"]
-    expected_values[("vlan", False, True, True, "instances")] = [band, dev]
+    suite_id = 4259
+    baseline = None
 
     def __init__(self, data):
         super(ShakerTestResultReporter, self).__init__()
         for conf, json_data in data.items():
             self.test_results.append(ShakerTestResult(conf, json_data, self.test_status_to_id))
 
+    @classmethod
+    def get_expected_values(cls, conf):
+        if cls.baseline is None:
+            cls.baseline = SuiteBaseline(TestResultReporter.project, cls.suite_id,
+                                         path=TestRailSettings.baselines_cache)
+        title = SHAKER_CONF_TO_TITLE[conf]
+        return [cls.baseline.expected(title=title, content="bandwidth"),
+                cls.baseline.expected(title=title, content="deviation")]
+
     def test_to_conf(self, test):
-        if test["title"] == "Neutron VxLAN Instance-to-Instance; bonding: on; Ubuntu":
-            return ("tun", True, False, False, "instances")
-        if test["title"] == "Neutron VLAN Instance-to-Instance; bonding: on; Ubuntu":
-            return ("vlan", True, False, False, "instances")
-        if test["title"] == "Neutron VxLAN Instance-to-Instance; DVR on, bonding: on; Ubuntu":
-            return ("tun", True, False, True, "instances")
-        if test["title"] == "Neutron VLAN Instance-to-Instance; DVR on, bonding: on; Ubuntu":
-            return ("vlan", True, False, True, "instances")
-        if test["title"] == "Neutron VxLAN Node-to-Node; L3 HA on, bonding: on; Ubuntu":
-            return ("tun", False, True, True, "nodes")
-        if test["title"] == "Neutron VLAN Node-to-Node; L3 HA on, bonding: on; Ubuntu":
-            return ("tun", False, True, True, "instances")
-        if test["title"] == "Neutron VxLAN Instance-to-Instance; L3 HA on, bonding: on; Ubuntu":
-            return ("vlan", False, True, True, "nodes")
-        if test["title"] == "Neutron VLAN Instance-to-Instance; L3 HA on, bonding: on; Ubuntu":
-            return ("vlan", False, True, True, "instances")
-        return None
+        return SHAKER_TITLE_TO_CONF.get(test["title"])
 
     def send_report(self):
         milestone = os.environ.get("MILESTONE", "9.1")
@@ -268,13 +269,16 @@ class ShakerTestResultReporter(TestResultReporter):
                                                          config_ids=None)
         run = TestResultReporter.project.add_run(run)
 
-        tests = TestResultReporter.project.get_tests(run["id"])
+        run_index = TestResultReporter.project.get_run_index(run["id"])
+        tests_by_conf = run_index.by_key(self.test_to_conf)
 
         for test_result in self.test_results:
-            for test in tests:
-                if self.test_to_conf(test) == test_result.conf:
-                    test_id = test["id"]
-            TestResultReporter.project.add_results_for_test(test_id, test_result)
+            test = tests_by_conf.get(test_result.conf)
+            if test is None:
+                logger.error("No test found in run {} for configuration {}".format(run["id"], test_result.conf))
+                continue
+            TestResultReporter.project.queue_results_for_test(run["id"], test["id"], test_result)
+        TestResultReporter.project.flush_results()
 
 class RallyResultReporter(TestResultReporter):
     def __init__(self):
@@ -282,62 +286,37 @@ class RallyResultReporter(TestResultReporter):
 
 
 class HorizonTestResultReporter(RallyResultReporter):
-    cases = TestResultReporter.project.get_cases(4308)
-    expected_values = {
-        "project/images": {
-            100: (item for item in cases if item["id"] == 1673818).next()["custom_test_case_steps"][0]["expected"],
-            500: (item for item in cases if item["id"] == 1673819).next()["custom_test_case_steps"][0]["expected"]
-        },
-        "admin/volumes": {
-            100: (item for item in cases if item["id"] == 1673820).next()["custom_test_case_steps"][0]["expected"],
-            500: (item for item in cases if item["id"] == 1673821).next()["custom_test_case_steps"][0]["expected"]
-        },
-        "identity/users": {
-            100: (item for item in cases if item["id"] == 1673824).next()["custom_test_case_steps"][0]["expected"],
-            500: (item for item in cases if item["id"] == 1673825).next()["custom_test_case_steps"][0]["expected"]
-        },
-        "identity": {
-            100: (item for item in cases if item["id"] == 1673826).next()["custom_test_case_steps"][0]["expected"],
-            500: (item for item in cases if item["id"] == 1673827).next()["custom_test_case_steps"][0]["expected"]
-        },
-        "admin/instances": {
-            100: (item for item in cases if item["id"] == 1673828).next()["custom_test_case_steps"][0]["expected"],
-            500: (item for item in cases if item["id"] == 1673829).next()["custom_test_case_steps"][0]["expected"]
-        },
-        "admin/networks": {
-            100: (item for item in cases if item["id"] == 1673830).next()["custom_test_case_steps"][0]["expected"],
-            500: (item for item in cases if item["id"] == 1673831).next()["custom_test_case_steps"][0]["expected"]
-        },
-        "admin/images": {
-            100: None,
-            500: None
-        },
-        "project/instances": {
-            100: (item for item in cases if item["id"] == 1681254).next()["custom_test_case_steps"][0]["expected"],
-            500: (item for item in cases if item["id"] == 1681255).next()["custom_test_case_steps"][0]["expected"]
-        },
-        "project/flavors": {
-            100: None,
-            500: None
-        },
-        "admin/volume_snapshots": {
-            100: None,
-            500: None
-        },
-        "admin/routers": {
-            100: None,
-            500: None
-        },
-        "project/volumes": {
-            100: None,
-            500: None
-        }
-    }
+    suite_id = 4308
+    baseline = None
+
+    @classmethod
+    def get_expected_value(cls, page, number_of_objects):
+        case_id = HORIZON_CASES[page][number_of_objects]
+        if case_id is None:
+            return None
+        if cls.baseline is None:
+            cls.baseline = SuiteBaseline(TestResultReporter.project, cls.suite_id,
+                                         path=TestRailSettings.baselines_cache)
+        return cls.baseline.expected(case_id=case_id)
 
     def __init__(self, data):
         super(HorizonTestResultReporter, self).__init__()
-        for json_result in data:
-            self.test_results.append(HorizonTestResult(json_result, self.test_status_to_id))
+        milestone = os.environ.get("MILESTONE", "9.1")
+        snapshot = os.environ.get("SNAPSHOT", "000")
+        from fuelweb_test.helpers.timeseries import RallyTimeSeries
+        self.timeseries = RallyTimeSeries.from_results(data, name="{} snapshot #{}".format(milestone, snapshot),
+                                                       meta={"milestone": milestone, "snapshot": snapshot})
+        for index, json_result in enumerate(data):
+            times = self.timeseries.durations(workload=index, action=HorizonTestResult.open_page_action)
+            self.test_results.append(HorizonTestResult(json_result, self.test_status_to_id, times))
+
+    def save_timeseries(self):
+        """Save durations of the run to compare it with other runs, return path."""
+        from fuelweb_test.helpers.timeseries import timeseries_path
+        path = timeseries_path("horizon-{}-{}".format(self.timeseries.meta["milestone"],
+                                                      self.timeseries.meta["snapshot"]))
+        self.timeseries.save(path)
+        return path
 
 
 # data = None
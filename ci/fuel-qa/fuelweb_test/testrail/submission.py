@@ -0,0 +1,274 @@
+#    Copyright 2016 Mirantis, Inc.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+from __future__ import unicode_literals
+
+import atexit
+import errno
+import json
+import os
+import re
+import threading
+import weakref
+from collections import OrderedDict
+
+from fuelweb_test.settings import TestRailSettings
+from fuelweb_test.testrail.settings import logger
+from fuelweb_test.testrail.testrail import APIClient
+from fuelweb_test.testrail.testrail import APIError
+
+# results_<pid>_<suffix>.json, see TestRailProject
+JOURNAL_NAME = re.compile(r'^results_(\d+)_\w+\.json$')
+
+# queues with results to send before the interpreter exits
+_queues = weakref.WeakSet()
+_queues_lock = threading.Lock()
+
+
+class ResultQueue(object):
+    """Buffer of test results which are sent to TestRail in bulk.
+
+    Results are grouped per run and sent with one add_results (by test id)
+    or add_results_for_cases (by case id) call per run. The queue is flushed
+    when ``max_size`` results are buffered, ``max_delay`` seconds after the
+    first result was queued, or explicitly with flush().
+
+    Batches which failed with a network error, a rate limit or a server
+    error are appended to the ``journal_path`` file, which must not be
+    shared with other queues, and can be sent again with replay().
+    Batches TestRail rejected (other 4xx errors) would fail again, they
+    are logged and dropped. Without a journal failed batches are logged
+    with their data, so they can still be recovered from the log.
+
+    Results still buffered when the interpreter exits are flushed, they
+    are not left to the daemon timer.
+
+    ``on_sent(uri)`` is called after every batch TestRail accepted, e.g. to
+    drop cached data of the run.
+    """
+
+    def __init__(self, client, max_size=100, max_delay=30, journal_path=None,
+                 on_sent=None):
+        self.client = client
+        self.on_sent = on_sent
+        self.max_size = max_size
+        self.max_delay = max_delay
+        self.journal_path = journal_path
+        self._pending = OrderedDict()
+        self._size = 0
+        self._timer = None
+        self._lock = threading.RLock()
+        with _queues_lock:
+            _queues.add(self)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.flush()
+
+    def __len__(self):
+        return self._size
+
+    def add_for_test(self, run_id, test_id, result):
+        result = dict(result, test_id=test_id)
+        self._add('add_results/{0}'.format(run_id), result)
+
+    def add_for_case(self, run_id, case_id, result):
+        result = dict(result, case_id=case_id)
+        self._add('add_results_for_cases/{0}'.format(run_id), result)
+
+    def _add(self, uri, result):
+        with self._lock:
+            self._pending.setdefault(uri, []).append(result)
+            self._size += 1
+            if self._size >= self.max_size:
+                self.flush()
+            elif self._timer is None and self.max_delay:
+                self._timer = threading.Timer(self.max_delay,
+                                              self._timed_flush)
+                self._timer.daemon = True
+                self._timer.start()
+
+    def _timed_flush(self):
+        try:
+            self.flush()
+        except Exception:
+            logger.exception('Failed to flush TestRail results')
+
+    def flush(self):
+        """Send all buffered results, return list of TestRail responses."""
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            batches = [{'uri': uri, 'data': {'results': results}}
+                       for uri, results in self._pending.items()]
+            self._pending.clear()
+            self._size = 0
+            if not batches:
+                return []
+            failed, responses = self._send(batches, append=True)
+            if failed:
+                self._write_journal(self._read_journal() + failed)
+            return responses
+
+    def replay(self, journal_path=None):
+        """Send batches kept in the journal by failed flushes.
+
+        journal_path defaults to the journal of this queue, a journal
+        left by another process may be given. Batches which fail again
+        are kept in it.
+        """
+        journal_path = journal_path or self.journal_path
+        with self._lock:
+            failed, responses = self._send(self._read_journal(journal_path),
+                                           journal_path=journal_path)
+            self._write_journal(failed, journal_path)
+            return responses
+
+    def replay_all(self, directory):
+        """Send batches of all journals in directory left by dead processes.
+
+        Journals of running processes, including this one, are skipped:
+        their queues may still write to them. A journal is renamed while it
+        is replayed, so concurrent callers do not send it twice. Return
+        list of TestRail responses.
+        """
+        responses = []
+        if not os.path.isdir(directory):
+            return responses
+        for name in sorted(os.listdir(directory)):
+            match = JOURNAL_NAME.match(name)
+            if match is None or _pid_alive(int(match.group(1))):
+                continue
+            path = os.path.join(directory, name)
+            claimed = '{0}.replay'.format(path)
+            try:
+                os.rename(path, claimed)
+            except OSError:
+                # replayed by somebody else
+                continue
+            logger.info('Replaying TestRail results journal {0}'.format(path))
+            try:
+                responses.extend(self.replay(claimed))
+            finally:
+                if os.path.isfile(claimed):
+                    os.rename(claimed, path)
+        return responses
+
+    def _send(self, batches, journal_path=None, append=False):
+        """Return (batches to keep for replay, responses).
+
+        If sending is interrupted by an unexpected error, the failed and
+        the unsent batches are written (or with ``append`` appended) to
+        the journal before it is raised.
+        """
+        responses = []
+        failed = []
+        for index, batch in enumerate(batches):
+            try:
+                response = self.client.send_post(batch['uri'], batch['data'])
+            except APIError as e:
+                status = e.status_code
+                if status is not None and 400 <= status < 500 and \
+                        status != 429:
+                    logger.error('TestRail rejected {0} results sent to {1}, '
+                                 'dropping them: {2}'.format(
+                                     len(batch['data']['results']),
+                                     batch['uri'], e))
+                    continue
+                logger.error('Failed to send {0} results to {1}: {2}'.format(
+                    len(batch['data']['results']), batch['uri'], e))
+                failed.append(batch)
+            except Exception:
+                kept = self._read_journal(journal_path) if append else []
+                self._write_journal(kept + failed + batches[index:],
+                                    journal_path)
+                raise
+            else:
+                responses.append(response)
+                if self.on_sent is not None:
+                    self.on_sent(batch['uri'])
+        if failed and (journal_path or self.journal_path):
+            logger.error('{0} result batches are kept in {1} and can be sent '
+                         'again with replay()'.format(
+                             len(failed), journal_path or self.journal_path))
+        elif failed:
+            logger.error('No results journal, {0} result batches are lost: '
+                         '{1}'.format(len(failed), json.dumps(failed)))
+        return failed, responses
+
+    def _read_journal(self, journal_path=None):
+        journal_path = journal_path or self.journal_path
+        if not journal_path or not os.path.isfile(journal_path):
+            return []
+        with open(journal_path) as f:
+            return json.load(f)
+
+    def _write_journal(self, batches, journal_path=None):
+        journal_path = journal_path or self.journal_path
+        if not journal_path:
+            return
+        if not batches:
+            if os.path.isfile(journal_path):
+                os.remove(journal_path)
+            return
+        directory = os.path.dirname(journal_path)
+        if directory and not os.path.isdir(directory):
+            os.makedirs(directory)
+        tmp_path = '{0}.tmp'.format(journal_path)
+        with open(tmp_path, 'w') as f:
+            json.dump(batches, f)
+        os.rename(tmp_path, journal_path)
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except OSError as e:
+        return e.errno == errno.EPERM
+    return True
+
+
+def _flush_at_exit():
+    with _queues_lock:
+        queues = list(_queues)
+    for queue in queues:
+        if len(queue):
+            try:
+                queue.flush()
+            except Exception:
+                logger.exception('Failed to flush TestRail results at exit')
+
+
+atexit.register(_flush_at_exit)
+
+
+def main():
+    """Send results journals left in results_journal_dir by crashed jobs.
+
+        python -m fuelweb_test.testrail.submission
+    """
+    client = APIClient(base_url=TestRailSettings.url)
+    client.user = TestRailSettings.user
+    client.password = TestRailSettings.password
+    responses = ResultQueue(client).replay_all(
+        TestRailSettings.results_journal_dir)
+    logger.info('Sent {0} result batches from {1}'.format(
+        len(responses), TestRailSettings.results_journal_dir))
+
+
+if __name__ == '__main__':
+    main()
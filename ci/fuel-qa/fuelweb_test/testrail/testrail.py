@@ -0,0 +1,193 @@
+#    Copyright 2015 Mirantis, Inc.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+#
+# TestRail API binding for Python (API v2, available since TestRail 3.0)
+#
+# Learn more:
+#
+# http://docs.gurock.com/testrail-api2/start
+# http://docs.gurock.com/testrail-api2/accessing
+
+from __future__ import unicode_literals
+
+import base64
+import json
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from fuelweb_test.settings import TestRailSettings
+from fuelweb_test.testrail.metrics import request_stats
+from fuelweb_test.testrail.settings import logger
+
+
+_session = None
+_session_lock = threading.Lock()
+
+
+def get_session():
+    """Return the HTTP session shared by all TestRail API clients.
+
+    The session keeps connections alive between requests, so consecutive
+    API calls reuse the already established TCP/TLS connection instead of
+    doing a new handshake each time. Gzip-encoded responses are decoded
+    transparently.
+    """
+    global _session
+    with _session_lock:
+        if _session is None:
+            pool_size = TestRailSettings.connection_pool_size
+            adapter = HTTPAdapter(pool_connections=pool_size,
+                                  pool_maxsize=pool_size)
+            session = requests.Session()
+            session.mount('http://', adapter)
+            session.mount('https://', adapter)
+            session.headers.update({
+                'Content-Type': 'application/json',
+                'Accept-Encoding': 'gzip, deflate',
+                'Connection': 'keep-alive'
+            })
+            _session = session
+        return _session
+
+
+class APIClient(object):
+    """Client for the TestRail API v2 working over the shared session."""
+
+    def __init__(self, base_url):
+        self._user = ''
+        self._password = ''
+        self._auth_header = None
+        if not base_url.endswith('/'):
+            base_url += '/'
+        self.base_url = base_url
+        self.__url = base_url + 'index.php?/api/v2/'
+        self.session = get_session()
+        self.cache = None
+        self.stats = request_stats
+
+    @property
+    def user(self):
+        return self._user
+
+    @user.setter
+    def user(self, value):
+        self._user = value
+        self._auth_header = None
+
+    @property
+    def password(self):
+        return self._password
+
+    @password.setter
+    def password(self, value):
+        self._password = value
+        self._auth_header = None
+
+    @property
+    def auth_header(self):
+        if self._auth_header is None:
+            credentials = '{0}:{1}'.format(self.user, self.password)
+            self._auth_header = 'Basic {0}'.format(
+                base64.b64encode(credentials.encode('utf-8')).decode('ascii'))
+        return self._auth_header
+
+    def send_get(self, uri):
+        """Issue a GET request (read) against the API.
+
+        :param uri: the API method to call including parameters
+                    (e.g. get_case/1)
+        :return: the decoded JSON response
+        """
+        if self.cache is not None:
+            return self.cache.get_or_fetch(
+                uri, lambda: self.__send_request('GET', uri, None))
+        return self.__send_request('GET', uri, None)
+
+    def send_post(self, uri, data):
+        """Issue a POST request (write) against the API.
+
+        :param uri: the API method to call including parameters
+                    (e.g. add_case/1)
+        :param data: the data to submit as part of the request
+        :return: the decoded JSON response
+        """
+        try:
+            return self.__send_request('POST', uri, data)
+        finally:
+            if self.cache is not None:
+                self.cache.invalidate_for_write(uri)
+
+    def __send_request(self, method, uri, data):
+        url = self.__url + uri
+        headers = {'Authorization': self.auth_header}
+        body = json.dumps(data) if method == 'POST' else None
+        bytes_sent = len(body) if body else 0
+        for attempt in range(TestRailSettings.rate_limit_retries + 1):
+            start = time.time()
+            try:
+                response = self.session.request(method, url, data=body,
+                                                headers=headers)
+            except requests.RequestException as e:
+                self.stats.record(uri, time.time() - start, bytes_sent)
+                raise APIError('TestRail API request {0} {1} failed: '
+                               '{2}'.format(method, uri, e))
+            self.stats.record(uri, time.time() - start, bytes_sent,
+                              len(response.content), response.status_code)
+            if (response.status_code != 429 or
+                    attempt == TestRailSettings.rate_limit_retries):
+                break
+            delay = self.retry_after(response, attempt)
+            logger.warning('TestRail API rate limit reached on {0} {1}, '
+                           'retrying in {2}s'.format(method, uri, delay))
+            time.sleep(delay)
+
+        try:
+            result = response.json() if response.content else {}
+        except ValueError:
+            if response.ok:
+                raise
+            result = {}
+
+        if not response.ok:
+            if result and 'error' in result:
+                error = '"' + result['error'] + '"'
+            else:
+                error = 'No additional error message received'
+            raise APIError('TestRail API returned HTTP {0} ({1})'.format(
+                response.status_code, error), response.status_code)
+
+        return result
+
+    @staticmethod
+    def retry_after(response, attempt):
+        """Return seconds to wait before retrying rate limited request."""
+        try:
+            return max(int(response.headers['Retry-After']), 1)
+        except (KeyError, ValueError):
+            return 2 ** attempt
+
+
+class APIError(Exception):
+    """Failed TestRail API request.
+
+    ``status_code`` is the HTTP status of the response, None when no
+    response was received.
+    """
+
+    def __init__(self, message, status_code=None):
+        super(APIError, self).__init__(message)
+        self.status_code = status_code
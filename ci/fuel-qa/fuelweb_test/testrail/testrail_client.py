@@ -14,7 +14,18 @@
 
 from __future__ import unicode_literals
 
+import os
+import threading
+import uuid
+from multiprocessing.pool import ThreadPool
+
+from fuelweb_test.settings import TestRailSettings
+from fuelweb_test.testrail.cache import ResponseCache
+from fuelweb_test.testrail.cache import scoped_path
+from fuelweb_test.testrail.index import TestRunIndex
+from fuelweb_test.testrail.pagination import iter_paginated
 from fuelweb_test.testrail.settings import logger
+from fuelweb_test.testrail.submission import ResultQueue
 from fuelweb_test.testrail.testrail import APIClient
 from fuelweb_test.testrail.testrail import APIError
 
@@ -22,12 +33,59 @@ from fuelweb_test.testrail.testrail import APIError
 class TestRailProject(object):
     """TestRailProject."""  # TODO documentation
 
-    def __init__(self, url, user, password, project):
+    def __init__(self, url, user, password, project, cache=None):
         self.client = APIClient(base_url=url)
         self.client.user = user
         self.client.password = password
+        self.cache = cache or ResponseCache(
+            ttl=TestRailSettings.cache_ttl,
+            path=scoped_path(TestRailSettings.cache_file, url, user),
+            persistent=TestRailSettings.cache_persistent)
+        self.client.cache = self.cache
+        self.results_queue = ResultQueue(
+            self.client,
+            max_size=TestRailSettings.results_batch_size,
+            max_delay=TestRailSettings.results_flush_interval,
+            on_sent=self._results_sent,
+            journal_path=os.path.join(
+                TestRailSettings.results_journal_dir,
+                'results_{0}_{1}.json'.format(os.getpid(),
+                                              uuid.uuid4().hex[:8])))
+        self._run_indexes = {}
         self.project = self._get_project(project)
 
+    def cache_stats(self):
+        """Return response cache hit/miss counters."""
+        return self.cache.stats()
+
+    def request_stats(self):
+        """Return per-endpoint counts, bytes and latencies of requests."""
+        return self.client.stats.as_dict()
+
+    def fan_out(self, func, items, concurrency=None):
+        """Call func for each of items concurrently.
+
+        At most ``concurrency`` (TestRailSettings.max_concurrent_requests by
+        default) calls run at the same time. Results are returned in the
+        order of items.
+        """
+        items = list(items)
+        concurrency = min(
+            concurrency or TestRailSettings.max_concurrent_requests,
+            len(items))
+        if concurrency <= 1:
+            return [func(item) for item in items]
+        pool = ThreadPool(concurrency)
+        try:
+            return pool.map(func, items)
+        finally:
+            pool.close()
+            pool.join()
+
+    def _iter_pages(self, uri, key):
+        return iter_paginated(self.client, uri, key,
+                              limit=TestRailSettings.max_results_per_request)
+
     def _get_project(self, project_name):
         projects_uri = 'get_projects'
         projects = self.client.send_get(uri=projects_uri)
@@ -144,7 +202,7 @@ class TestRailProject(object):
         return self.client.send_post('add_suite/' + str(self.project['id']),
                                      dict(name=name, description=description))
 
-    def get_cases(self, suite_id, section_id=None):
+    def iter_cases(self, suite_id, section_id=None, updated_after=None):
         cases_uri = 'get_cases/{project_id}&suite_id={suite_id}'.format(
             project_id=self.project['id'],
             suite_id=suite_id
@@ -153,7 +211,15 @@ class TestRailProject(object):
             cases_uri = '{0}&section_id={section_id}'.format(
                 cases_uri, section_id=section_id
             )
-        return self.client.send_get(cases_uri)
+        if updated_after:
+            cases_uri = '{0}&updated_after={updated_after}'.format(
+                cases_uri, updated_after=updated_after
+            )
+        return self._iter_pages(cases_uri, 'cases')
+
+    def get_cases(self, suite_id, section_id=None, updated_after=None):
+        return list(self.iter_cases(suite_id, section_id=section_id,
+                                    updated_after=updated_after))
 
     def get_case(self, case_id):
         case_uri = 'get_case/{case_id}'.format(case_id=case_id)
@@ -246,17 +312,20 @@ class TestRailProject(object):
         delete_plan_uri = 'delete_plan/{plan_id}'.format(plan_id=plan_id)
         self.client.send_post(delete_plan_uri, {})
 
-    def get_runs(self):
+    def iter_runs(self):
         runs_uri = 'get_runs/{project_id}'.format(
             project_id=self.project['id'])
-        return self.client.send_get(uri=runs_uri)
+        return self._iter_pages(runs_uri, 'runs')
+
+    def get_runs(self):
+        return list(self.iter_runs())
 
     def get_run(self, run_id):
         run_uri = 'get_run/{run_id}'.format(run_id=run_id)
         return self.client.send_get(uri=run_uri)
 
     def get_run_by_name(self, name):
-        for run in self.get_runs():
+        for run in self.iter_runs():
             if run['name'] == name:
                 return self.get_run(run_id=run['id'])
 
@@ -271,8 +340,10 @@ class TestRailProject(object):
             if not existing_plans:
                 break
 
-            for plan in existing_plans:
-                for entry in self.get_plan(plan['id'])['entries']:
+            plans = self.fan_out(lambda plan: self.get_plan(plan['id']),
+                                 existing_plans)
+            for plan in plans:
+                for entry in plan['entries']:
                     if entry['suite_id'] == suite_id:
                         run_ids = [run for run in entry['runs'] if
                                    config_id in run['config_ids']]
@@ -302,6 +373,7 @@ class TestRailProject(object):
             update_run['case_ids'] = case_ids
         if config_ids:
             update_run['config_ids'] = config_ids
+        self.invalidate_run_index(tests_run['id'])
         return self.client.send_post(update_run_uri, update_run)
 
     def create_or_update_run(self, name, suite, milestone_id, description,
@@ -330,38 +402,69 @@ class TestRailProject(object):
             if status['name'] == name:
                 return status
 
-    def get_tests(self, run_id, status_id=None):
+    def iter_tests(self, run_id, status_id=None):
         tests_uri = 'get_tests/{run_id}'.format(run_id=run_id)
         if status_id:
             tests_uri = '{0}&status_id={1}'.format(tests_uri,
                                                    ','.join(status_id))
-        return self.client.send_get(tests_uri)
+        return self._iter_pages(tests_uri, 'tests')
+
+    def get_tests(self, run_id, status_id=None):
+        return list(self.iter_tests(run_id, status_id=status_id))
 
     def get_test(self, test_id):
         test_uri = 'get_test/{test_id}'.format(test_id=test_id)
         return self.client.send_get(test_uri)
 
+    def get_run_index(self, run_id):
+        """Return TestRunIndex of the run, fetching its tests only once."""
+        if run_id not in self._run_indexes:
+            self._run_indexes[run_id] = TestRunIndex(self.iter_tests(run_id))
+        return self._run_indexes[run_id]
+
+    def invalidate_run_index(self, run_id=None):
+        if run_id is None:
+            self._run_indexes.clear()
+        else:
+            self._run_indexes.pop(run_id, None)
+
+    def invalidate_test_index(self, test_id):
+        """Drop indexes of runs with the test, e.g. after adding results."""
+        for run_id, index in list(self._run_indexes.items()):
+            if test_id in index.by_id:
+                self._run_indexes.pop(run_id, None)
+
+    def _results_sent(self, uri):
+        # add_results/<run_id> or add_results_for_cases/<run_id>
+        self.invalidate_run_index(int(uri.rsplit('/', 1)[1]))
+
+    def _index_of(self, run_id, tests=None):
+        if tests:
+            return TestRunIndex(tests)
+        return self.get_run_index(run_id)
+
+    # The run index finds tests without listing the run each time, found
+    # tests are still returned as full get_test responses
+
+    def _full_test(self, test):
+        if test is None:
+            return None
+        return self.get_test(test_id=test['id'])
+
     def get_test_by_name(self, run_id, name):
-        for test in self.get_tests(run_id):
-            if test['title'] == name:
-                return self.get_test(test_id=test['id'])
+        return self._full_test(self.get_run_index(run_id).get_by_title(name))
 
     def get_test_by_group(self, run_id, group, tests=None):
-        for test in tests or self.get_tests(run_id):
-            if test['custom_test_group'] == group:
-                return self.get_test(test_id=test['id'])
+        return self._full_test(
+            self._index_of(run_id, tests).get_by_group(group))
 
     def get_test_by_name_and_group(self, run_id, name, group):
-        for test in self.get_tests(run_id):
-            if test['title'] == name and test['custom_test_group'] == group:
-                return self.get_test(test_id=test['id'])
+        return self._full_test(
+            self.get_run_index(run_id).get_by_title_and_group(name, group))
 
     def get_tests_by_group(self, run_id, group, tests=None):
-        test_list = []
-        for test in tests or self.get_tests(run_id):
-            if test['custom_test_group'] == group:
-                test_list.append(self.get_test(test_id=test['id']))
-        return test_list
+        return [self._full_test(test) for test in
+                self._index_of(run_id, tests).get_all_by_group(group)]
 
     def get_results_for_test(self, test_id, run_results=None):
         if run_results:
@@ -373,9 +476,9 @@ class TestRailProject(object):
         results_uri = 'get_results/{test_id}'.format(test_id=test_id)
         return self.client.send_get(results_uri)
 
-    def get_results_for_run(self, run_id, created_after=None,
-                            created_before=None, created_by=None, limit=None,
-                            offset=None, status_id=None):
+    def _results_for_run_uri(self, run_id, created_after=None,
+                             created_before=None, created_by=None,
+                             status_id=None):
         results_run_uri = 'get_results_for_run/{run_id}'.format(run_id=run_id)
         if created_after:
             results_run_uri += '&created_after={}'.format(created_after)
@@ -383,12 +486,35 @@ class TestRailProject(object):
             results_run_uri += '&created_before={}'.format(created_before)
         if created_by:
             results_run_uri += '&created_by={}'.format(created_by)
+        if status_id:
+            results_run_uri += '&status_id={}'.format(status_id)
+        return results_run_uri
+
+    def iter_results_for_run(self, run_id, created_after=None,
+                             created_before=None, created_by=None,
+                             status_id=None):
+        results_run_uri = self._results_for_run_uri(
+            run_id, created_after=created_after,
+            created_before=created_before, created_by=created_by,
+            status_id=status_id)
+        return self._iter_pages(results_run_uri, 'results')
+
+    def get_results_for_run(self, run_id, created_after=None,
+                            created_before=None, created_by=None, limit=None,
+                            offset=None, status_id=None):
+        if not limit and not offset:
+            return list(self.iter_results_for_run(
+                run_id, created_after=created_after,
+                created_before=created_before, created_by=created_by,
+                status_id=status_id))
+        results_run_uri = self._results_for_run_uri(
+            run_id, created_after=created_after,
+            created_before=created_before, created_by=created_by,
+            status_id=status_id)
         if limit:
             results_run_uri += '&limit={}'.format(limit)
         if offset:
             results_run_uri += '&offset={}'.format(offset)
-        if status_id:
-            results_run_uri += '&status_id={}'.format(status_id)
         return self.client.send_get(results_run_uri)
 
     def get_results_for_case(self, run_id, case_id):
@@ -397,19 +523,21 @@ class TestRailProject(object):
         return self.client.send_get(results_case_uri)
 
     def get_all_results_for_case(self, run_ids, case_id):
-        all_results = []
-        for run_id in run_ids:
+        def get_results(run_id):
             try:
-                results = self.get_results_for_case(run_id=run_id,
-                                                    case_id=case_id)
+                return self.get_results_for_case(run_id=run_id,
+                                                 case_id=case_id)
             except APIError as e:
                 logger.error("[{0}], run_id={1}, case_id={2}"
                              .format(e, run_id, case_id))
-                continue
+                return []
+
+        all_results = []
+        for results in self.fan_out(get_results, run_ids):
             all_results.extend(results)
         return all_results
 
-    def add_results_for_test(self, test_id, test_results):
+    def test_results_struct(self, test_results):
         new_results = {
             'status_id': self.get_status(test_results.status)['id'],
             'comment': '\n'.join(filter(lambda x: x is not None,
@@ -421,11 +549,43 @@ class TestRailProject(object):
         }
         if test_results.steps:
             new_results['custom_test_case_steps_results'] = test_results.steps
-        return self.add_raw_results_for_test(test_id, new_results)
+        return new_results
+
+    def add_results_for_test(self, test_id, test_results):
+        return self.add_raw_results_for_test(
+            test_id, self.test_results_struct(test_results))
+
+    def queue_results_for_test(self, run_id, test_id, test_results):
+        """Buffer results of the test to send them with one bulk request.
+
+        Buffered results are sent by flush_results() or automatically when
+        the queue is full or results_flush_interval has passed.
+        """
+        self.results_queue.add_for_test(
+            run_id, test_id, self.test_results_struct(test_results))
+
+    def queue_raw_results_for_case(self, run_id, case_id, raw_results):
+        self.results_queue.add_for_case(run_id, case_id, raw_results)
+
+    def flush_results(self):
+        return self.results_queue.flush()
+
+    def replay_results(self, journal_path=None):
+        """Send results batches kept in a journal by failed flushes."""
+        return self.results_queue.replay(journal_path)
+
+    def replay_all_results(self):
+        """Send results batches of journals left by crashed processes."""
+        return self.results_queue.replay_all(
+            TestRailSettings.results_journal_dir)
 
     def add_raw_results_for_test(self, test_id, test_raw_results):
         add_results_test_uri = 'add_result/{test_id}'.format(test_id=test_id)
-        return self.client.send_post(add_results_test_uri, test_raw_results)
+        try:
+            return self.client.send_post(add_results_test_uri,
+                                         test_raw_results)
+        finally:
+            self.invalidate_test_index(test_id)
 
     def add_results_for_cases(self, run_id, suite_id, tests_results):
         add_results_test_uri = 'add_results_for_cases/{run_id}'.format(
@@ -470,10 +630,38 @@ class TestRailProject(object):
                 new_result['custom_test_case_steps_results'] = \
                     custom_step_results
             new_results['results'].append(new_result)
-        return self.client.send_post(add_results_test_uri, new_results)
+        try:
+            return self.client.send_post(add_results_test_uri, new_results)
+        finally:
+            self.invalidate_run_index(run_id)
 
     def add_results_for_tempest_cases(self, run_id, tests_results):
         add_results_test_uri = 'add_results_for_cases/{run_id}'.format(
             run_id=run_id)
         new_results = {'results': tests_results}
-        return self.client.send_post(add_results_test_uri, new_results)
+        try:
+            return self.client.send_post(add_results_test_uri, new_results)
+        finally:
+            self.invalidate_run_index(run_id)
+
+
+class LazyTestRailProject(object):
+    """Class attribute holding a TestRailProject created on first access.
+
+    Reporters can be defined at import time (e.g. while pytest collects
+    tests) without connecting to TestRail until they are actually used.
+    """
+
+    def __init__(self, *args, **kwargs):
+        self._args = args
+        self._kwargs = kwargs
+        self._project = None
+        self._lock = threading.Lock()
+
+    def __get__(self, instance, owner):
+        if self._project is None:
+            with self._lock:
+                if self._project is None:
+                    self._project = TestRailProject(*self._args,
+                                                    **self._kwargs)
+        return self._project
@@ -98,6 +98,8 @@ test_run_id = testrail_client.send_post('add_run/3',{"suite_id": test_suite_id,\
                                              "case_ids": test_cases})['id']
 
 # Collecting necessary test results from data structures and sending it to TestRail via HTTP
+# in one bulk request
+testrail_results = []
 for test_report in reports.keys():
     test_operations = reports.get(test_report)
     for test_operation in test_operations.keys():
@@ -147,8 +149,11 @@ for test_report in reports.keys():
         test_case_global_status_id = 1
         if (low_rps or many_errors or high_resp_time_median or high_90_percentile): test_case_global_status_id = 5
         
-        #Sending results to TestRail
-        print testrail_client.send_post("add_result_for_case/" + str(test_run_id) + "/" + test_case_id, {"status_id": test_case_global_status_id,\
-                                                                                              "created_by": 89,\
-                                                                                              "comment": estimated_test_duration + keystone_configuration,\
-                                                                                              "custom_test_case_steps_results":testrail_all_additional_results})
+        testrail_results.append({"case_id": int(test_case_id),\
+                                 "status_id": test_case_global_status_id,\
+                                 "created_by": 89,\
+                                 "comment": estimated_test_duration + keystone_configuration,\
+                                 "custom_test_case_steps_results":testrail_all_additional_results})
+
+#Sending results to TestRail
+print testrail_client.send_post("add_results_for_cases/" + str(test_run_id), {"results": testrail_results})
@@ -10,12 +10,31 @@
 # Copyright Gurock Software GmbH. See license.md for details.
 #
 
-import urllib2, json, base64
+import json, base64, os
+import requests
+from requests.adapters import HTTPAdapter
+
+#
+# Shared HTTP session
+#
+# All clients in the process go through one session, so connections to
+# TestRail are kept alive and reused instead of doing a TCP/TLS handshake
+# per request. The pool size can be tuned with TESTRAIL_POOL_SIZE.
+#
+_pool_size = int(os.environ.get('TESTRAIL_POOL_SIZE', 10))
+_adapter = HTTPAdapter(pool_connections=_pool_size, pool_maxsize=_pool_size)
+session = requests.Session()
+session.mount('https://', _adapter)
+session.mount('http://', _adapter)
+session.headers.update({'Content-Type': 'application/json',
+                        'Accept-Encoding': 'gzip, deflate',
+                        'Connection': 'keep-alive'})
 
 class APIClient:
     def __init__(self, base_url):
         self.user = ''
         self.password = ''
+        self.__auth = None
         if not base_url.endswith('/'):
             base_url += '/'
         self.__url = base_url + 'index.php?/api/v2/'
@@ -52,31 +71,25 @@ class APIClient:
 
     def __send_request(self, method, uri, data):
         url = self.__url + uri
-        request = urllib2.Request(url)
-        if (method == 'POST'):
-            request.add_data(json.dumps(data))
-        auth = base64.b64encode('%s:%s' % (self.user, self.password))
-        request.add_header('Authorization', 'Basic %s' % auth)
-        request.add_header('Content-Type', 'application/json')
-
-        e = None
-        try:
-            response = urllib2.urlopen(request).read()
-        except urllib2.HTTPError as e:
-            response = e.read()
+        if self.__auth is None or self.__auth[0] != (self.user, self.password):
+            auth = base64.b64encode('%s:%s' % (self.user, self.password))
+            self.__auth = ((self.user, self.password), 'Basic %s' % auth)
+        headers = {'Authorization': self.__auth[1]}
+        body = json.dumps(data) if method == 'POST' else None
+        response = session.request(method, url, data=body, headers=headers)
 
-        if response:
-            result = json.loads(response)
+        if response.content:
+            result = json.loads(response.content)
         else:
             result = {}
 
-        if e != None:
+        if not response.ok:
             if result and 'error' in result:
                 error = '"' + result['error'] + '"'
             else:
                 error = 'No additional error message received'
             raise APIError('TestRail API returned HTTP %s (%s)' % 
-                (e.code, error))
+                (response.status_code, error))
 
         return result
 
@@ -1,7 +1,8 @@
 import ConfigParser
 import base64
 import json
-import urllib2
+import requests
+from requests.adapters import HTTPAdapter
 import re
 import os
 try:
@@ -9,11 +10,22 @@ try:
 except ImportError:
     from bs4 import BeautifulSoup
 
-# Testrail API
+# Testrail API, the session is the same as in keystone/testrail.py
+_pool_size = int(os.environ.get('TESTRAIL_POOL_SIZE', 10))
+_adapter = HTTPAdapter(pool_connections=_pool_size, pool_maxsize=_pool_size)
+session = requests.Session()
+session.mount('https://', _adapter)
+session.mount('http://', _adapter)
+session.headers.update({'Content-Type': 'application/json',
+                        'Accept-Encoding': 'gzip, deflate',
+                        'Connection': 'keep-alive'})
+
+
 class APIClient:
     def __init__(self, base_url):
         self.user = ''
         self.password = ''
+        self.__auth = None
         if not base_url.endswith('/'):
             base_url += '/'
         self.__url = base_url + 'index.php?/api/v2/'
@@ -26,31 +38,25 @@ class APIClient:
 
     def __send_request(self, method, uri, data):
         url = self.__url + uri
-        request = urllib2.Request(url)
-        if (method == 'POST'):
-            request.add_data(json.dumps(data))
-        auth = base64.b64encode('%s:%s' % (self.user, self.password))
-        request.add_header('Authorization', 'Basic %s' % auth)
-        request.add_header('Content-Type', 'application/json')
-
-        e = None
-        try:
-            response = urllib2.urlopen(request).read()
-        except urllib2.HTTPError as e:
-            response = e.read()
-
-        if response:
-            result = json.loads(response)
+        if self.__auth is None or self.__auth[0] != (self.user, self.password):
+            auth = base64.b64encode('%s:%s' % (self.user, self.password))
+            self.__auth = ((self.user, self.password), 'Basic %s' % auth)
+        headers = {'Authorization': self.__auth[1]}
+        body = json.dumps(data) if method == 'POST' else None
+        response = session.request(method, url, data=body, headers=headers)
+
+        if response.content:
+            result = json.loads(response.content)
         else:
             result = {}
 
-        if e != None:
+        if not response.ok:
             if result and 'error' in result:
                 error = '"' + result['error'] + '"'
             else:
                 error = 'No additional error message received'
             raise APIError('TestRail API returned HTTP %s (%s)' %
-                           (e.code, error))
+                           (response.status_code, error))
 
         return result
 
@@ -116,23 +122,32 @@ for item in list_t.keys():
         test_on_l3ha_vlan_inst = list_t[item]
 
 ## Define baseline data from TestRail
-base_off_dvr_vxlan_inst_median = client.send_get('get_test/{}'.format(test_off_dvr_vxlan_inst))['custom_test_case_steps'][0]['expected']
-base_off_dvr_vxlan_inst_stdev = client.send_get('get_test/{}'.format(test_off_dvr_vxlan_inst))['custom_test_case_steps'][1]['expected']
-base_off_dvr_vlan_inst_median = client.send_get('get_test/{}'.format(test_off_dvr_vlan_inst))['custom_test_case_steps'][0]['expected']
-base_off_dvr_vlan_inst_stdev = client.send_get('get_test/{}'.format(test_off_dvr_vlan_inst))['custom_test_case_steps'][1]['expected']
-base_on_dvr_vxlan_inst_median = client.send_get('get_test/{}'.format(test_on_dvr_vxlan_inst))['custom_test_case_steps'][0]['expected']
-base_on_dvr_vxlan_inst_stdev = client.send_get('get_test/{}'.format(test_on_dvr_vxlan_inst))['custom_test_case_steps'][1]['expected']
-base_on_dvr_vlan_inst_median = client.send_get('get_test/{}'.format(test_on_dvr_vlan_inst))['custom_test_case_steps'][0]['expected']
-base_on_dvr_vlan_inst_stdev = client.send_get('get_test/{}'.format(test_on_dvr_vlan_inst))['custom_test_case_steps'][1]['expected']
-
-base_on_l3ha_vxlan_nodes_median = client.send_get('get_test/{}'.format(test_on_l3ha_vxlan_nodes))['custom_test_case_steps'][0]['expected']
-base_on_l3ha_vxlan_nodes_stdev = client.send_get('get_test/{}'.format(test_on_l3ha_vxlan_nodes))['custom_test_case_steps'][1]['expected']
-base_on_l3ha_vxlan_inst_median = client.send_get('get_test/{}'.format(test_on_l3ha_vxlan_inst))['custom_test_case_steps'][0]['expected']
-base_on_l3ha_vxlan_inst_stdev = client.send_get('get_test/{}'.format(test_on_l3ha_vxlan_inst))['custom_test_case_steps'][1]['expected']
-base_on_l3ha_vlan_nodes_median = client.send_get('get_test/{}'.format(test_on_l3ha_vlan_nodes))['custom_test_case_steps'][0]['expected']
-base_on_l3ha_vlan_nodes_stdev = client.send_get('get_test/{}'.format(test_on_l3ha_vlan_nodes))['custom_test_case_steps'][1]['expected']
-base_on_l3ha_vlan_inst_median = client.send_get('get_test/{}'.format(test_on_l3ha_vlan_inst))['custom_test_case_steps'][0]['expected']
-base_on_l3ha_vlan_inst_stdev = client.send_get('get_test/{}'.format(test_on_l3ha_vlan_inst))['custom_test_case_steps'][1]['expected']
+test_steps = {}
+
+
+def get_test_steps(test_id):
+    if test_id not in test_steps:
+        test_steps[test_id] = client.send_get('get_test/{}'.format(test_id))['custom_test_case_steps']
+    return test_steps[test_id]
+
+
+base_off_dvr_vxlan_inst_median = get_test_steps(test_off_dvr_vxlan_inst)[0]['expected']
+base_off_dvr_vxlan_inst_stdev = get_test_steps(test_off_dvr_vxlan_inst)[1]['expected']
+base_off_dvr_vlan_inst_median = get_test_steps(test_off_dvr_vlan_inst)[0]['expected']
+base_off_dvr_vlan_inst_stdev = get_test_steps(test_off_dvr_vlan_inst)[1]['expected']
+base_on_dvr_vxlan_inst_median = get_test_steps(test_on_dvr_vxlan_inst)[0]['expected']
+base_on_dvr_vxlan_inst_stdev = get_test_steps(test_on_dvr_vxlan_inst)[1]['expected']
+base_on_dvr_vlan_inst_median = get_test_steps(test_on_dvr_vlan_inst)[0]['expected']
+base_on_dvr_vlan_inst_stdev = get_test_steps(test_on_dvr_vlan_inst)[1]['expected']
+
+base_on_l3ha_vxlan_nodes_median = get_test_steps(test_on_l3ha_vxlan_nodes)[0]['expected']
+base_on_l3ha_vxlan_nodes_stdev = get_test_steps(test_on_l3ha_vxlan_nodes)[1]['expected']
+base_on_l3ha_vxlan_inst_median = get_test_steps(test_on_l3ha_vxlan_inst)[0]['expected']
+base_on_l3ha_vxlan_inst_stdev = get_test_steps(test_on_l3ha_vxlan_inst)[1]['expected']
+base_on_l3ha_vlan_nodes_median = get_test_steps(test_on_l3ha_vlan_nodes)[0]['expected']
+base_on_l3ha_vlan_nodes_stdev = get_test_steps(test_on_l3ha_vlan_nodes)[1]['expected']
+base_on_l3ha_vlan_inst_median = get_test_steps(test_on_l3ha_vlan_inst)[0]['expected']
+base_on_l3ha_vlan_inst_stdev = get_test_steps(test_on_l3ha_vlan_inst)[1]['expected']
 
 
 ## Actual data
@@ -1,7 +1,9 @@
 import ConfigParser
 import base64
 import json
-import urllib2
+import os
+import requests
+from requests.adapters import HTTPAdapter
 import re
 try: 
     from BeautifulSoup import BeautifulSoup
@@ -47,11 +49,22 @@ def parse_results():
 	print rws100ms_data
 	return dict({"rws10ms_data": rws10ms_data, "rws30ms_data": rws30ms_data, "rws100ms_data": rws100ms_data, "rrd4k_iops": rrd4k_iops, "rwd4k_iops": rwd4k_iops, "rrd16MiB_bandwidth": rrd16MiB_bandwidth, "rwd16MiB_bandwidth": rwd16MiB_bandwidth, "rrd4k_dev": rrd4k_dev, "rwd4k_dev": rwd4k_dev, "rrd16MiB_dev": rrd16MiB_dev, "rwd16MiB_dev": rwd16MiB_dev})
 
-# Testrail API
+# Testrail API, the session is the same as in keystone/testrail.py
+_pool_size = int(os.environ.get('TESTRAIL_POOL_SIZE', 10))
+_adapter = HTTPAdapter(pool_connections=_pool_size, pool_maxsize=_pool_size)
+session = requests.Session()
+session.mount('https://', _adapter)
+session.mount('http://', _adapter)
+session.headers.update({'Content-Type': 'application/json',
+                        'Accept-Encoding': 'gzip, deflate',
+                        'Connection': 'keep-alive'})
+
+
 class APIClient:
     def __init__(self, base_url):
         self.user = ''
         self.password = ''
+        self.__auth = None
         if not base_url.endswith('/'):
             base_url += '/'
         self.__url = base_url + 'index.php?/api/v2/'
@@ -64,31 +77,25 @@ class APIClient:
 
     def __send_request(self, method, uri, data):
         url = self.__url + uri
-        request = urllib2.Request(url)
-        if (method == 'POST'):
-            request.add_data(json.dumps(data))
-        auth = base64.b64encode('%s:%s' % (self.user, self.password))
-        request.add_header('Authorization', 'Basic %s' % auth)
-        request.add_header('Content-Type', 'application/json')
-
-        e = None
-        try:
-            response = urllib2.urlopen(request).read()
-        except urllib2.HTTPError as e:
-            response = e.read()
-
-        if response:
-            result = json.loads(response)
+        if self.__auth is None or self.__auth[0] != (self.user, self.password):
+            auth = base64.b64encode('%s:%s' % (self.user, self.password))
+            self.__auth = ((self.user, self.password), 'Basic %s' % auth)
+        headers = {'Authorization': self.__auth[1]}
+        body = json.dumps(data) if method == 'POST' else None
+        response = session.request(method, url, data=body, headers=headers)
+
+        if response.content:
+            result = json.loads(response.content)
         else:
             result = {}
 
-        if e != None:
+        if not response.ok:
             if result and 'error' in result:
                 error = '"' + result['error'] + '"'
             else:
                 error = 'No additional error message received'
             raise APIError('TestRail API returned HTTP %s (%s)' %
-                           (e.code, error))
+                           (response.status_code, error))
 
         return result
 
@@ -155,17 +162,26 @@ for item in list_t.keys():
         test_latency_100_ms = list_t[item]
 
 ### Baseline data
-base_read_16mib_median = client.send_get('get_test/{}'.format(test_16mib_read))['custom_test_case_steps'][0]['expected']
-base_read_16mib_stdev = client.send_get('get_test/{}'.format(test_16mib_read))['custom_test_case_steps'][1]['expected']
-base_write_16mib_median = client.send_get('get_test/{}'.format(test_16mib_write))['custom_test_case_steps'][0]['expected']
-base_write_16mib_stdev = client.send_get('get_test/{}'.format(test_16mib_write))['custom_test_case_steps'][1]['expected']
-base_read_4kib_median = client.send_get('get_test/{}'.format(test_4kib_read))['custom_test_case_steps'][0]['expected']
-base_read_4kib_stdev = client.send_get('get_test/{}'.format(test_4kib_read))['custom_test_case_steps'][1]['expected']
-base_write_4kib_median = client.send_get('get_test/{}'.format(test_4kib_write))['custom_test_case_steps'][0]['expected']
-base_write_4kib_stdev = client.send_get('get_test/{}'.format(test_4kib_write))['custom_test_case_steps'][1]['expected']
-base_latency_10_ms = client.send_get('get_test/{}'.format(test_latency_10_ms))['custom_test_case_steps'][0]['expected']
-base_latency_30_ms = client.send_get('get_test/{}'.format(test_latency_30_ms))['custom_test_case_steps'][0]['expected']
-base_latency_100_ms = client.send_get('get_test/{}'.format(test_latency_100_ms))['custom_test_case_steps'][0]['expected']
+test_steps = {}
+
+
+def get_test_steps(test_id):
+    if test_id not in test_steps:
+        test_steps[test_id] = client.send_get('get_test/{}'.format(test_id))['custom_test_case_steps']
+    return test_steps[test_id]
+
+
+base_read_16mib_median = get_test_steps(test_16mib_read)[0]['expected']
+base_read_16mib_stdev = get_test_steps(test_16mib_read)[1]['expected']
+base_write_16mib_median = get_test_steps(test_16mib_write)[0]['expected']
+base_write_16mib_stdev = get_test_steps(test_16mib_write)[1]['expected']
+base_read_4kib_median = get_test_steps(test_4kib_read)[0]['expected']
+base_read_4kib_stdev = get_test_steps(test_4kib_read)[1]['expected']
+base_write_4kib_median = get_test_steps(test_4kib_write)[0]['expected']
+base_write_4kib_stdev = get_test_steps(test_4kib_write)[1]['expected']
+base_latency_10_ms = get_test_steps(test_latency_10_ms)[0]['expected']
+base_latency_30_ms = get_test_steps(test_latency_30_ms)[0]['expected']
+base_latency_100_ms = get_test_steps(test_latency_100_ms)[0]['expected']
 
 ### Actual data
 read_16mib_median = parse_results()["rrd16MiB_bandwidth"]